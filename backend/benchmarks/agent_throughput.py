@@ -0,0 +1,177 @@
+"""Offline end-to-end throughput benchmark for the graphs.
+
+Runs `deep_research_agent`, `supervisor_agent`, `research_agent` and
+`simple_chat` against deterministic fake chat models and a fake search backend
+(see `benchmarks/fakes.py`) at increasing concurrency, and reports latency
+percentiles, throughput, peak traced memory and LLM/search call counts. No
+Gemini or Tavily quota is used, so runs are repeatable and regressions show up
+as changes in the numbers.
+
+Usage (from backend/):
+    python -m benchmarks.agent_throughput
+    python -m benchmarks.agent_throughput --graphs simple_chat research_agent --concurrency 1 8 32
+    python -m benchmarks.agent_throughput --llm-latency 0.5 --fanout 5 --json results.json
+
+With `--replay DIR` the fakes are replaced by cassettes recorded from a real run
+(`CASSETTE_MODE=record`, see `src/cassettes.py`), replayed with the recorded
+latencies scaled by `--latency-scale`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+
+from benchmarks.fakes import USER_CONFIG, FakeConfig, call_counts, install_fakes, prepare_environment
+
+GRAPHS = ["simple_chat", "research_agent", "supervisor_agent", "deep_research_agent"]
+
+
+def graph_inputs(graph_name: str, i: int):
+    """ (compiled graph, input) for one request """
+    from langchain_core.messages import HumanMessage
+
+    if graph_name == "simple_chat":
+        from src.simple_chat import simple_chat
+        return simple_chat, {"messages": [HumanMessage(content=f"What does the uploaded report say about topic {i}?")]}
+    if graph_name == "research_agent":
+        from src.research_agent import research_agent
+        topic = f"Research topic {i}: market growth of specialty coffee"
+        return research_agent, {"researcher_messages": [HumanMessage(content=topic)], "research_topic": topic}
+    if graph_name == "supervisor_agent":
+        from src.multi_agent_supervisor import supervisor_agent
+        brief = f"Research brief {i}: compare specialty coffee roasters in San Francisco."
+        return supervisor_agent, {"supervisor_messages": [HumanMessage(content=brief)], "research_brief": brief}
+    if graph_name == "deep_research_agent":
+        from src.full_agent import deep_research_agent
+        return deep_research_agent, {"messages": [HumanMessage(content=f"Give me a report on specialty coffee trends, variant {i}")]}
+    raise ValueError(f"unknown graph {graph_name}")
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_level(graph_name: str, concurrency: int, requests: int, track_memory: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        graph, inputs = graph_inputs(graph_name, i)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await graph.ainvoke(inputs, config=USER_CONFIG)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(f"  {graph_name} request {i} failed: {type(e).__name__}: {e}")
+
+    calls_before = dict(call_counts)
+    if track_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    wall = time.perf_counter() - start
+
+    calls = {k: v - calls_before.get(k, 0) for k, v in call_counts.items() if v - calls_before.get(k, 0)}
+    return {
+        "graph": graph_name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_s": percentile(latencies, 50) if latencies else None,
+        "p90_s": percentile(latencies, 90) if latencies else None,
+        "p99_s": percentile(latencies, 99) if latencies else None,
+        "mean_s": statistics.mean(latencies) if latencies else None,
+        "peak_traced_mib": tracemalloc.get_traced_memory()[1] / 1024 / 1024 if track_memory else None,
+        "calls_per_request": {k: v / requests for k, v in sorted(calls.items())},
+    }
+
+
+def print_result(r: dict) -> None:
+    def fmt(v):
+        return f"{v:8.2f}" if v is not None else "       -"
+    calls = " ".join(f"{k}={v:g}" for k, v in r["calls_per_request"].items())
+    print(
+        f"{r['graph']:<22}{r['concurrency']:>5}{r['requests']:>6}{r['errors']:>5}"
+        f"{fmt(r['p50_s'])}{fmt(r['p90_s'])}{fmt(r['p99_s'])}{r['throughput_rps']:>9.2f}"
+        f"{fmt(r['peak_traced_mib'])}  {calls}"
+    )
+
+
+async def main_async(args) -> list[dict]:
+    fake_config = FakeConfig(
+        llm_latency_s=args.llm_latency,
+        token_latency_s=args.token_latency,
+        output_tokens=args.output_tokens,
+        search_latency_s=args.search_latency,
+        fanout=args.fanout,
+        searches=args.searches,
+    )
+    if args.replay:
+        print(f"replaying cassettes from {args.replay} at latency scale {args.latency_scale}\n")
+    else:
+        install_fakes(fake_config)
+        print(f"fake config: {asdict(fake_config)}\n")
+
+    if args.memory:
+        tracemalloc.start()
+
+    print(f"{'graph':<22}{'conc':>5}{'reqs':>6}{'err':>5}{'p50 s':>8}{'p90 s':>8}{'p99 s':>8}{'req/s':>9}{'peak MiB':>8}  calls/request")
+    results = []
+    for graph_name in args.graphs:
+        for concurrency in args.concurrency:
+            requests = args.requests or max(concurrency * 2, 4)
+            result = await run_level(graph_name, concurrency, requests, args.memory)
+            print_result(result)
+            results.append(result)
+
+    if args.replay:
+        from src.cassettes import cassette_stats
+        print(f"\ncassette stats: {cassette_stats()}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graphs", nargs="+", choices=GRAPHS, default=GRAPHS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=0, help="requests per level (default: 2x concurrency, at least 4)")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--searches", type=int, default=2)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip tracemalloc (lower overhead)")
+    parser.add_argument("--trace", action="store_true", help="keep span tracing enabled")
+    parser.add_argument("--json", type=Path, help="also write results as JSON")
+    parser.add_argument("--replay", type=Path, help="replay recorded cassettes from this directory instead of the fakes")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded latencies when replaying")
+    args = parser.parse_args()
+
+    prepare_environment(tracing=args.trace)
+    if args.replay:
+        os.environ["CASSETTE_MODE"] = "replay"
+        os.environ["CASSETTE_DIR"] = str(args.replay)
+        os.environ["CASSETTE_LATENCY_SCALE"] = str(args.latency_scale)
+    results = asyncio.run(main_async(args))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
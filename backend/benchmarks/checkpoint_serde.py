@@ -0,0 +1,196 @@
+"""Benchmark checkpoint size and write/read latency of the state serializers.
+
+Replays recorded runs (one JSONL file per run, one line per state snapshot)
+through the default `JsonPlusSerializer` and `CompactSerializer`. Like the
+checkpointers, a channel is only re-serialized when its value changed since
+the previous snapshot of the same graph namespace (each researcher subgraph
+has its own).
+
+Usage (from backend/):
+    # record a run of the full agent
+    python -m benchmarks.checkpoint_serde record --query "..." --out runs/run1.jsonl
+
+    # compare serializers on recorded runs (synthetic runs if none are given)
+    python -m benchmarks.checkpoint_serde compare runs/*.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+    messages_from_dict,
+    messages_to_dict,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.state_serializer import CompactSerializer
+
+
+# ===== RECORDED RUNS =====
+
+NAMESPACE_KEY = "__namespace__"     # subgraph namespace of a recorded snapshot
+
+
+def _encode_value(value):
+    if isinstance(value, list) and value and all(isinstance(v, BaseMessage) for v in value):
+        return {"__messages__": messages_to_dict(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "__messages__" in value:
+        return messages_from_dict(value["__messages__"])
+    return value
+
+
+def load_run(path: Path) -> list[dict]:
+    with open(path) as f:
+        return [
+            {k: _decode_value(v) for k, v in json.loads(line).items()}
+            for line in f if line.strip()
+        ]
+
+
+async def record_run(query: str, out: Path) -> None:
+    from src.full_agent import deep_research_agent
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        async for snapshot in deep_research_agent.astream(
+            {"messages": [HumanMessage(content=query)]},
+            stream_mode="values",
+            subgraphs=True,
+        ):
+            namespace, values = snapshot
+            line = {NAMESPACE_KEY: "|".join(namespace), **{k: _encode_value(v) for k, v in values.items()}}
+            f.write(json.dumps(line, default=str) + "\n")
+
+
+def synthetic_run(n_iterations: int = 6, seed: int = 0) -> list[dict]:
+    """Shape-alike of a deep research run: growing message lists plus notes."""
+    rng = random.Random(seed)
+    words = "research source market model latency growth evidence report policy data analysis".split()
+
+    def text(n_words: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(n_words))
+
+    snapshots = []
+    supervisor_messages: list[BaseMessage] = [HumanMessage(content=text(200), id="brief")]
+    researcher_messages: list[BaseMessage] = []
+    notes: list[str] = []
+
+    for i in range(n_iterations):
+        supervisor_messages = supervisor_messages + [AIMessage(content=text(80), id=f"sup-ai-{i}")]
+        snapshots.append({"supervisor_messages": supervisor_messages, "notes": notes})
+
+        for j in range(3):
+            researcher_messages = researcher_messages + [
+                AIMessage(content=text(60), id=f"res-ai-{i}-{j}"),
+                ToolMessage(content=text(1500), tool_call_id=f"call-{i}-{j}", id=f"res-tool-{i}-{j}"),
+            ]
+            snapshots.append({"researcher_messages": researcher_messages})
+
+        finding = text(600)
+        notes = notes + [finding]
+        supervisor_messages = supervisor_messages + [
+            ToolMessage(content=finding, tool_call_id=f"conduct-{i}", id=f"sup-tool-{i}")
+        ]
+        snapshots.append({"supervisor_messages": supervisor_messages, "notes": notes})
+
+    return snapshots
+
+
+# ===== BENCHMARK =====
+
+def bench_serializer(serde, runs: list[list[dict]]) -> dict:
+    total_bytes = 0
+    write_s = []
+    read_s = []
+
+    for snapshots in runs:
+        previous: dict = {}
+        blobs = []
+        for snapshot in snapshots:
+            namespace = snapshot.get(NAMESPACE_KEY, "")
+            for channel, value in snapshot.items():
+                if channel == NAMESPACE_KEY or previous.get((namespace, channel)) == value:
+                    continue
+                previous[(namespace, channel)] = value
+
+                start = time.perf_counter()
+                blob = serde.dumps_typed(value)
+                write_s.append(time.perf_counter() - start)
+
+                total_bytes += len(blob[1])
+                blobs.append(blob)
+
+        for blob in blobs:
+            start = time.perf_counter()
+            serde.loads_typed(blob)
+            read_s.append(time.perf_counter() - start)
+
+    return {
+        "checkpoint_bytes": total_bytes,
+        "writes": len(write_s),
+        "write_ms_total": sum(write_s) * 1000,
+        "write_ms_p50": statistics.median(write_s) * 1000 if write_s else 0.0,
+        "read_ms_total": sum(read_s) * 1000,
+        "read_ms_p50": statistics.median(read_s) * 1000 if read_s else 0.0,
+    }
+
+
+def compare(paths: list[Path]) -> None:
+    runs = [load_run(p) for p in paths] if paths else [synthetic_run(seed=s) for s in range(3)]
+    source = f"{len(paths)} recorded run(s)" if paths else "3 synthetic run(s)"
+
+    results = {
+        "default (JsonPlusSerializer)": bench_serializer(JsonPlusSerializer(), runs),
+        "compact (CompactSerializer)": bench_serializer(CompactSerializer(), runs),
+    }
+
+    print(f"Checkpoint serializer benchmark on {source}\n")
+    header = f"{'serializer':<32}{'bytes':>12}{'writes':>8}{'write ms':>11}{'w p50':>9}{'read ms':>10}{'r p50':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<32}{r['checkpoint_bytes']:>12,}{r['writes']:>8}"
+            f"{r['write_ms_total']:>11.1f}{r['write_ms_p50']:>9.3f}"
+            f"{r['read_ms_total']:>10.1f}{r['read_ms_p50']:>9.3f}"
+        )
+
+    default_bytes = results["default (JsonPlusSerializer)"]["checkpoint_bytes"]
+    compact_bytes = results["compact (CompactSerializer)"]["checkpoint_bytes"]
+    if compact_bytes:
+        print(f"\nsize reduction: {default_bytes / compact_bytes:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = sub.add_parser("record", help="record a deep research run as state snapshots")
+    record_parser.add_argument("--query", required=True)
+    record_parser.add_argument("--out", type=Path, required=True)
+
+    compare_parser = sub.add_parser("compare", help="compare serializers on recorded runs")
+    compare_parser.add_argument("runs", nargs="*", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        asyncio.run(record_run(args.query, args.out))
+    else:
+        compare(args.runs)
+
+
+if __name__ == "__main__":
+    main()
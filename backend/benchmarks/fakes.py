@@ -0,0 +1,385 @@
+"""Deterministic fake chat models and search backend for offline benchmarks.
+
+`install_fakes(FakeConfig(...))` swaps every module-level model, the Tavily
+client, the embeddings client, the vector store and the chunk embedding cache used by the graphs for fakes with scripted
+behaviour, configurable latency and token counts, so whole graph runs can be
+benchmarked without Gemini or Tavily quota.
+
+Scripts, keyed on the tools bound to the model:
+- supervisor (ConductResearch bound): first turn fans out `fanout` ConductResearch
+  calls, then calls ResearchComplete
+- researcher (tavily_search_tool bound): `searches` search calls, then a final answer
+- simple_chat (retrieve_tool bound): retrieves once for each new human question
+- structured output: a valid instance of the requested schema
+- anything else: `output_tokens` words of text
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Iterator, AsyncIterator, Optional, get_args, get_origin
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+# LLM calls per fake model role, shared by all copies made through bind_tools / with_structured_output
+call_counts: Counter = Counter()
+
+# graph runs as an authenticated user, so retrieval has documents to search (see src/langgraph_auth.py)
+BENCHMARK_USER_ID = "1"
+USER_CONFIG = {"configurable": {"langgraph_auth_user_id": BENCHMARK_USER_ID}}
+
+WORDS = "research evidence market growth policy latency model source analysis report data trend".split()
+
+
+@dataclass
+class FakeConfig:
+    """Latency and size knobs for the fakes."""
+    llm_latency_s: float = 0.2          # fixed latency per LLM call (time to first token)
+    token_latency_s: float = 0.002      # added per output token
+    output_tokens: int = 300            # tokens per free-text answer
+    search_latency_s: float = 0.3       # per Tavily query
+    search_results: int = 3
+    raw_content_tokens: int = 1500      # size of each search result page
+    retrieval_latency_s: float = 0.05   # per vector store search (blocking, like local Chroma)
+    embedding_latency_s: float = 0.05   # per embedding request
+    upsert_latency_s: float = 0.01      # per vector store write (blocking, like local Chroma)
+    fanout: int = 3                     # ConductResearch calls in the supervisor's first turn
+    searches: int = 2                   # searches per researcher
+
+
+def _text(n_tokens: int, seed: int = 0) -> str:
+    words = itertools.islice(itertools.cycle(WORDS[seed % len(WORDS):] + WORDS[:seed % len(WORDS)]), n_tokens)
+    return " ".join(words)
+
+
+def _fake_value(annotation: Any, fake_config: FakeConfig) -> Any:
+    origin = get_origin(annotation)
+    if origin is list:
+        (item,) = get_args(annotation) or (str,)
+        return [_fake_value(item, fake_config) for _ in range(3 if item is not int else 2)]
+    if origin is not None:  # Optional[...] / Union
+        return _fake_value(next(a for a in get_args(annotation) if a is not type(None)), fake_config)
+    if annotation is bool:
+        return False
+    if annotation is int:
+        return 1
+    if annotation is float:
+        return 1.0
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return fake_schema_args(annotation, fake_config)
+    return _text(max(fake_config.output_tokens // 4, 8))
+
+
+def fake_schema_args(schema: type[BaseModel], fake_config: FakeConfig) -> dict:
+    """ valid arguments for a pydantic schema """
+    return {name: _fake_value(field.annotation, fake_config) for name, field in schema.model_fields.items()}
+
+
+# ===== CHAT MODEL =====
+
+class FakeChatModel(BaseChatModel):
+    """Scripted chat model with configurable latency and token counts."""
+
+    fake_config: FakeConfig
+    role: str = "llm"
+    bound_tools: list = []
+    tool_choice: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.model_copy(update={"bound_tools": list(tools), "tool_choice": tool_choice})
+
+    # ----- scripting -----
+
+    def _tool_names(self) -> list[str]:
+        return [convert_to_openai_tool(t)["function"]["name"] for t in self.bound_tools]
+
+    @staticmethod
+    def _tool_call(name: str, args: dict) -> dict:
+        return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+    def _respond(self, messages: list[BaseMessage]) -> AIMessage:
+        call_counts[self.role] += 1
+        names = self._tool_names()
+        tool_results = sum(1 for m in messages if m.type == "tool")
+        tool_calls = []
+        content = ""
+        output_tokens = self.fake_config.output_tokens
+
+        if self.tool_choice is not None and self.bound_tools:
+            # with_structured_output: answer with the schema as a forced tool call
+            schema = self.bound_tools[0]
+            args = fake_schema_args(schema, self.fake_config) if isinstance(schema, type) and issubclass(schema, BaseModel) else {}
+            tool_calls = [self._tool_call(names[0], args)]
+        elif "ConductResearch" in names:
+            if tool_results == 0:
+                tool_calls = [
+                    self._tool_call("ConductResearch", {"research_topic": f"subtopic {i}: " + _text(40, i)})
+                    for i in range(self.fake_config.fanout)
+                ]
+            else:
+                tool_calls = [self._tool_call("ResearchComplete", {})]
+            output_tokens = 40
+        elif "tavily_search_tool" in names:
+            if tool_results < self.fake_config.searches:
+                tool_calls = [self._tool_call("tavily_search_tool", {"query": _text(6, tool_results)})]
+                output_tokens = 20
+            else:
+                content = _text(output_tokens)
+        elif "retrieve_tool" in names and messages and messages[-1].type == "human":
+            tool_calls = [self._tool_call("retrieve_tool", {"query": str(messages[-1].content)[:200]})]
+            output_tokens = 20
+        else:
+            content = _text(output_tokens, call_counts[self.role])
+
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _latency(self, message: AIMessage) -> float:
+        return self.fake_config.llm_latency_s + message.usage_metadata["output_tokens"] * self.fake_config.token_latency_s
+
+    # ----- BaseChatModel -----
+
+    def _generate(self, messages, stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        time.sleep(self._latency(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        await asyncio.sleep(self._latency(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._respond(messages)
+        time.sleep(self.fake_config.llm_latency_s)
+        for chunk in self._chunks(message):
+            time.sleep(self.fake_config.token_latency_s * 10)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._respond(messages)
+        await asyncio.sleep(self.fake_config.llm_latency_s)
+        for chunk in self._chunks(message):
+            await asyncio.sleep(self.fake_config.token_latency_s * 10)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    @staticmethod
+    def _chunks(message: AIMessage) -> Iterator[ChatGenerationChunk]:
+        words = str(message.content).split(" ")
+        pieces = [" ".join(words[i:i + 10]) + " " for i in range(0, len(words), 10)] or [""]
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=piece if not last else piece.rstrip(),
+                tool_call_chunks=[
+                    {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": n}
+                    for n, tc in enumerate(message.tool_calls)
+                ] if last else [],
+                usage_metadata=message.usage_metadata if last else None,
+            ))
+
+
+# ===== SEARCH / RETRIEVAL =====
+
+class FakeTavilyClient:
+    """Stands in for `TavilyClient.search` with deterministic pages."""
+
+    def __init__(self, fake_config: FakeConfig):
+        self.fake_config = fake_config
+
+    def search(self, query: str, max_results: int = 5, include_raw_content: bool = False, **kwargs) -> dict:
+        call_counts["search"] += 1
+        time.sleep(self.fake_config.search_latency_s)
+        n = min(max_results, self.fake_config.search_results)
+        return {"query": query, "results": [
+            {
+                "url": f"https://example.com/{abs(hash(query)) % 1000}/{i}",
+                "title": f"Result {i} for {query[:40]}",
+                "content": _text(60, i),
+                "raw_content": _text(self.fake_config.raw_content_tokens, i) if include_raw_content else None,
+            }
+            for i in range(n)
+        ]}
+
+
+class FakeEmbeddings(Embeddings):
+    """Stands in for the Gemini embeddings client, with a real async path.
+
+    Vectors are signed, hashed bags of words, so texts sharing most words are
+    similar and unrelated texts are close to orthogonal, like real embeddings.
+    """
+
+    dimensions = 256
+
+    def __init__(self, fake_config: FakeConfig):
+        self.fake_config = fake_config
+
+    def _vector(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            h = int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "little")
+            vector[h % self.dimensions] += 1.0 if h & 1 << 31 else -1.0
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        call_counts["embedding"] += 1
+        time.sleep(self.fake_config.embedding_latency_s)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        call_counts["embedding"] += 1
+        await asyncio.sleep(self.fake_config.embedding_latency_s)
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = sum(x * x for x in vector) ** 0.5 or 1.0
+    return [x / norm for x in vector]
+
+
+class FakeCollection:
+    """Stands in for the chromadb collection under a vector store: ids, embeddings and documents in a dict."""
+
+    def __init__(self, fake_config: FakeConfig):
+        self.fake_config = fake_config
+        self.records: dict[str, tuple] = {}
+
+    def get(self, ids: list[str], include: Optional[list[str]] = None) -> dict:
+        found = [i for i in ids if i in self.records]
+        return {"ids": found, "embeddings": [self.records[i][0] for i in found]}
+
+    def upsert(self, ids: list[str], embeddings: list, documents: Optional[list[str]] = None, metadatas: Optional[list[dict]] = None) -> None:
+        time.sleep(self.fake_config.upsert_latency_s)
+        for i, id_ in enumerate(ids):
+            self.records[id_] = (embeddings[i], documents[i] if documents else None, metadatas[i] if metadatas else None)
+
+
+class FakeVectorStore:
+    """Stands in for the Chroma collection behind `pdf_vector_store_mgr`."""
+
+    def __init__(self, fake_config: FakeConfig):
+        self.fake_config = fake_config
+        self._collection = FakeCollection(fake_config)
+
+    def _docs(self, k: int) -> list[Document]:
+        return [Document(page_content=_text(200, i), metadata={"page": i, "source": "fake.pdf"}) for i in range(k)]
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, **kwargs) -> list[Document]:
+        call_counts["retrieval"] += 1
+        time.sleep(self.fake_config.retrieval_latency_s)
+        return self._docs(k)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: list[float], k: int = 4, **kwargs) -> list[tuple[Document, float]]:
+        """ squared L2 distances between unit vectors, like Chroma's default space """
+        docs = self.similarity_search_by_vector(embedding, k)
+        embedder = FakeEmbeddings(self.fake_config)
+        query = _unit(embedding)
+        return [
+            (doc, sum((q - d) ** 2 for q, d in zip(query, _unit(embedder._vector(doc.page_content)))))
+            for doc in docs
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list[Document]:
+        call_counts["retrieval"] += 1
+        time.sleep(self.fake_config.retrieval_latency_s)
+        return self._docs(k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs) -> list[Document]:
+        call_counts["retrieval"] += 1
+        await asyncio.sleep(self.fake_config.retrieval_latency_s)
+        return self._docs(k)
+
+
+# ===== INSTALL =====
+
+def prepare_environment(tracing: bool = False) -> None:
+    """ must run before importing any `src` module: avoids API key prompts and trace writes """
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ.setdefault("TAVILY_API_KEY", "offline-benchmark")
+    if not tracing:
+        os.environ["TRACING_ENABLED"] = "0"
+
+
+def install_fakes(fake_config: FakeConfig) -> dict:
+    """ replace every model, the search client and the vector store used by the graphs, returns the fakes """
+    from src import admission, answer_cache, chat_memory, full_agent, multi_agent_supervisor, report_generation, research_agent, scoping_agent, simple_chat, utils
+    from src.chunk_dedup import EmbeddingCache
+    from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+    def model(role: str) -> FakeChatModel:
+        return FakeChatModel(fake_config=fake_config, role=role)
+
+    fakes = {
+        "scoping": model("scoping"),
+        "supervisor": model("supervisor"),
+        "researcher": model("researcher"),
+        "compress": model("compress"),
+        "summarize": model("summarize"),
+        "report": model("report"),
+        "chat": model("chat"),
+        "chat_summary": model("chat_summary"),
+        "search": FakeTavilyClient(fake_config),
+        "vector_store": FakeVectorStore(fake_config),
+        "embedding_cache_store": FakeVectorStore(fake_config),
+        "embeddings": FakeEmbeddings(fake_config),
+    }
+
+    scoping_agent.model = fakes["scoping"]
+    multi_agent_supervisor.supervisor_model_with_tools = fakes["supervisor"].bind_tools(multi_agent_supervisor.supervisor_tools)
+    research_agent.model_with_tools = fakes["researcher"].bind_tools(research_agent.tools)
+    research_agent.compress_model = fakes["compress"]
+    utils.summarization_model = fakes["summarize"]
+    utils.tavily_client = fakes["search"]
+    full_agent.report_writing_model = fakes["report"]
+    full_agent.report_streaming_model = fakes["report"].with_config(tags=["final_report"], metadata={"type": "final_report"})
+    report_generation.report_model = fakes["report"]
+    simple_chat.llm = fakes["chat"]
+    simple_chat.llm_with_tools = fakes["chat"].bind_tools(simple_chat.tools_set)
+    chat_memory.summary_model = fakes["chat_summary"]
+    # every user's store is the same fake collection
+    pdf_vector_store_mgr.user_store = lambda user_id: fakes["vector_store"]
+    pdf_vector_store_mgr.embeddings = fakes["embeddings"]
+    pdf_vector_store_mgr.embedding_cache = EmbeddingCache(fakes["embedding_cache_store"], model="fake-embeddings")
+    # no database: the answer cache is off unless a benchmark sets a document-set version
+    answer_cache.load_docs_version = lambda user_id: None
+    # every request runs as the same user: lift the admission limits, the benchmarks measure the graphs
+    for lane in (admission.interactive_admission, admission.deep_research_admission):
+        lane.capacity = lane.per_user_limit = lane.max_waiting_per_user = 10 ** 6
+
+    return fakes
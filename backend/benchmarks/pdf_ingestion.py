@@ -0,0 +1,216 @@
+"""PDF ingestion throughput in pages per second, before and after streaming.
+
+Compares, on the same PDFs:
+- `baseline`: the previous path, kept here: every page parsed in a worker
+  thread, then everything split and deduplicated, then everything embedded
+- `streaming`: `PDFVectorStoreMgr.ingest_pdf`, pages parsed in the process
+  pool (`src/pdf_parsing.py`) and split, deduplicated and embedded as they come
+
+Embeddings and the vector store are the fakes from `benchmarks/fakes.py` (with
+the rate limit off), so the numbers isolate parsing and pipelining. Reports
+pages/s, time until the first chunks are stored, event loop lag (parsing in a
+thread holds the GIL) and, with `--memory`, the peak memory allocated in the
+API process (tracemalloc; slows the run, and pool processes are not traced).
+
+Without `--pdf`, large sample PDFs are generated into a temporary directory:
+text pages with a header and a recurring legal page, like a long report.
+
+Usage (from backend/):
+    python -m benchmarks.pdf_ingestion
+    python -m benchmarks.pdf_ingestion --pages 2000 --processes 8 --memory
+    python -m benchmarks.pdf_ingestion --pdf ~/papers/*.pdf
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from benchmarks.fakes import BENCHMARK_USER_ID, WORDS, FakeConfig, FakeVectorStore, install_fakes, prepare_environment
+
+MODES = ["baseline", "streaming"]
+tick_s = 0.01
+
+HEADER = "Annual report 2024 - Confidential - prepared for internal distribution only"
+DISCLAIMER = (
+    "This report is provided for information purposes only and does not constitute an offer or a "
+    "solicitation. The information herein has been obtained from sources believed to be reliable but "
+    "is not guaranteed as to accuracy or completeness. Past performance is not indicative of future results. "
+) * 4
+disclaimer_every = 25      # pages; the same legal page recurs, like in long reports
+
+
+def write_sample_pdf(path: str, pages: int, words_per_page: int, rng: random.Random) -> None:
+    """ a plain text PDF (Helvetica, one content stream per page) written by hand, no PDF library needed """
+    bodies = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for page in range(pages):
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        if page % disclaimer_every == disclaimer_every - 1:
+            words = DISCLAIMER.split()
+        lines = [HEADER, f"Page {page + 1} of {pages}"] + [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        stream = "BT /F1 9 Tf 11 TL 40 810 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        number = 4 + 2 * page
+        bodies[number] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {number + 1} 0 R >>"
+        )
+        bodies[number + 1] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+        kids.append(number)
+    bodies[2] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(bodies):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n{bodies[number]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(bodies) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offsets[n]:010d} 00000 n \n" for n in sorted(bodies)).encode()
+    out += f"trailer\n<< /Size {len(bodies) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+async def baseline_ingest(file_path: str, doc_id: str, progress) -> int:
+    """ the pre-streaming path: parse all pages, then split, deduplicate and embed everything """
+    from langchain_core.documents import Document
+    from pypdf import PdfReader
+
+    from src.chunk_dedup import drop_duplicate_chunks
+    from src.embedding_writer import ChunkWriter
+    from src.pdf_vector_store_manager import pdf_vector_store_mgr as mgr
+
+    reader = await asyncio.to_thread(PdfReader, file_path)
+    pages = []
+    for i in range(len(reader.pages)):
+        text = await asyncio.to_thread(reader.pages[i].extract_text)
+        pages.append(Document(page_content=text, metadata={"source": file_path, "page": i}))
+    chunks = mgr.text_splitter.split_documents(pages)
+    for chunk in chunks:
+        chunk.metadata.update(doc_id=doc_id, user_id=BENCHMARK_USER_ID)
+    docs = await asyncio.to_thread(drop_duplicate_chunks, chunks)
+    async with ChunkWriter(mgr.user_store(BENCHMARK_USER_ID), mgr.embeddings, doc_id, progress, cache=mgr.embedding_cache) as writer:
+        await writer.add(docs)
+    return len(docs)
+
+
+async def streaming_ingest(file_path: str, doc_id: str, progress) -> int:
+    from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+    return await pdf_vector_store_mgr.ingest_pdf(file_path, doc_id, BENCHMARK_USER_ID, progress=progress)
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick_s)
+        lags.append(time.perf_counter() - start - tick_s)
+
+
+async def run_mode(mode: str, pdfs: list[str], pages_per_pdf: list[int], fake_config: FakeConfig, memory: bool) -> dict:
+    from src.chunk_dedup import EmbeddingCache
+    from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+    # empty store and embedding cache, so no mode profits from an earlier one
+    store = FakeVectorStore(fake_config)
+    pdf_vector_store_mgr.user_store = lambda user_id: store
+    pdf_vector_store_mgr.embedding_cache = EmbeddingCache(FakeVectorStore(fake_config), model="fake-embeddings")
+    ingest = {"baseline": baseline_ingest, "streaming": streaming_ingest}[mode]
+
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    first_chunks: list[float] = []
+
+    def progress(**counts):
+        if counts.get("chunks_embedded") and not first_chunks:
+            first_chunks.append(time.perf_counter() - start)
+
+    chunks = 0
+    for pdf in pdfs:
+        chunks += await ingest(pdf, str(uuid.uuid4()), progress)
+    wall = time.perf_counter() - start
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20 if memory else None
+    if memory:
+        tracemalloc.stop()
+    stop.set()
+    await ticker
+
+    ordered = sorted(lags)
+    return {
+        "mode": mode,
+        "pages": sum(pages_per_pdf),
+        "chunks": chunks,
+        "wall_s": wall,
+        "pages_per_s": sum(pages_per_pdf) / wall,
+        "first_chunks_s": first_chunks[0] if first_chunks else float("nan"),
+        "p99_loop_lag_ms": ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)] * 1000 if ordered else 0.0,
+        "peak_mb": peak_mb,
+    }
+
+
+async def main_async(args, pdfs: list[str]) -> None:
+    from src import embedding_writer, pdf_parsing
+    from src.chunk_dedup import dedup_stats
+
+    fake_config = FakeConfig(embedding_latency_s=args.embedding_latency, upsert_latency_s=args.upsert_latency)
+    install_fakes(fake_config)
+    embedding_writer.rate_limiter = embedding_writer.RateLimiter(0)     # measure the pipeline, not the quota
+    pdf_parsing.parse_processes = args.processes
+    pdf_parsing.parse_batch_pages = args.batch_pages
+    pdf_parsing.parse_prefetch = 2 * max(args.processes, 1)
+    pages_per_pdf = [pdf_parsing.count_pages(pdf) for pdf in pdfs]
+    print(f"{len(pdfs)} PDF(s), {sum(pages_per_pdf)} pages, {args.processes} parse processes, "
+          f"{args.batch_pages} pages per task, embedding latency {args.embedding_latency}s")
+
+    print(f"{'mode':<11}{'pages':>7}{'chunks':>8}{'wall s':>9}{'pages/s':>9}{'first chunks s':>16}{'p99 loop lag ms':>17}{'peak MB':>9}")
+    for mode in args.modes:
+        dedup_stats.clear()
+        r = await run_mode(mode, pdfs, pages_per_pdf, fake_config, args.memory)
+        peak = f"{r['peak_mb']:>9.1f}" if r["peak_mb"] is not None else f"{'-':>9}"
+        print(
+            f"{r['mode']:<11}{r['pages']:>7}{r['chunks']:>8}{r['wall_s']:>9.2f}{r['pages_per_s']:>9.1f}"
+            f"{r['first_chunks_s']:>16.2f}{r['p99_loop_lag_ms']:>17.1f}{peak}"
+        )
+        print(f"  dedup: {dict(dedup_stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--pdf", nargs="+", default=[], help="local PDFs to ingest (default: generated samples)")
+    parser.add_argument("--pages", type=int, default=500, help="pages per generated PDF")
+    parser.add_argument("--pdfs", type=int, default=2, help="generated PDFs")
+    parser.add_argument("--words-per-page", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=min(4, os.cpu_count() or 1), help="parse processes (0: thread)")
+    parser.add_argument("--batch-pages", type=int, default=8, help="pages per parse task")
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--upsert-latency", type=float, default=0.01)
+    parser.add_argument("--memory", action="store_true", help="trace peak memory (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    prepare_environment()
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs = args.pdf
+        if not pdfs:
+            rng = random.Random(args.seed)
+            pdfs = [os.path.join(tmp, f"sample_{i}.pdf") for i in range(args.pdfs)]
+            for path in pdfs:
+                write_sample_pdf(path, args.pages, args.words_per_page, rng)
+        asyncio.run(main_async(args, pdfs))
+
+
+if __name__ == "__main__":
+    main()
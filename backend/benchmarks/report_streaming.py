@@ -0,0 +1,98 @@
+"""Measure time-to-first-token vs total latency of the streamed final report.
+
+Runs `final_report_generation` on its own over the notes and brief of a
+recorded run (see `benchmarks.checkpoint_serde record`) and reports, per
+repetition, when the first report token reached the client and when the
+report finished.
+
+Usage (from backend/):
+    python -m benchmarks.report_streaming runs/run1.jsonl --repeat 3
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+from langgraph.graph import START, END, StateGraph
+
+from benchmarks.checkpoint_serde import load_run
+from src.full_agent import final_report_generation
+from src.scoping_states import AgentState
+
+
+def build_report_graph():
+    builder = StateGraph(AgentState)
+    builder.add_node("final_report_generation", final_report_generation)
+    builder.add_edge(START, "final_report_generation")
+    builder.add_edge("final_report_generation", END)
+    return builder.compile()
+
+
+def report_inputs(path: Path) -> dict:
+    """ latest research brief and notes found in the recorded snapshots """
+    inputs = {"research_brief": "", "notes": []}
+    for snapshot in load_run(path):
+        if snapshot.get("research_brief"):
+            inputs["research_brief"] = snapshot["research_brief"]
+        if snapshot.get("notes"):
+            inputs["notes"] = snapshot["notes"]
+    return inputs
+
+
+async def measure_once(graph, inputs: dict) -> dict:
+    start = time.perf_counter()
+    client_first_token = None
+    reported = {}
+
+    async for mode, payload in graph.astream(inputs, stream_mode=["messages", "custom"]):
+        if mode == "messages":
+            chunk, metadata = payload
+            if metadata.get("type") == "final_report" and chunk.content and client_first_token is None:
+                client_first_token = time.perf_counter() - start
+        elif mode == "custom" and payload.get("stage") == "done":
+            reported = payload
+
+    return {
+        "client_ttft_s": client_first_token,
+        "client_total_s": time.perf_counter() - start,
+        "model_ttft_s": reported.get("time_to_first_token_s"),
+        "model_total_s": reported.get("total_latency_s"),
+        "report_chars": reported.get("report_chars", 0),
+    }
+
+
+async def run(path: Path, repeat: int) -> None:
+    graph = build_report_graph()
+    inputs = report_inputs(path)
+    print(f"{len(inputs['notes'])} notes, {sum(len(n) for n in inputs['notes']):,} chars of findings\n")
+
+    results = []
+    for i in range(repeat):
+        r = await measure_once(graph, inputs)
+        results.append(r)
+        print(
+            f"run {i + 1}: ttft {r['client_ttft_s'] or 0:.2f}s / total {r['client_total_s']:.2f}s "
+            f"({r['report_chars']:,} chars)"
+        )
+
+    ttft = [r["client_ttft_s"] for r in results if r["client_ttft_s"] is not None]
+    total = [r["client_total_s"] for r in results]
+    if ttft:
+        print(
+            f"\nmedian ttft {statistics.median(ttft):.2f}s vs median total {statistics.median(total):.2f}s "
+            f"-> first content {statistics.median(total) / statistics.median(ttft):.1f}x sooner than before streaming"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("run", type=Path, help="recorded run (JSONL of state snapshots)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.run, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Concurrent load benchmark for the simple_chat retrieval path.
+
+Compares, at increasing concurrency:
+- `blocking`: the previous path, with the query embedded and Chroma searched
+  synchronously inside the coroutine, so every request holds the event loop
+- `async`: `pdf_vector_store_mgr.similarity_search`, async embedding and a
+  thread-offloaded Chroma lookup
+- `chat`: full `simple_chat` turns that call `retrieve_tool` (async path)
+
+Embeddings, the vector store and the chat model are the fakes from
+`benchmarks/fakes.py`, so the numbers isolate scheduling. Event loop lag (how
+late a 10 ms ticker wakes up) shows whether requests overlap or serialize.
+
+Usage (from backend/):
+    python -m benchmarks.retrieval_load
+    python -m benchmarks.retrieval_load --concurrency 1 16 64 --embedding-latency 0.1 --retrieval-latency 0.05
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import BENCHMARK_USER_ID, USER_CONFIG, FakeConfig, install_fakes, prepare_environment
+
+MODES = ["blocking", "async", "chat"]
+tick_s = 0.01
+
+
+async def blocking_search(query: str, k: int = 4):
+    """ the pre-async retrieval path, kept here as the baseline """
+    from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+    embedding = pdf_vector_store_mgr.embeddings.embed_query(query)
+    docs = pdf_vector_store_mgr.user_store(BENCHMARK_USER_ID).similarity_search_by_vector(embedding, k)
+    return pdf_vector_store_mgr.format_docs(docs), docs
+
+
+async def async_search(query: str, k: int = 4):
+    from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+    return await pdf_vector_store_mgr.similarity_search(query=query, k=k, user_id=BENCHMARK_USER_ID)
+
+
+async def chat_turn(query: str):
+    from langchain_core.messages import HumanMessage
+    from src.simple_chat import simple_chat
+
+    return await simple_chat.ainvoke({"messages": [HumanMessage(content=query)]}, config=USER_CONFIG)
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick_s)
+        lags.append(time.perf_counter() - start - tick_s)
+
+
+async def run_level(mode: str, concurrency: int, requests: int) -> dict:
+    call = {"blocking": blocking_search, "async": async_search, "chat": chat_turn}[mode]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(f"What does the uploaded report say about topic {i}?")
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    wall = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    ordered = sorted(latencies)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "wall_s": wall,
+        "throughput_rps": requests / wall,
+        "p50_s": statistics.median(ordered),
+        "p99_s": ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)],
+        "max_loop_lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+async def main_async(args) -> None:
+    install_fakes(FakeConfig(
+        llm_latency_s=args.llm_latency,
+        token_latency_s=0.0,
+        embedding_latency_s=args.embedding_latency,
+        retrieval_latency_s=args.retrieval_latency,
+    ))
+    print(f"{'mode':<10}{'conc':>6}{'reqs':>6}{'wall s':>9}{'req/s':>9}{'p50 s':>8}{'p99 s':>8}{'loop lag ms':>13}")
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            r = await run_level(mode, concurrency, args.requests or concurrency * 4)
+            print(
+                f"{r['mode']:<10}{r['concurrency']:>6}{r['requests']:>6}{r['wall_s']:>9.2f}{r['throughput_rps']:>9.1f}"
+                f"{r['p50_s']:>8.3f}{r['p99_s']:>8.3f}{r['max_loop_lag_ms']:>13.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=0, help="requests per level (default: 4x concurrency)")
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--retrieval-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    prepare_environment()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
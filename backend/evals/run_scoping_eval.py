@@ -0,0 +1,301 @@
+"""Offline parallel runner for the scoping evals.
+
+Runs `scope_research` on every example of a local JSONL dataset and scores the
+resulting research brief with the two evaluators from `scoping_eval.ipynb`:
+- success criteria: one `BRIEF_CRITERIA_PROMPT` judge call per criterion
+- no assumptions: one `BRIEF_HALLUCINATION_PROMPT` judge call per brief
+
+Examples run concurrently (bounded by `--concurrency`), and judge calls are
+bounded separately (`--judge-concurrency`). Judge verdicts are cached on disk,
+keyed by a hash of the judge prompt and schema, so re-running after a scoping
+change only pays for the briefs that actually changed. The report lists quality
+scores next to per-example latency and token cost.
+
+Dataset format, one example per line (see `evals/scoping_dataset.jsonl`):
+    {"id": "...", "messages": [{"role": "human" | "ai", "content": "..."}], "criteria": ["..."]}
+
+Usage (from backend/):
+    python -m evals.run_scoping_eval
+    python -m evals.run_scoping_eval --dataset evals/scoping_dataset.jsonl --repeats 3 --concurrency 8 --output report.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from langchain.chat_models import init_chat_model
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel, Field
+
+load_dotenv()
+
+from src.prompts import BRIEF_CRITERIA_PROMPT, BRIEF_HALLUCINATION_PROMPT
+from src.scoping_agent import scope_research
+
+# ===== CONFIGURATION =====
+
+DEFAULT_DATASET = Path(__file__).parent / "scoping_dataset.jsonl"
+JUDGE_CACHE_FILE = Path(".eval_cache/scoping_judge.jsonl")
+judge_model_name = "gemini-2.5-flash-lite"
+judge_model = init_chat_model(judge_model_name, model_provider="google_genai")
+
+# USD per 1M tokens for gemini-2.5-flash-lite, override with --input-price / --output-price
+input_price_per_mtok = 0.10
+output_price_per_mtok = 0.40
+
+
+# ===== JUDGE SCHEMAS =====
+
+class Criteria(BaseModel):
+    """Individual success criteria evaluation result."""
+    criteria_text: str = Field(
+        description="The specific success criteria being evaluated (e.g., 'Current age is 25', 'Monthly rent below 7k')"
+    )
+    reasoning: str = Field(
+        description="Detailed explanation of why this criteria is or isn't captured in the research brief, including specific evidence from the brief"
+    )
+    is_captured: bool = Field(
+        description="Whether this specific criteria is adequately captured in the research brief (True) or missing/inadequately addressed (False)"
+    )
+
+
+class NoAssumptions(BaseModel):
+    """Evaluation model for checking if research brief makes unwarranted assumptions."""
+    no_assumptions: bool = Field(
+        description="Whether the research brief avoids making unwarranted assumptions. True if the brief only includes information explicitly provided by the user, False if it makes assumptions beyond what was stated."
+    )
+    reasoning: str = Field(
+        description="Detailed explanation of the evaluation decision, including specific examples of any assumptions found or confirmation that no assumptions were made beyond the user's explicit statements."
+    )
+
+
+# ===== JUDGE CACHE =====
+
+class JudgeCache:
+    """Append-only JSONL cache of judge verdicts keyed by prompt + schema hash."""
+
+    def __init__(self, path: Path, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        if enabled and path.exists():
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry["verdict"]
+
+    @staticmethod
+    def key(schema: type[BaseModel], prompt: str) -> str:
+        payload = json.dumps([judge_model_name, schema.__name__, schema.model_json_schema(), prompt], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        verdict = self.entries.get(key) if self.enabled else None
+        if verdict is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return verdict
+
+    def put(self, key: str, verdict: dict) -> None:
+        if not self.enabled:
+            return
+        self.entries[key] = verdict
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"key": key, "verdict": verdict}) + "\n")
+
+
+async def judge(schema: type[BaseModel], prompt: str, cache: JudgeCache, semaphore: asyncio.Semaphore, usage: UsageMetadataCallbackHandler) -> dict:
+    """ structured judge call, served from the cache when the same prompt was judged before """
+    key = cache.key(schema, prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    async with semaphore:
+        response = await judge_model.with_structured_output(schema).ainvoke(
+            [HumanMessage(content=prompt)], config={"callbacks": [usage]}
+        )
+    verdict = response.model_dump()
+    cache.put(key, verdict)
+    return verdict
+
+
+# ===== EVALUATORS =====
+
+async def evaluate_success_criteria(research_brief: str, criteria: list[str], **judge_kwargs) -> dict:
+    """ share of the reference criteria captured by the brief """
+    verdicts = await asyncio.gather(*[
+        judge(Criteria, BRIEF_CRITERIA_PROMPT.format(research_brief=research_brief, criterion=criterion), **judge_kwargs)
+        for criterion in criteria
+    ])
+    captured = sum(1 for v in verdicts if v["is_captured"])
+    return {
+        "key": "success_criteria_score",
+        "score": captured / len(criteria) if criteria else 0.0,
+        "individual_evaluations": [
+            {"criteria": criterion, "captured": v["is_captured"], "reasoning": v["reasoning"]}
+            for criterion, v in zip(criteria, verdicts)
+        ],
+    }
+
+
+async def evaluate_no_assumptions(research_brief: str, criteria: list[str], **judge_kwargs) -> dict:
+    """ 1.0 when the brief adds nothing the user did not state """
+    verdict = await judge(
+        NoAssumptions,
+        BRIEF_HALLUCINATION_PROMPT.format(research_brief=research_brief, success_criteria=str(criteria)),
+        **judge_kwargs,
+    )
+    return {"key": "no_assumptions_score", "score": float(verdict["no_assumptions"]), "reasoning": verdict["reasoning"]}
+
+
+# ===== RUNNER =====
+
+def load_dataset(path: Path) -> list[dict]:
+    examples = []
+    with open(path) as f:
+        for n, line in enumerate(f):
+            if line.strip():
+                example = json.loads(line)
+                example.setdefault("id", f"example_{n}")
+                examples.append(example)
+    return examples
+
+
+def to_messages(raw: list[dict]) -> list:
+    return [HumanMessage(content=m["content"]) if m["role"] == "human" else AIMessage(content=m["content"]) for m in raw]
+
+
+def usage_totals(usage: UsageMetadataCallbackHandler) -> dict:
+    input_tokens = sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values())
+    output_tokens = sum(u.get("output_tokens", 0) for u in usage.usage_metadata.values())
+    cost = (input_tokens * input_price_per_mtok + output_tokens * output_price_per_mtok) / 1_000_000
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "cost_usd": cost}
+
+
+async def run_example(example: dict, repeat: int, semaphore: asyncio.Semaphore, judge_kwargs: dict) -> dict:
+    """ scope one conversation and score its brief """
+    result = {"id": example["id"], "repeat": repeat}
+    async with semaphore:
+        target_usage = UsageMetadataCallbackHandler()
+        start = time.perf_counter()
+        try:
+            state = await scope_research.ainvoke(
+                {"messages": to_messages(example["messages"])},
+                config={"configurable": {"thread_id": str(uuid.uuid4())}, "callbacks": [target_usage]},
+            )
+        except Exception as e:
+            print(f"  {example['id']} (repeat {repeat}) failed: {type(e).__name__}: {e}")
+            return {**result, "error": f"{type(e).__name__}: {e}"}
+        result["latency_s"] = time.perf_counter() - start
+        result["target_usage"] = usage_totals(target_usage)
+
+    research_brief = state.get("research_brief") or ""
+    result["research_brief"] = research_brief
+    result["asked_clarification"] = not research_brief
+
+    judge_usage = UsageMetadataCallbackHandler()
+    kwargs = {**judge_kwargs, "usage": judge_usage}
+    scores = await asyncio.gather(
+        evaluate_success_criteria(research_brief, example["criteria"], **kwargs),
+        evaluate_no_assumptions(research_brief, example["criteria"], **kwargs),
+    )
+    result["scores"] = {s["key"]: s["score"] for s in scores}
+    result["evaluations"] = scores
+    result["judge_usage"] = usage_totals(judge_usage)
+    return result
+
+
+def summarize(results: list[dict], wall_s: float, cache: JudgeCache) -> dict:
+    ok = [r for r in results if "error" not in r]
+    latencies = [r["latency_s"] for r in ok]
+    score_keys = sorted({k for r in ok for k in r["scores"]})
+
+    def total(field: str, key: str) -> float:
+        return sum(r[field][key] for r in ok)
+
+    return {
+        "examples": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": wall_s,
+        "scores": {k: statistics.mean(r["scores"][k] for r in ok) for k in score_keys} if ok else {},
+        "clarification_rate": sum(r["asked_clarification"] for r in ok) / len(ok) if ok else None,
+        "latency_p50_s": statistics.median(latencies) if latencies else None,
+        "latency_max_s": max(latencies) if latencies else None,
+        "target_tokens": {"input": total("target_usage", "input_tokens"), "output": total("target_usage", "output_tokens")},
+        "target_cost_usd": total("target_usage", "cost_usd"),
+        "judge_cost_usd": total("judge_usage", "cost_usd"),
+        "judge_cache": {"hits": cache.hits, "misses": cache.misses},
+    }
+
+
+def print_report(results: list[dict], summary: dict) -> None:
+    print(f"{'example':<28}{'rep':>4}{'latency s':>11}{'in tok':>9}{'out tok':>9}{'cost $':>10}{'criteria':>10}{'no assume':>11}")
+    for r in sorted(results, key=lambda r: (r["id"], r["repeat"])):
+        if "error" in r:
+            print(f"{r['id']:<28}{r['repeat']:>4}  error: {r['error']}")
+            continue
+        usage = r["target_usage"]
+        print(
+            f"{r['id']:<28}{r['repeat']:>4}{r['latency_s']:>11.2f}{usage['input_tokens']:>9}{usage['output_tokens']:>9}"
+            f"{usage['cost_usd']:>10.5f}{r['scores']['success_criteria_score']:>10.2f}{r['scores']['no_assumptions_score']:>11.2f}"
+        )
+    print()
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+async def main_async(args) -> dict:
+    examples = load_dataset(args.dataset)
+    cache = JudgeCache(args.cache_file, enabled=not args.no_cache)
+    judge_kwargs = {"cache": cache, "semaphore": asyncio.Semaphore(args.judge_concurrency)}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    print(f"{len(examples)} examples x {args.repeats} repeats from {args.dataset}, concurrency {args.concurrency}\n")
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_example(example, repeat, semaphore, judge_kwargs)
+        for example in examples
+        for repeat in range(args.repeats)
+    ])
+    summary = summarize(results, time.perf_counter() - start, cache)
+    print_report(results, summary)
+    return {"summary": summary, "results": results}
+
+
+def main():
+    global input_price_per_mtok, output_price_per_mtok
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET)
+    parser.add_argument("--repeats", type=int, default=1, help="runs per example, to see variance")
+    parser.add_argument("--concurrency", type=int, default=4, help="examples scoped at the same time")
+    parser.add_argument("--judge-concurrency", type=int, default=8, help="judge calls in flight")
+    parser.add_argument("--cache-file", type=Path, default=JUDGE_CACHE_FILE)
+    parser.add_argument("--no-cache", action="store_true", help="always call the judge")
+    parser.add_argument("--input-price", type=float, default=input_price_per_mtok, help="USD per 1M input tokens")
+    parser.add_argument("--output-price", type=float, default=output_price_per_mtok, help="USD per 1M output tokens")
+    parser.add_argument("--output", type=Path, help="also write the full report as JSON")
+    args = parser.parse_args()
+
+    input_price_per_mtok, output_price_per_mtok = args.input_price, args.output_price
+    report = asyncio.run(main_async(args))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Per-user admission control with fair sharing across users.
+
+Interactive `simple_chat` requests and deep research runs use separate lanes,
+so chat never queues behind deep research work:
+- interactive lane: `interactive_admission` below, held by every `simple_chat`
+  run, whether started through the LangGraph server or the `/chat` route
+- deep research lane: `deep_research_admission`, held by the research graphs
+  when the LangGraph server runs them for a user; the job queue applies the
+  same policy when claiming jobs (see `research_jobs.claim_next_job`)
+
+`admitted(graph, lane)` enforces a lane on a compiled graph, like `traced`: a
+callback holds one slot for the user of the run (`src/langgraph_auth.py`) from
+the start of the root run until it ends, fails or is cancelled. Runs without a
+user (queue workers, benchmarks, nested graphs) are not counted again.
+
+Within a lane, a request waits when the lane is full or its user already has
+`per_user_limit` runs in flight. Freed slots go to waiting users in round-robin
+order, so one user queueing many runs cannot starve the others.
+
+    async with interactive_admission.admit(user_id):
+        ...
+
+    simple_chat = admitted(profiled(traced(workflow.compile())), interactive_admission)
+"""
+
+import asyncio
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from src.langgraph_auth import USER_KEY
+
+# ===== CONFIGURATION =====
+
+interactive_capacity = int(os.getenv("INTERACTIVE_CAPACITY", "32"))
+interactive_per_user = int(os.getenv("INTERACTIVE_PER_USER", "4"))
+deep_research_capacity = int(os.getenv("DEEP_RESEARCH_CAPACITY", "8"))
+deep_research_per_user = int(os.getenv("DEEP_RESEARCH_PER_USER", "1"))
+max_waiting_per_user = int(os.getenv("MAX_WAITING_PER_USER", "8"))
+
+
+class AdmissionController:
+    """One lane: global capacity, per-user limit and a round-robin queue of waiting users."""
+
+    def __init__(self, name: str, capacity: int, per_user_limit: int, max_waiting_per_user: int = max_waiting_per_user):
+        self.name = name
+        self.capacity = capacity
+        self.per_user_limit = per_user_limit
+        self.max_waiting_per_user = max_waiting_per_user
+        self.running: dict[str, int] = {}
+        # user -> waiting futures, user order is the round-robin order
+        self.waiting: OrderedDict[str, deque] = OrderedDict()
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self.running.values())
+
+    def _can_run(self, user_id: str) -> bool:
+        return self.in_flight < self.capacity and self.running.get(user_id, 0) < self.per_user_limit
+
+    def _grant(self, user_id: str) -> None:
+        self.running[user_id] = self.running.get(user_id, 0) + 1
+        self.stats["admitted"] += 1
+
+    def _dispatch(self) -> None:
+        """ hand free slots to waiting users, one per user per round """
+        progressed = True
+        while progressed and self.in_flight < self.capacity:
+            progressed = False
+            for user_id in list(self.waiting):
+                queue = self.waiting[user_id]
+                while queue and queue[0].done():  # cancelled while waiting
+                    queue.popleft()
+                if not queue:
+                    del self.waiting[user_id]
+                    continue
+                if not self._can_run(user_id):
+                    continue
+                self._grant(user_id)
+                queue.popleft().set_result(None)
+                # served users go to the back of the round-robin order
+                self.waiting.move_to_end(user_id)
+                progressed = True
+                break
+
+    def _release(self, user_id: str) -> None:
+        self.running[user_id] -= 1
+        if not self.running[user_id]:
+            del self.running[user_id]
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, user_id: str):
+        """ hold one slot of this lane for `user_id` while the block runs """
+        user_id = str(user_id)
+        if not self.waiting and self._can_run(user_id):
+            self._grant(user_id)
+        else:
+            queue = self.waiting.setdefault(user_id, deque())
+            if len(queue) >= self.max_waiting_per_user:
+                self.stats["rejected"] += 1
+                raise HTTPException(status_code=429, detail=f"Too many queued {self.name} requests")
+            future = asyncio.get_running_loop().create_future()
+            queue.append(future)
+            self.stats["queued"] += 1
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # slot was granted just before the cancel
+                    self._release(user_id)
+                raise
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    def snapshot(self) -> dict:
+        return {
+            "lane": self.name,
+            "capacity": self.capacity,
+            "per_user_limit": self.per_user_limit,
+            "in_flight": self.in_flight,
+            "waiting": sum(len(q) for q in self.waiting.values()),
+            "users_running": len(self.running),
+            **self.stats,
+        }
+
+
+class AdmissionHandler(AsyncCallbackHandler):
+    """Holds a slot of `lane` for the whole of each root graph run that has a user."""
+
+    raise_error = True      # a 429 from the lane fails the run instead of being logged
+
+    def __init__(self, lane: AdmissionController):
+        self.lane = lane
+        self.held: dict[UUID, Any] = {}
+
+    async def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                             metadata: Optional[dict] = None, **kwargs) -> None:
+        # LangGraph copies primitive configurable values, such as the user id, into the run metadata
+        user_id = (metadata or {}).get(USER_KEY)
+        if parent_run_id is not None or user_id is None:
+            return
+        slot = self.lane.admit(user_id)
+        await slot.__aenter__()     # waits for a slot, the run starts afterwards
+        self.held[run_id] = slot
+
+    async def _release(self, run_id: UUID) -> None:
+        slot = self.held.pop(run_id, None)
+        if slot is not None:
+            await slot.__aexit__(None, None, None)
+
+    async def on_chain_end(self, outputs, *, run_id: UUID, **kwargs) -> None:
+        await self._release(run_id)
+
+    async def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        await self._release(run_id)
+
+
+def admitted(graph, lane: AdmissionController):
+    """ enforce `lane` on every run of a compiled graph """
+    return graph.with_config(callbacks=[AdmissionHandler(lane)])
+
+
+# singleton instances
+interactive_admission = AdmissionController("interactive", interactive_capacity, interactive_per_user)
+deep_research_admission = AdmissionController("deep_research", deep_research_capacity, deep_research_per_user)
@@ -0,0 +1,221 @@
+"""Semantic answer cache in front of `simple_chat`.
+
+Users often ask the same questions of the same uploaded documents. Answers to
+document questions are cached under the embedding of the question, scoped per
+user and per version of that user's document set:
+- similarity >= `answer_threshold`: the cached answer is returned, no LLM call
+- similarity >= `context_threshold`: the cached retrieved context is reused,
+  skipping the tool-decision LLM call and the vector search, and only
+  `generate` runs
+
+The document-set version is a hash of the user's processed documents, so an
+upload (or deletion) moves the user to a new scope and old answers are never
+served again; `invalidate_user` also drops them right away. Entries expire
+after `ttl_s` and each scope keeps its `max_entries` most recently used ones.
+
+The scope comes from the authenticated user of the run (see
+`src/langgraph_auth.py`), so LangGraph server and `/chat` runs share it; runs
+without a user bypass the cache. The version is read from the database in a
+worker thread and memoized per user for `version_ttl_s` (other processes may
+ingest too). Runs restricted to some documents (`configurable.doc_ids`) get a
+scope of their own.
+
+Only the first turn of a conversation is cached: a follow-up ("and in 2023?")
+depends on the turns before it, which the cache key does not capture.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+from langchain_core.messages import BaseMessage
+from sqlalchemy.orm import Session
+
+from src.database import DBDocument, SessionLocal
+from src.langgraph_auth import run_doc_ids, run_user_id
+
+# ===== CONFIGURATION =====
+
+cache_enabled = os.getenv("ANSWER_CACHE", "on") != "off"
+answer_threshold = float(os.getenv("ANSWER_CACHE_ANSWER_THRESHOLD", "0.95"))
+context_threshold = float(os.getenv("ANSWER_CACHE_CONTEXT_THRESHOLD", "0.88"))
+ttl_s = float(os.getenv("ANSWER_CACHE_TTL_S", "3600"))
+max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))    # per scope
+version_ttl_s = float(os.getenv("ANSWER_CACHE_VERSION_TTL_S", "60"))  # memoized document-set versions
+max_scopes = 1000
+max_embeddings = 2048                                               # memoized question embeddings
+min_question_words = 4     # shorter turns are usually follow-ups that only make sense in context
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    embedding: np.ndarray       # unit length
+    answer: str
+    context: str
+    created_at: float
+    hits: int = 0
+
+
+def document_set_version(db: Session, user_id: int) -> str:
+    """ hash of the user's processed documents, changes on every upload or deletion """
+    doc_ids = sorted(
+        doc_id for (doc_id,) in
+        db.query(DBDocument.doc_id).filter(DBDocument.user_id == user_id, DBDocument.status == "processed").all()
+    )
+    return hashlib.sha1("\n".join(doc_ids).encode()).hexdigest()[:16]
+
+
+def load_docs_version(user_id: str) -> Optional[str]:
+    """ `document_set_version` in a session of its own, runs in a worker thread """
+    db = SessionLocal()
+    try:
+        return document_set_version(db, int(user_id))
+    finally:
+        db.close()
+
+
+async def cache_scope(config: Optional[dict]) -> Optional[tuple[str, str]]:
+    """ (user_id, docs_version) of the run, None when the run is not cacheable """
+    user_id = run_user_id(config)
+    if not cache_enabled or user_id is None:
+        return None
+    version = await answer_cache.docs_version(user_id)
+    if version is None:
+        return None
+    doc_ids = run_doc_ids(config)
+    if doc_ids:
+        version += ":" + hashlib.sha1("\n".join(sorted(doc_ids)).encode()).hexdigest()[:8]
+    return user_id, version
+
+
+def cacheable_turn(messages: Sequence[BaseMessage]) -> bool:
+    """ the last question opens its conversation and is long enough to stand alone """
+    last_human = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].type == "human"), None)
+    if last_human is None or any(m.type in ("human", "ai") for m in messages[:last_human]):
+        return False
+    return len(str(messages[last_human].content).split()) >= min_question_words
+
+
+class AnswerCache:
+    """Per-scope LRU of answered document questions, looked up by cosine similarity."""
+
+    def __init__(self):
+        self.scopes: OrderedDict[tuple[str, str], OrderedDict[str, CacheEntry]] = OrderedDict()
+        self.embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.versions: dict[str, tuple[str, float]] = {}     # user -> (document-set version, loaded at)
+        self.stats = {"lookups": 0, "answer_hits": 0, "context_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    async def docs_version(self, user_id: str) -> Optional[str]:
+        """ the user's document-set version, memoized; None when it cannot be read """
+        cached = self.versions.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < version_ttl_s:
+            return cached[0]
+        try:
+            version = await asyncio.to_thread(load_docs_version, user_id)
+        except Exception as e:
+            print(f"Error reading the document set version of user {user_id}: {e}")
+            return None
+        if version is not None:
+            self.versions[user_id] = (version, time.monotonic())
+        return version
+
+    async def embed(self, question: str) -> np.ndarray:
+        """ unit-length question embedding, memoized so lookup and store embed once per question """
+        from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+        cached = self.embeddings.get(question)
+        if cached is not None:
+            self.embeddings.move_to_end(question)
+            return cached
+        vector = np.asarray(await pdf_vector_store_mgr.embeddings.aembed_query(question), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        self.embeddings[question] = vector
+        while len(self.embeddings) > max_embeddings:
+            self.embeddings.popitem(last=False)
+        return vector
+
+    def _entries(self, scope: tuple[str, str]) -> OrderedDict[str, CacheEntry]:
+        entries = self.scopes.get(scope)
+        if entries is None:
+            return OrderedDict()
+        self.scopes.move_to_end(scope)
+        cutoff = time.time() - ttl_s
+        for key in [k for k, e in entries.items() if e.created_at < cutoff]:
+            del entries[key]
+            self.stats["evictions"] += 1
+        return entries
+
+    async def lookup(self, scope: tuple[str, str], question: str) -> tuple[Optional[str], Optional[CacheEntry], float]:
+        """ ("answer" | "context" | None, best entry, similarity) """
+        self.stats["lookups"] += 1
+        entries = self._entries(scope)
+        if not entries:
+            self.stats["misses"] += 1
+            return None, None, 0.0
+
+        query = await self.embed(question)
+        keys = list(entries)
+        similarities = np.stack([entries[k].embedding for k in keys]) @ query
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        entry = entries[keys[best]]
+
+        if similarity >= answer_threshold:
+            kind = "answer"
+        elif similarity >= context_threshold:
+            kind = "context"
+        else:
+            self.stats["misses"] += 1
+            return None, entry, similarity
+        entries.move_to_end(keys[best])
+        entry.hits += 1
+        self.stats[f"{kind}_hits"] += 1
+        return kind, entry, similarity
+
+    async def store(self, scope: tuple[str, str], question: str, answer: str, context: str) -> None:
+        entries = self.scopes.setdefault(scope, OrderedDict())
+        self.scopes.move_to_end(scope)
+        entries[uuid.uuid4().hex] = CacheEntry(
+            question=question,
+            embedding=await self.embed(question),
+            answer=answer,
+            context=context,
+            created_at=time.time(),
+        )
+        self.stats["stores"] += 1
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        while len(self.scopes) > max_scopes:
+            _, dropped = self.scopes.popitem(last=False)
+            self.stats["evictions"] += len(dropped)
+
+    def invalidate_user(self, user_id) -> int:
+        """ drop every cached answer of a user, returns how many were dropped """
+        dropped = 0
+        self.versions.pop(str(user_id), None)
+        for scope in [s for s in self.scopes if s[0] == str(user_id)]:
+            dropped += len(self.scopes.pop(scope))
+        self.stats["invalidations"] += 1
+        return dropped
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": cache_enabled,
+            "scopes": len(self.scopes),
+            "entries": sum(len(e) for e in self.scopes.values()),
+            "answer_threshold": answer_threshold,
+            "context_threshold": context_threshold,
+            **self.stats,
+        }
+
+
+# singleton instance
+answer_cache = AnswerCache()
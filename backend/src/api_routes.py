@@ -1,16 +1,28 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
 from fastapi.responses import JSONResponse
 from typing import List, Optional
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import uuid
 import os
 from datetime import datetime
 
-from src.database import get_db, DBDocument, DBUser
+from src.database import get_db, DBDocument, DBResearchJob, DBUser
 from src.pdf_vector_store_manager import pdf_vector_store_mgr
 from src.pdf_vector_store_manager import PDFVectorStoreMgr
-from src.auth import auth_handler, get_current_user
+from src.auth import auth_handler, get_admin_user, get_current_user
+from src.langgraph_auth import USER_KEY
+from src.admission import deep_research_admission, interactive_admission
+from src.cancellation import cancellation_stats, run_until_disconnect
+from src.answer_cache import answer_cache
+from src.chat_memory import chat_memory
+from src.chat_router import route_stats
+from src.context_packing import packing_stats
+from src.chunk_dedup import dedup_stats
+from src.embedding_writer import writer_stats
+from src.tracing import trace_stats
+from src.ingestion_jobs import submit_ingestion, latest_ingestion, upload_dir
 
 router = APIRouter()
 
@@ -33,6 +45,28 @@ class DocumentResponse(BaseModel):
 class DocumentListResponse(BaseModel):
     documents: List[DocumentResponse]
 
+class IngestionStatusResponse(BaseModel):
+    doc_id: str
+    status: str  # document status: processing, processed, failed
+    job_status: Optional[str] = None  # queued, running, succeeded, failed
+    attempts: int
+    pages_total: Optional[int] = None
+    pages_parsed: int
+    chunks_total: Optional[int] = None
+    chunks_embedded: int
+    error: Optional[str] = None
+
+class ChatMessage(BaseModel):
+    role: str  # human | ai
+    content: str
+
+class ChatRequest(BaseModel):
+    messages: List[ChatMessage]
+    doc_ids: Optional[List[str]] = None  # search only these of the user's documents
+
+class ChatResponse(BaseModel):
+    answer: str
+
 # Authentication routes (keeping the previous implementation)
 @router.post("/auth/register")
 async def register_user(user_data: dict, db: Session = Depends(get_db)):
@@ -105,14 +139,13 @@ async def get_current_user_info(
     }
 
 # PDF upload route
-@router.post("/upload/pdf", response_model=UploadResponse)
+@router.post("/upload/pdf", response_model=UploadResponse, status_code=202)
 async def upload_pdf(
     file: UploadFile = File(...),
     current_user_id: str = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = BackgroundTasks()
+    db: Session = Depends(get_db)
 ):
-    """Upload and process PDF file"""
+    """Upload a PDF and queue it for ingestion, poll `/documents/{doc_id}/status` for progress"""
     # Validate file type
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="File must be a PDF")
@@ -122,43 +155,58 @@ async def upload_pdf(
     if len(file_content) > 10 * 1024 * 1024:  # 10MB
         raise HTTPException(status_code=400, detail="File too large. Maximum 10MB.")
     
-    # Generate unique temp file name
-    temp_filename = f"temp_{uuid.uuid4()}_{file.filename}"
-    temp_path = os.path.join("temp_uploads", temp_filename)
-    
-    # Create temp directory if it doesn't exist
-    os.makedirs("temp_uploads", exist_ok=True)
-    
-    # Save uploaded file temporarily
-    with open(temp_path, "wb") as f:
+    # Keep the file until a worker has ingested it
+    upload_path = os.path.join(upload_dir, f"upload_{uuid.uuid4()}.pdf")
+    os.makedirs(upload_dir, exist_ok=True)
+    with open(upload_path, "wb") as f:
         f.write(file_content)
     
     try:
-        # Process the PDF - this creates DB entry and vector store
-        db_document = await pdf_vector_store_mgr.process_pdf(
-            temp_path,
-            file.filename,
-            int(current_user_id),
-            db
-        )
-        
-        # Clean up temp file after processing
-        background_tasks.add_task(
-            lambda: os.remove(temp_path) if os.path.exists(temp_path) else None
-        )
-        
-        return UploadResponse(
-            doc_id=db_document.doc_id,
-            filename=db_document.original_filename,
-            size=db_document.file_size,
-            upload_date=db_document.upload_date.isoformat(),
-            status=db_document.status
-        )
+        db_document = pdf_vector_store_mgr.create_document(upload_path, file.filename, int(current_user_id), db)
+        submit_ingestion(db, db_document.doc_id, int(current_user_id), upload_path)
     except Exception as e:
-        # Clean up temp file on error
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+    return UploadResponse(
+        doc_id=db_document.doc_id,
+        filename=db_document.original_filename,
+        size=db_document.file_size,
+        upload_date=db_document.upload_date.isoformat(),
+        status=db_document.status
+    )
+
+@router.get("/documents/{doc_id}/status", response_model=IngestionStatusResponse)
+async def document_status(
+    doc_id: str,
+    current_user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Ingestion progress of an uploaded document"""
+    db_document = (
+        db.query(DBDocument)
+        .filter(DBDocument.doc_id == doc_id, DBDocument.user_id == int(current_user_id))
+        .first()
+    )
+    if not db_document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    job = latest_ingestion(db, doc_id)
+    if job is None:
+        # uploaded before ingestion jobs existed
+        return IngestionStatusResponse(doc_id=doc_id, status=db_document.status, attempts=0, pages_parsed=0, chunks_embedded=0)
+    return IngestionStatusResponse(
+        doc_id=doc_id,
+        status=db_document.status,
+        job_status=job.status,
+        attempts=job.attempts or 0,
+        pages_total=job.pages_total,
+        pages_parsed=job.pages_parsed or 0,
+        chunks_total=job.chunks_total,
+        chunks_embedded=job.chunks_embedded or 0,
+        error=job.error,
+    )
 
 # Document management routes
 @router.get("/documents", response_model=DocumentListResponse)
@@ -184,6 +232,60 @@ async def list_documents(
     
     return DocumentListResponse(documents=document_list)
 
+# Interactive chat route, runs on its own admission lane so deep research never delays it
+@router.post("/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Answer a chat turn with `simple_chat`"""
+    from langchain_core.messages import AIMessage, HumanMessage
+    from src.simple_chat import simple_chat
+
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="Messages required")
+
+    messages = [
+        HumanMessage(content=m.content) if m.role == "human" else AIMessage(content=m.content)
+        for m in request.messages
+    ]
+    # scope of document retrieval and of the semantic answer cache
+    config = {"configurable": {USER_KEY: current_user_id, "doc_ids": request.doc_ids}}
+    # simple_chat holds an interactive admission slot for the user while it runs;
+    # stop the run (and free the slot) as soon as the client goes away
+    result = await run_until_disconnect(http_request, simple_chat.ainvoke({"messages": messages}, config=config), kind="chat")
+    return ChatResponse(answer=str(result["messages"][-1].content))
+
+# Operational stats of this process, for admins only (ADMIN_USER_IDS)
+@router.get("/stats")
+async def stats(
+    admin_user_id: str = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admission load, answer cache, chat router, context packing, chat memory, ingestion, cancellation and tracing counters"""
+    job_counts = dict(
+        db.query(DBResearchJob.status, func.count(DBResearchJob.id))
+        .filter(DBResearchJob.status.in_(("queued", "running")))
+        .group_by(DBResearchJob.status)
+        .all()
+    )
+    return {
+        "admission": {
+            "interactive": interactive_admission.snapshot(),
+            "deep_research": deep_research_admission.snapshot(),
+            "deep_research_jobs": job_counts,
+        },
+        "answer_cache": answer_cache.snapshot(),
+        "chat_router": dict(route_stats),       # retrieved by rule / embedding, left to the model
+        "context_packing": dict(packing_stats),  # context tokens before and after packing
+        "chat_memory": dict(chat_memory.stats),
+        "chunk_dedup": dict(dedup_stats),
+        "embedding_writer": dict(writer_stats),
+        "cancellation": dict(cancellation_stats),  # pending tasks cancelled per kind, cleanup time
+        "tracing": dict(trace_stats),   # spans written / lost to write errors, file rotations
+    }
+
 # @router.delete("/documents/{doc_id}")
 # async def delete_document(
 #     doc_id: str,
@@ -1,5 +1,8 @@
+import asyncio
 import pathlib
 import os
+import socket
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
@@ -8,8 +11,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.routing import Route
 
 from src.database import create_tables
+from src.profiling import profiling_middleware
+from src.ingestion_jobs import in_process_worker, worker_loop as ingestion_worker_loop
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # PDF uploads are ingested in the background, see src/ingestion_jobs.py
+    worker = None
+    if in_process_worker:
+        worker = asyncio.create_task(ingestion_worker_loop(f"{socket.gethostname()}-{os.getpid()}-api"))
+    yield
+    if worker is not None:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+app = FastAPI(lifespan=lifespan)
 
 # Turn off CORS (allow all origins)
 app.add_middleware(
@@ -20,9 +36,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request profiling (X-Profile: 1 header, only with PROFILING_ENABLED=1)
+app.middleware("http")(profiling_middleware)
+
 # Import and include API routes after middleware
 from src.api_routes import router as api_router
 app.include_router(api_router, prefix="/api/v1")
+from src.job_routes import router as job_router
+app.include_router(job_router, prefix="/api/v1")
 
 def create_frontend_router(build_dir="frontend/dist"):
     build_path = pathlib.Path(__file__).parent.parent.parent / build_dir
@@ -21,6 +21,9 @@ SECRET_KEY = os.getenv("JWT_SECRET", "your-super-secret-key-change-in-production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Users allowed to read operational stats (`GET /api/v1/stats`), comma separated user ids
+ADMIN_USER_IDS = {user_id.strip() for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
 class AuthHandler:
     def __init__(self):
         self.secret_key = SECRET_KEY
@@ -91,3 +94,13 @@ async def get_current_user(
         )
     
     return user_id
+
+# Dependency restricting a route to the users of ADMIN_USER_IDS
+async def get_admin_user(current_user_id: str = Depends(get_current_user)):
+    """Dependency to get the current user, who must be an admin"""
+    if current_user_id not in ADMIN_USER_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user_id
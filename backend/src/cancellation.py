@@ -0,0 +1,83 @@
+"""Prompt cancellation of a run's task tree, with counters for the work it saved.
+
+A run is cancelled when its client disconnects (the frontend submits with
+`onDisconnect: "cancel"`, the `/chat` route watches the connection) or when a
+job is cancelled explicitly (`POST /jobs/{job_id}/cancel`). The cancel reaches
+the run's asyncio task, and from there:
+- `gather_cancellable` cancels every still-running child (researchers in
+  `supervisor_tools`, tool calls in the researcher, page summarizations) and
+  waits briefly for them to unwind, instead of letting them finish unobserved
+- in-flight `ainvoke` calls are plain awaits and stop with their task
+
+`cancellation_stats` counts what was cut short per kind, and cancelled LLM,
+tool and search spans show up in the tracing report (`python -m src.tracing`).
+"""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Iterable, TypeVar
+
+from fastapi import HTTPException
+
+from src.tracing import trace_event
+
+T = TypeVar("T")
+
+# ===== CONFIGURATION =====
+
+cleanup_timeout_s = 5.0             # how long a cancelled fan-out may take to unwind
+disconnect_poll_interval_s = 0.5
+
+# pending tasks cancelled per kind, plus cleanup time
+cancellation_stats: Counter = Counter()
+
+
+def record_cancelled(kind: str, pending: int, cleanup_s: float = 0.0) -> None:
+    cancellation_stats[f"{kind}_cancelled"] += pending
+    cancellation_stats["cancel_events"] += 1
+    cancellation_stats["cleanup_ms_total"] += int(cleanup_s * 1000)
+    cancellation_stats["cleanup_ms_max"] = max(cancellation_stats["cleanup_ms_max"], int(cleanup_s * 1000))
+
+
+async def gather_cancellable(coros: Iterable[Awaitable[T]], kind: str) -> list[T]:
+    """ `asyncio.gather` that cancels the remaining children when it is cancelled or one child fails """
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException as e:
+        pending = [t for t in tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            started_at = time.time()
+            start = time.perf_counter()
+            await asyncio.wait(pending, timeout=cleanup_timeout_s)
+            cleanup_s = time.perf_counter() - start
+            if isinstance(e, asyncio.CancelledError):
+                record_cancelled(kind, len(pending), cleanup_s)
+                trace_event(f"cancelled.{kind}", "cancel", start=started_at, pending=len(pending), cleanup_s=cleanup_s)
+        raise
+
+
+async def run_until_disconnect(request, coro: Awaitable[T], kind: str = "request") -> T:
+    """ run `coro` for a FastAPI request, cancelling it if the client goes away first """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=disconnect_poll_interval_s)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+    start = time.perf_counter()
+    task.cancel()
+    await asyncio.wait({task}, timeout=cleanup_timeout_s)
+    record_cancelled(kind, 1, time.perf_counter() - start)
+    cancellation_stats["client_disconnects"] += 1
+    # nobody is listening, the status only shows up in access logs
+    raise HTTPException(status_code=499, detail="Client closed request")
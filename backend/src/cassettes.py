@@ -0,0 +1,353 @@
+"""Record/replay cassettes for chat model, embedding and Tavily calls.
+
+Every model, embedding and search client the graphs use is created through
+`cassette_chat_model`, `cassette_embeddings` or `cassette_search_client`. With
+the default `CASSETTE_MODE=off` these return the object unchanged. Otherwise:
+
+- `CASSETTE_MODE=record`: calls go to the real provider, and request-hash ->
+  response entries (with the observed latency) are appended to `CASSETTE_DIR`
+- `CASSETTE_MODE=replay`: calls are answered from the cassettes without network
+  access, after waiting the recorded latency times `CASSETTE_LATENCY_SCALE`
+  (1 = original timings, 0 = as fast as possible)
+
+Replaying the same real-world trace makes scheduling and concurrency changes
+comparable run to run. Requests are hashed without message ids and with dates
+masked. A request whose hash was not recorded (e.g. a prompt changed) falls back
+to the next unused recording of the same model/tool signature, in recorded order.
+
+    CASSETTE_MODE=record CASSETTE_DIR=.cassettes/coffee langgraph dev ...
+    python -m benchmarks.agent_throughput --replay .cassettes/coffee --latency-scale 0
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# ===== CONFIGURATION =====
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_DIR = Path(os.getenv("CASSETTE_DIR", ".cassettes/default"))
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))
+
+# dates from get_today_str() change between recording and replay
+DATE_RE = re.compile(r"\b(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun) (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \d{1,2}, \d{4}\b")
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode when no recording can answer a request."""
+
+
+def _request_key(request: Any) -> str:
+    canonical = DATE_RE.sub("<date>", json.dumps(request, sort_keys=True, default=str))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Append-only JSONL file of recorded calls for one kind of client."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._by_key: dict[str, deque] = defaultdict(deque)
+        self._by_signature: dict[str, deque] = defaultdict(deque)
+        self._used: set[int] = set()
+        self.stats = {"hits": 0, "fallbacks": 0, "recorded": 0}
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        with open(self.path) as f:
+            for n, line in enumerate(f):
+                if line.strip():
+                    entry = json.loads(line)
+                    entry["_n"] = n
+                    self._by_key[entry["key"]].append(entry)
+                    self._by_signature[entry["signature"]].append(entry)
+
+    def record(self, key: str, signature: str, response: Any, **timings) -> None:
+        line = json.dumps({"key": key, "signature": signature, "response": response, **timings}, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+            self.stats["recorded"] += 1
+
+    def lookup(self, key: str, signature: str) -> dict:
+        with self._lock:
+            self._load()
+            # exact match first, repeated identical requests replay in recorded order
+            for source, stat in ((self._by_key[key], "hits"), (self._by_signature[signature], "fallbacks")):
+                while source:
+                    entry = source.popleft()
+                    if entry["_n"] not in self._used:
+                        self._used.add(entry["_n"])
+                        self.stats[stat] += 1
+                        return entry
+        raise CassetteMissError(f"no recording left for {signature} in {self.path}")
+
+
+_cassettes: dict[str, Cassette] = {}
+
+
+def get_cassette(kind: str) -> Cassette:
+    if kind not in _cassettes:
+        _cassettes[kind] = Cassette(CASSETTE_DIR / f"{kind}.jsonl")
+    return _cassettes[kind]
+
+
+def _replay_delay(seconds: Optional[float]) -> float:
+    return max(seconds or 0.0, 0.0) * CASSETTE_LATENCY_SCALE
+
+
+# ===== CHAT MODELS =====
+
+def _normalize_message(message) -> dict:
+    data = message_to_dict(message)
+    payload = dict(data["data"])
+    for volatile in ("id", "response_metadata", "usage_metadata"):
+        payload.pop(volatile, None)
+    return {"type": data["type"], "data": payload}
+
+
+class CassetteChatModel(BaseChatModel):
+    """Chat model wrapper that records or replays the wrapped model's responses."""
+
+    base: Any
+    inner: Any = None
+    cassette_name: str
+    tool_specs: list = []
+    tool_choice: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-chat-model"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        bind_kwargs = {"tool_choice": tool_choice, **kwargs} if tool_choice is not None else kwargs
+        return self.model_copy(update={
+            "inner": self.base.bind_tools(tools, **bind_kwargs),
+            "tool_specs": [convert_to_openai_tool(t) for t in tools],
+            "tool_choice": tool_choice,
+        })
+
+    def _target(self):
+        return self.inner if self.inner is not None else self.base
+
+    def _signature(self) -> str:
+        tools = ",".join(spec["function"]["name"] for spec in self.tool_specs)
+        return f"{self.cassette_name}[{tools}]"
+
+    def _key(self, messages) -> str:
+        return _request_key({
+            "model": self.cassette_name,
+            "tools": self.tool_specs,
+            "tool_choice": self.tool_choice,
+            "messages": [_normalize_message(m) for m in messages],
+        })
+
+    def _replay(self, messages) -> tuple[AIMessage, dict]:
+        entry = get_cassette("chat").lookup(self._key(messages), self._signature())
+        (message,) = messages_from_dict([entry["response"]])
+        return message, entry
+
+    def _store(self, messages, message: AIMessage, latency_s: float, ttft_s: Optional[float] = None) -> None:
+        get_cassette("chat").record(
+            self._key(messages), self._signature(), message_to_dict(message),
+            latency_s=latency_s, ttft_s=ttft_s if ttft_s is not None else latency_s
+        )
+
+    # ----- non-streaming -----
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if CASSETTE_MODE == "replay":
+            message, entry = self._replay(messages)
+            time.sleep(_replay_delay(entry.get("latency_s")))
+        else:
+            start = time.perf_counter()
+            message = self._target().invoke(messages, stop=stop, config={"callbacks": []}, **kwargs)
+            self._store(messages, message, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if CASSETTE_MODE == "replay":
+            message, entry = self._replay(messages)
+            await asyncio.sleep(_replay_delay(entry.get("latency_s")))
+        else:
+            start = time.perf_counter()
+            message = await self._target().ainvoke(messages, stop=stop, config={"callbacks": []}, **kwargs)
+            self._store(messages, message, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    # ----- streaming -----
+
+    @staticmethod
+    def _replay_chunks(message: AIMessage) -> list[AIMessageChunk]:
+        words = str(message.content).split(" ")
+        pieces = [" ".join(words[i:i + 8]) for i in range(0, len(words), 8)] or [""]
+        chunks = [AIMessageChunk(content=p + (" " if i < len(pieces) - 1 else "")) for i, p in enumerate(pieces)]
+        chunks[-1] = AIMessageChunk(
+            content=chunks[-1].content,
+            tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": n}
+                for n, tc in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        )
+        return chunks
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        if CASSETTE_MODE == "replay":
+            message, entry = self._replay(messages)
+            chunks = self._replay_chunks(message)
+            ttft = _replay_delay(entry.get("ttft_s"))
+            per_chunk = max(_replay_delay(entry.get("latency_s")) - ttft, 0.0) / len(chunks)
+            await asyncio.sleep(ttft)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(per_chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(str(chunk.content), chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        start = time.perf_counter()
+        ttft = None
+        full = None
+        async for chunk in self._target().astream(messages, stop=stop, config={"callbacks": []}, **kwargs):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            full = chunk if full is None else full + chunk
+            generation_chunk = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(str(chunk.content), chunk=generation_chunk)
+            yield generation_chunk
+        if full is not None:
+            message = AIMessage(
+                content=full.content,
+                tool_calls=full.tool_calls,
+                usage_metadata=full.usage_metadata,
+                additional_kwargs=full.additional_kwargs,
+            )
+            self._store(messages, message, time.perf_counter() - start, ttft)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        # sync streaming is not used by the graphs, serve it from a single generation
+        result = self._generate(messages, stop=stop, **kwargs)
+        message = result.generations[0].message
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content=message.content,
+            tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": n}
+                for n, tc in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        ))
+
+
+def cassette_chat_model(model: BaseChatModel, name: str) -> BaseChatModel:
+    """ wrap a chat model for record/replay, `name` separates cassette entries of different call sites """
+    if CASSETTE_MODE == "off":
+        return model
+    return CassetteChatModel(base=model, cassette_name=name)
+
+
+# ===== EMBEDDINGS =====
+
+class CassetteEmbeddings(Embeddings):
+    """Embeddings wrapper that records or replays embedding vectors."""
+
+    def __init__(self, inner: Embeddings, name: str):
+        self.inner = inner
+        self.name = name
+
+    def _key(self, method: str, payload: Any) -> tuple[str, str]:
+        return _request_key({"model": self.name, "method": method, "input": payload}), f"{self.name}.{method}"
+
+    def _call(self, method: str, payload: Any, fn):
+        key, signature = self._key(method, payload)
+        if CASSETTE_MODE == "replay":
+            entry = get_cassette("embeddings").lookup(key, signature)
+            time.sleep(_replay_delay(entry.get("latency_s")))
+            return entry["response"]
+        start = time.perf_counter()
+        result = fn()
+        get_cassette("embeddings").record(key, signature, result, latency_s=time.perf_counter() - start)
+        return result
+
+    async def _acall(self, method: str, payload: Any, coro_fn):
+        key, signature = self._key(method, payload)
+        if CASSETTE_MODE == "replay":
+            entry = get_cassette("embeddings").lookup(key, signature)
+            await asyncio.sleep(_replay_delay(entry.get("latency_s")))
+            return entry["response"]
+        start = time.perf_counter()
+        result = await coro_fn()
+        get_cassette("embeddings").record(key, signature, result, latency_s=time.perf_counter() - start)
+        return result
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._call("embed_documents", texts, lambda: self.inner.embed_documents(texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._call("embed_query", text, lambda: self.inner.embed_query(text))
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._acall("embed_documents", texts, lambda: self.inner.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self._acall("embed_query", text, lambda: self.inner.aembed_query(text))
+
+
+def cassette_embeddings(embeddings: Embeddings, name: str) -> Embeddings:
+    if CASSETTE_MODE == "off":
+        return embeddings
+    return CassetteEmbeddings(embeddings, name)
+
+
+# ===== SEARCH =====
+
+class CassetteSearchClient:
+    """Tavily client wrapper that records or replays `search` responses."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def search(self, query: str, **kwargs) -> dict:
+        cassette = get_cassette("search")
+        key = _request_key({"query": query, **kwargs})
+        if CASSETTE_MODE == "replay":
+            entry = cassette.lookup(key, "tavily.search")
+            time.sleep(_replay_delay(entry.get("latency_s")))
+            return entry["response"]
+        start = time.perf_counter()
+        result = self.inner.search(query, **kwargs)
+        cassette.record(key, "tavily.search", result, latency_s=time.perf_counter() - start)
+        return result
+
+
+def cassette_search_client(client):
+    if CASSETTE_MODE == "off":
+        return client
+    return CassetteSearchClient(client)
+
+
+def cassette_stats() -> dict:
+    """ hits / fallbacks / recorded entries per cassette, for benchmark reports """
+    return {kind: dict(cassette.stats) for kind, cassette in _cassettes.items()}
@@ -0,0 +1,171 @@
+"""Token-budgeted conversation memory for `simple_chat`.
+
+Each turn sends the model a window of the conversation instead of the whole
+history:
+- the most recent messages, verbatim, within `history_token_budget`; the
+  current turn is always sent whole, however long
+- a running summary of everything older, added to the system prompt
+
+The summary is updated incrementally: once the messages that no longer fit the
+window add up to `fold_batch_tokens`, a background task folds them into the
+previous summary with one small LLM call. The turn itself never waits for it;
+until the fold lands, the unsummarized messages stay in the window (capped at
+`history_token_budget + fold_batch_tokens`).
+
+Summaries live in process memory, keyed by the user and the LangGraph
+`thread_id`, or by the user and the first message when a caller sends the full
+history without one (`/chat`), so two users opening with "hi" never share one.
+
+    summary, window = chat_memory.window(messages, config)
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from langchain.chat_models import init_chat_model
+from langchain_core.messages import BaseMessage, HumanMessage, get_buffer_string, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
+
+from src.cassettes import cassette_chat_model
+from src.langgraph_auth import run_user_id
+from src.prompts import conversation_summary_prompt
+
+# ===== CONFIGURATION =====
+
+history_token_budget = int(os.getenv("CHAT_HISTORY_TOKENS", "2000"))   # recent messages kept verbatim
+fold_batch_tokens = int(os.getenv("CHAT_FOLD_BATCH_TOKENS", "1000"))   # overflow folded into the summary at once
+max_threads = 1000                                                     # summaries kept in memory (LRU)
+
+summary_model = cassette_chat_model(init_chat_model(model="gemini-2.5-flash-lite", model_provider="google_genai"), "chat_summary")
+
+
+@dataclass
+class ThreadSummary:
+    summary: str = ""
+    summarized: int = 0         # leading messages already folded into `summary`
+    fingerprint: str = ""       # hash of those messages, detects a rewritten history
+
+
+def _fingerprint(messages: Sequence[BaseMessage]) -> str:
+    digest = hashlib.sha1()
+    for msg in messages:
+        digest.update(f"{msg.type}:{msg.content}".encode())
+    return digest.hexdigest()
+
+
+def _thread_key(messages: Sequence[BaseMessage], config: Optional[dict]) -> str:
+    user = f"user:{run_user_id(config)}"
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    if thread_id:
+        return f"{user}|thread:{thread_id}"
+    return f"{user}|history:{_fingerprint(messages[:1])}"
+
+
+def _tokens(messages: Sequence[BaseMessage]) -> int:
+    return count_tokens_approximately(messages) if messages else 0
+
+
+def _trim(messages: Sequence[BaseMessage], max_tokens: int) -> list[BaseMessage]:
+    """ most recent messages within `max_tokens`, starting on a human turn
+
+    The current turn (from the last human message on) is always kept, even when
+    it alone is over budget: the question must reach the model and is never folded.
+    """
+    last_human = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].type == "human"), None)
+    if last_human is None:
+        return []
+    current = list(messages[last_human:])
+    budget = max_tokens - _tokens(current)
+    if budget <= 0 or last_human == 0:
+        return current
+    return trim_messages(
+        messages[:last_human],
+        max_tokens=budget,
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human",
+        allow_partial=False,
+    ) + current
+
+
+class ChatMemory:
+    """Running summaries per conversation, plus the background tasks that fold into them."""
+
+    def __init__(self):
+        self.summaries: OrderedDict[str, ThreadSummary] = OrderedDict()
+        self.folding: dict[str, asyncio.Task] = {}
+        self.stats = {"turns": 0, "folds": 0, "fold_errors": 0, "tokens_in_history": 0, "tokens_sent": 0, "summary_tokens": 0}
+
+    def _get(self, key: str, messages: Sequence[BaseMessage]) -> ThreadSummary:
+        state = self.summaries.get(key)
+        if state is None:
+            return ThreadSummary()
+        self.summaries.move_to_end(key)
+        if state.summarized > len(messages) or _fingerprint(messages[:state.summarized]) != state.fingerprint:
+            # history was edited or belongs to another conversation
+            del self.summaries[key]
+            return ThreadSummary()
+        return state
+
+    def window(self, messages: Sequence[BaseMessage], config: Optional[dict] = None, count: bool = True) -> tuple[str, list[BaseMessage]]:
+        """ (running summary, recent messages) to send instead of `messages`; schedules a fold when due """
+        key = _thread_key(messages, config)
+        state = self._get(key, messages)
+        unsummarized = list(messages[state.summarized:])
+        recent = _trim(unsummarized, history_token_budget + fold_batch_tokens)
+
+        overflow = unsummarized[:len(unsummarized) - len(_trim(unsummarized, history_token_budget))]
+        if _tokens(overflow) >= fold_batch_tokens or len(recent) < len(unsummarized):
+            self._schedule_fold(key, list(messages), state, len(overflow))
+
+        if count:
+            self.stats["turns"] += 1
+            self.stats["tokens_in_history"] += _tokens(messages)
+            self.stats["tokens_sent"] += _tokens(recent) + (_tokens([HumanMessage(state.summary)]) if state.summary else 0)
+        return state.summary, recent
+
+    def _schedule_fold(self, key: str, messages: list[BaseMessage], state: ThreadSummary, n_fold: int) -> None:
+        if not n_fold or key in self.folding:
+            return
+        # fresh context: the fold outlives the turn and must not report into its callbacks / trace
+        task = asyncio.get_running_loop().create_task(self._fold(key, messages, state, n_fold), context=contextvars.Context())
+        self.folding[key] = task
+        task.add_done_callback(lambda _: self.folding.pop(key, None))
+
+    async def _fold(self, key: str, messages: list[BaseMessage], state: ThreadSummary, n_fold: int) -> None:
+        """ fold `n_fold` messages after the summarized prefix into the running summary """
+        summarized = state.summarized + n_fold
+        to_fold = [m for m in messages[state.summarized:summarized] if m.type in ("human", "ai") and m.content]
+        try:
+            response = await summary_model.ainvoke([HumanMessage(content=conversation_summary_prompt.format(
+                summary=state.summary or "(none)",
+                new_messages=get_buffer_string(to_fold),
+            ))])
+        except Exception as e:
+            self.stats["fold_errors"] += 1
+            print(f"Could not update the summary of conversation {key}: {e}")
+            return
+        self.summaries[key] = ThreadSummary(
+            summary=str(response.content).strip(),
+            summarized=summarized,
+            fingerprint=_fingerprint(messages[:summarized]),
+        )
+        self.summaries.move_to_end(key)
+        while len(self.summaries) > max_threads:
+            self.summaries.popitem(last=False)
+        self.stats["folds"] += 1
+        self.stats["summary_tokens"] += (response.usage_metadata or {}).get("total_tokens", 0)
+
+    async def drain(self) -> None:
+        """ wait for in-flight folds (benchmarks, shutdown) """
+        if self.folding:
+            await asyncio.gather(*list(self.folding.values()), return_exceptions=True)
+
+
+# singleton instance
+chat_memory = ChatMemory()
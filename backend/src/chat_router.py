@@ -0,0 +1,98 @@
+"""Local fast-path router for `simple_chat`.
+
+Without it every document question costs two LLM round trips: `call_model`
+only decides to call `retrieve_tool`, then `generate` answers. The router
+decides locally instead, before any LLM call:
+1. rules: questions that name the uploaded material ("the document", "this
+   pdf", "according to the report", "page 3", ...) retrieve directly, unless
+   the search finds nothing
+2. small talk and questions about the assistant go to the model
+3. otherwise the question is embedded and searched once; if the best chunk of
+   the corpus is similar enough (`route_similarity_threshold`), that search
+   result is the retrieval
+4. anything else falls back to the model's own tool decision
+
+A routed retrieval goes straight to `generate`, so the turn takes one LLM call.
+The search done in step 3 is reused, so it adds no retrieval of its own. Like
+`retrieve_tool`, it only searches the user's own documents; a run without a
+user finds nothing and goes to the model.
+"""
+
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional
+
+from langchain_core.documents import Document
+
+from src.context_packing import retrieval_k
+from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+# ===== CONFIGURATION =====
+
+router_enabled = os.getenv("CHAT_ROUTER", "on") != "off"
+route_similarity_threshold = float(os.getenv("CHAT_ROUTER_SIMILARITY", "0.75"))
+
+DOCUMENT_PATTERN = re.compile(
+    r"\b(the|this|that|my|our|uploaded|attached)\s+(document|doc|pdf|file|paper|report|article|slides?|contract|manual)s?\b"
+    r"|\baccording to\b|\bin the (text|document|pdf|paper|report)\b"
+    r"|\b(page|section|chapter|table|figure)\s+\d+",
+    re.IGNORECASE,
+)
+SMALL_TALK_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|ok(ay)?|good (morning|afternoon|evening)|bye)\b"
+    r"|\b(who|what) are you\b|\byour name\b",
+    re.IGNORECASE,
+)
+
+route_stats: Counter = Counter()
+
+Route = Literal["retrieve", "model"]
+
+
+@dataclass
+class RouteDecision:
+    """Where a turn goes, and the retrieval when the router already did it."""
+    route: Route
+    reason: str
+    context: str = ""
+    docs: List[Document] = field(default_factory=list)
+    similarity: float = 0.0
+
+
+def rule_route(question: str) -> Optional[Route]:
+    """ decision from the rules alone, None when they do not apply """
+    if DOCUMENT_PATTERN.search(question):
+        return "retrieve"
+    if SMALL_TALK_PATTERN.search(question):
+        return "model"
+    return None
+
+
+async def route_question(question: str, user_id: Optional[str] = None, doc_ids: Optional[List[str]] = None) -> RouteDecision:
+    if not router_enabled or not question.strip():
+        return RouteDecision("model", "disabled")
+
+    decision = rule_route(question)
+    if decision == "model":
+        route_stats["model_rule"] += 1
+        return RouteDecision("model", "rule")
+
+    context, docs, similarities = await pdf_vector_store_mgr.similarity_search_with_score(
+        query=question, k=retrieval_k, user_id=user_id, doc_ids=doc_ids
+    )
+    best = max(similarities, default=0.0)
+    if not docs:
+        # nothing uploaded (or no user): the model answers, or says there is no document
+        route_stats["model_no_docs"] += 1
+        return RouteDecision("model", "no_docs")
+    if decision == "retrieve":
+        route_stats["retrieve_rule"] += 1
+        return RouteDecision("retrieve", "rule", context, docs, best)
+    if best >= route_similarity_threshold:
+        route_stats["retrieve_embedding"] += 1
+        return RouteDecision("retrieve", "embedding", context, docs, best)
+    # ambiguous: the model decides, as before
+    route_stats["model_fallback"] += 1
+    return RouteDecision("model", "fallback", similarity=best)
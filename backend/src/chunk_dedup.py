@@ -0,0 +1,115 @@
+"""Chunk embedding cache and duplicate chunk elimination for PDF ingestion.
+
+Revisions of the same paper and boilerplate (headers, legal text) produce the
+same chunks again and again:
+- `EmbeddingCache` keeps chunk embeddings in their own Chroma collection, keyed
+  by a hash of the embedding model and the chunk text, so a chunk seen before
+  (in any document) is not embedded again
+- `ChunkDeduplicator` removes exact duplicates (same text up to whitespace)
+  and near duplicates within a document before they are embedded or stored,
+  batch by batch as the pages are parsed. Near duplicates are found by word
+  shingle Jaccard similarity with `src/near_duplicates.py`, and only when they
+  carry the same numbers: chunks that differ in a figure hold different data.
+- `strip_page_numbers` removes page number lines ("Page 3 of 9", "- 3 -")
+  from a page before it is split, so pages that repeat a header or a legal
+  text match
+
+Chunks repeated across documents are kept, every document must stay searchable
+and deletable on its own, but their embeddings come from the cache.
+"""
+
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from src.near_duplicates import NearDuplicateIndex, shingles
+
+# ===== CONFIGURATION =====
+
+near_duplicate_threshold = float(os.getenv("CHUNK_NEAR_DUPLICATE_THRESHOLD", "0.8"))   # word shingle Jaccard
+near_duplicate_window = 8192    # kept chunks remembered for near-duplicate checks
+
+# "Page 3", "Page 3 of 9", "p. 3", "3 of 9", "- 3 -"; a bare number may be a table cell and is kept
+PAGE_NUMBER_LINE = re.compile(
+    r"^[ \t]*(?:(?:page|p\.)[ \t]*\d+(?:[ \t]*(?:of|/)[ \t]*\d+)?|\d+[ \t]+of[ \t]+\d+|[-\u2013\u2014][ \t]*\d+[ \t]*[-\u2013\u2014])[ \t]*(?:\r?\n|$)",
+    re.IGNORECASE | re.MULTILINE,
+)
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+dedup_stats: Counter = Counter()
+
+
+def strip_page_numbers(text: str) -> str:
+    """ `text` without lines that only hold a page number """
+    return PAGE_NUMBER_LINE.sub("", text)
+
+
+def _exact_key(text: str) -> bytes:
+    return hashlib.sha256(" ".join(text.split()).encode()).digest()
+
+
+class ChunkDeduplicator:
+    """Drops duplicate chunks from a document arriving in batches (pages as they are parsed).
+
+    Exact duplicates are caught across the whole document; near duplicates
+    against the last `near_duplicate_window` kept chunks, so memory stays
+    bounded on very long documents.
+    """
+
+    def __init__(self):
+        self.seen: set = set()
+        self.index = NearDuplicateIndex(near_duplicate_threshold, window=near_duplicate_window)
+
+    def filter(self, docs: Sequence[Document]) -> List[Document]:
+        """ `docs` without chunks duplicating an earlier one (of this or an earlier batch), first occurrence kept """
+        kept = []
+        for doc in docs:
+            key = _exact_key(doc.page_content)
+            if key in self.seen:
+                dedup_stats["exact_duplicates"] += 1
+                continue
+            self.seen.add(key)
+
+            chunk_shingles = shingles(doc.page_content)
+            numbers = sorted(NUMBER_RE.findall(doc.page_content))
+            if numbers in self.index.matches(chunk_shingles):
+                dedup_stats["near_duplicates"] += 1
+                continue
+            self.index.add(chunk_shingles, numbers)
+            kept.append(doc)
+        return kept
+
+
+def drop_duplicate_chunks(docs: Sequence[Document]) -> List[Document]:
+    """ `docs` without exact and near-duplicate chunks, first occurrence kept """
+    return ChunkDeduplicator().filter(docs)
+
+
+class EmbeddingCache:
+    """Chunk embeddings by content hash, stored in a Chroma collection next to the documents."""
+
+    def __init__(self, store, model: str):
+        self.store = store      # langchain Chroma, only its collection is used
+        self.model = model
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode()).hexdigest()
+
+    def lookup(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """ cached embedding per text, None for misses (blocking, run in a thread) """
+        keys = [self.key(t) for t in texts]
+        found = self.store._collection.get(ids=list(set(keys)), include=["embeddings"])
+        by_key = {k: list(e) for k, e in zip(found["ids"], found["embeddings"])}
+        vectors = [by_key.get(k) for k in keys]
+        hits = sum(v is not None for v in vectors)
+        dedup_stats["embedding_cache_hits"] += hits
+        dedup_stats["embedding_cache_misses"] += len(texts) - hits
+        return vectors
+
+    def put(self, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        unique = {self.key(t): v for t, v in zip(texts, vectors)}
+        self.store._collection.upsert(ids=list(unique), embeddings=list(unique.values()))
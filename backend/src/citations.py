@@ -0,0 +1,157 @@
+"""Global source table and citation dedup for research notes.
+
+Every researcher's compressed notes carry their own numbered source list, so the
+same URLs and titles are repeated once per note and the local numbers clash
+between notes. `dedupe_citations` builds one numbered, deduplicated table across
+all notes, rewrites in-note citations to the global numbers and strips the
+per-note source lists, so the report prompt carries each source exactly once and
+the report keeps consistent citation numbering.
+"""
+
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+URL_RE = re.compile(r"https?://[^\s<>\"')\]]+")
+MARKDOWN_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
+# [3] or [1, 2] but not the text part of a markdown link; may also be a bracketed
+# year or figure, so only numbers found in a note's sources list are rewritten
+CITATION_RE = re.compile(r"\[(\d+(?:\s*,\s*\d+)*)\](?!\()")
+# "### Sources", "**List of All Relevant Sources ...**", "Sources:"
+SOURCES_HEADING_RE = re.compile(r"^\s*(?:#+.*|\*\*.*\*\*:?|.{0,40}):?\s*$", re.IGNORECASE)
+SOURCE_NUMBER_RE = re.compile(r"^\s*(?:[-*]\s*)?\[?(\d+)[\].)]")
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+
+def normalize_url(url: str) -> str:
+    """ canonical form used to decide whether two URLs are the same source """
+    url = url.strip().rstrip(".,;:")
+    parts = urlsplit(url)
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    ])
+    path = parts.path.rstrip("/") or ""
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower().removeprefix("www."), path, query, ""))
+
+
+class SourceTable:
+    """Numbered, deduplicated table of sources shared by all notes."""
+
+    def __init__(self):
+        self._numbers: dict[str, int] = {}          # normalized url -> number
+        self.sources: list[tuple[str, str]] = []    # (title, url), index = number - 1
+
+    def add(self, url: str, title: str = "") -> int:
+        key = normalize_url(url)
+        if key not in self._numbers:
+            self.sources.append((title.strip() or url, url.strip().rstrip(".,;:")))
+            self._numbers[key] = len(self.sources)
+        else:
+            # keep the most descriptive title seen for the source
+            number = self._numbers[key]
+            current_title, current_url = self.sources[number - 1]
+            if current_title == current_url and title.strip():
+                self.sources[number - 1] = (title.strip(), current_url)
+        return self._numbers[key]
+
+    def get(self, number: int) -> tuple[str, str]:
+        return self.sources[number - 1]
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def format(self, numbers: Optional[list[int]] = None) -> str:
+        """ render as `[n] Title: URL` lines, optionally only for the given numbers """
+        numbers = numbers if numbers is not None else range(1, len(self.sources) + 1)
+        return "\n".join(f"[{n}] {self.get(n)[0]}: {self.get(n)[1]}" for n in numbers)
+
+
+# ===== PARSING =====
+
+def _split_sources_section(note: str) -> tuple[str, list[str]]:
+    """ split a note into its body and the lines of its trailing sources list """
+    lines = note.splitlines()
+    for i in range(len(lines) - 1, -1, -1):
+        line = lines[i]
+        is_heading = "sources" in line.lower() and SOURCES_HEADING_RE.match(line) and not URL_RE.search(line)
+        if is_heading:
+            source_lines = [line for line in lines[i + 1:] if URL_RE.search(line)]
+            if source_lines:
+                return "\n".join(lines[:i]).rstrip(), source_lines
+    return note, []
+
+
+def _parse_source_line(line: str) -> tuple[int, str, str]:
+    """ returns (local number or 0, title, url) for lines like `[1] Title: URL` or `1. [Title](URL)` """
+    number_match = SOURCE_NUMBER_RE.match(line)
+    local_number = int(number_match.group(1)) if number_match else 0
+
+    link = MARKDOWN_LINK_RE.search(line)
+    if link:
+        return local_number, link.group(1), link.group(2)
+
+    url_match = URL_RE.search(line)
+    title = line[number_match.end() if number_match else 0:url_match.start()]
+    title = title.strip().strip("*").strip().rstrip(":-–—").strip()
+    return local_number, title, url_match.group(0)
+
+
+# ===== REWRITING =====
+
+def dedupe_citations(notes: list[str]) -> tuple[list[str], SourceTable]:
+    """Rewrite notes against one global source table.
+
+    Args:
+        notes: Compressed research notes, each with inline `[n]` citations and its own sources list
+
+    Returns:
+        The rewritten notes (global citation numbers, no per-note sources list) and the table
+
+    Brackets that cite none of the note's sources are left as they are:
+
+    >>> notes, table = dedupe_citations(["In [2023] growth was 4% [1].\\n\\n### Sources\\n[1] Report: https://example.com/r"])
+    >>> notes[0]
+    'In [2023] growth was 4% [1].'
+    """
+    table = SourceTable()
+    rewritten = []
+
+    for note in notes:
+        body, source_lines = _split_sources_section(note)
+
+        local_to_global: dict[int, int] = {}
+        for line in source_lines:
+            local_number, title, url = _parse_source_line(line)
+            global_number = table.add(url, title)
+            if local_number:
+                local_to_global[local_number] = global_number
+
+        def replace_citation(match: re.Match) -> str:
+            numbers = [int(n) for n in re.split(r"\s*,\s*", match.group(1))]
+            resolved = [str(local_to_global[n]) for n in numbers if n in local_to_global]
+            if not resolved:
+                # not a citation of this note, e.g. "[2023]"
+                return match.group(0)
+            # the rest of a citation that does resolve would point at the wrong global source
+            return "[" + ", ".join(resolved) + "]"
+
+        def replace_link(match: re.Match) -> str:
+            return f"{match.group(1)} [{table.add(match.group(2), match.group(1))}]"
+
+        body = CITATION_RE.sub(replace_citation, body)
+        body = MARKDOWN_LINK_RE.sub(replace_link, body)
+        rewritten.append(body)
+
+    return rewritten, table
+
+
+def cited_numbers(text: str, table: SourceTable) -> list[int]:
+    """ global source numbers cited in the text, in order of first citation """
+    seen: dict[int, None] = {}
+    for match in CITATION_RE.finditer(text):
+        for n in re.split(r"\s*,\s*", match.group(1)):
+            if 1 <= int(n) <= len(table):
+                seen.setdefault(int(n), None)
+    return list(seen)
@@ -0,0 +1,147 @@
+"""Context packing for `simple_chat.generate`.
+
+Retrieved chunks used to be pasted into the prompt verbatim: the 200 character
+overlap between neighbouring chunks twice, near-duplicates (repeated headers,
+boilerplate) several times. `pack_context` turns the retrieved documents into a
+compact context instead:
+1. drops exact and near-duplicate chunks
+2. selects chunks by maximal marginal relevance (MMR): relevance is the
+   retrieval rank blended with query-term overlap, redundancy is the word
+   shingle Jaccard (`src/near_duplicates.py`) with chunks already selected,
+   both computed locally
+3. merges chunks that are neighbours on the same page, keeping their shared
+   overlap once
+4. packs the result into `context_token_budget` tokens
+
+Tokens before and after are returned with the context and summed in
+`packing_stats`.
+"""
+
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Sequence
+
+from langchain_core.documents import Document
+
+from src.near_duplicates import jaccard, shingles, words
+
+# ===== CONFIGURATION =====
+
+retrieval_k = int(os.getenv("RETRIEVAL_K", "8"))                # chunks retrieved, packing keeps what fits
+context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+mmr_lambda = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))     # 1.0 = relevance only, 0.0 = diversity only
+duplicate_threshold = 0.85      # shingle Jaccard at or above which a chunk counts as a duplicate
+min_overlap_chars = 20          # shorter shared edges are coincidence, not splitter overlap
+max_overlap_chars = 400         # splitter overlap is 200, leave room for whitespace differences
+
+packing_stats: Counter = Counter()
+
+
+@dataclass
+class PackedContext:
+    text: str
+    docs: List[Document]
+    tokens_before: int
+    tokens_after: int
+
+
+def count_tokens(text: str) -> int:
+    """ same approximation as langchain's count_tokens_approximately """
+    return (len(text) + 3) // 4
+
+
+def _page_key(doc: Document):
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+
+def _overlap(a: str, b: str) -> int:
+    """ length of the longest suffix of `a` that is a prefix of `b` """
+    for n in range(min(len(a), len(b), max_overlap_chars), min_overlap_chars - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def _format(docs: Sequence[Document]) -> str:
+    # same layout as PDFVectorStoreMgr.format_docs
+    return "\n\n".join(f"source: {doc.metadata}\n content: {doc.page_content}" for doc in docs)
+
+
+def select_mmr(query: str, docs: Sequence[Document]) -> list[Document]:
+    """ all non-duplicate docs, ordered by maximal marginal relevance """
+    query_words = set(words(query))
+    candidates = []
+    for rank, doc in enumerate(docs):
+        doc_words = set(words(doc.page_content))
+        term_overlap = len(query_words & doc_words) / len(query_words) if query_words else 0.0
+        rank_score = 1 - rank / max(len(docs), 1)
+        candidates.append((doc, 0.5 * rank_score + 0.5 * term_overlap, shingles(doc.page_content)))
+
+    selected: list[tuple[Document, set]] = []
+    while candidates:
+        def mmr(candidate):
+            _, relevance, doc_shingles = candidate
+            redundancy = max((jaccard(doc_shingles, s) for _, s in selected), default=0.0)
+            return mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+
+        best = max(candidates, key=mmr)
+        candidates.remove(best)
+        doc, _, doc_shingles = best
+        if any(jaccard(doc_shingles, s) >= duplicate_threshold for _, s in selected):
+            packing_stats["duplicates_dropped"] += 1
+            continue
+        selected.append((doc, doc_shingles))
+    return [doc for doc, _ in selected]
+
+
+def merge_neighbours(docs: Sequence[Document]) -> list[Document]:
+    """ merge chunks of the same page whose edges overlap, in place of the first of them """
+    merged: list[Document] = []
+    for doc in docs:
+        for i, other in enumerate(merged):
+            if _page_key(other) != _page_key(doc) or _page_key(doc) == (None, None):
+                continue
+            if n := _overlap(other.page_content, doc.page_content):
+                text = other.page_content + doc.page_content[n:]
+            elif n := _overlap(doc.page_content, other.page_content):
+                text = doc.page_content + other.page_content[n:]
+            else:
+                continue
+            merged[i] = Document(page_content=text, metadata=other.metadata)
+            packing_stats["chunks_merged"] += 1
+            packing_stats["overlap_chars_trimmed"] += n
+            break
+        else:
+            merged.append(doc)
+    return merged
+
+
+def pack_context(query: str, docs: Sequence[Document], budget: int = None) -> PackedContext:
+    """ compact, deduplicated context for `docs` within `budget` tokens """
+    budget = budget or context_token_budget
+    tokens_before = count_tokens(_format(docs))
+
+    packed: list[Document] = []
+    used = 0
+    for doc in merge_neighbours(select_mmr(query, docs)):
+        tokens = count_tokens(_format([doc]))
+        if used + tokens > budget:
+            remaining_chars = (budget - used) * 4 - len(_format([Document(page_content="", metadata=doc.metadata)]))
+            if remaining_chars < 200:
+                packing_stats["chunks_over_budget"] += 1
+                continue
+            # cut the last chunk at a sentence boundary rather than dropping it
+            text = doc.page_content[:remaining_chars]
+            text = text[:text.rfind(". ") + 1] or text
+            doc = Document(page_content=text, metadata=doc.metadata)
+            tokens = count_tokens(_format([doc]))
+        packed.append(doc)
+        used += tokens
+
+    text = _format(packed)
+    tokens_after = count_tokens(text)
+    packing_stats["answers"] += 1
+    packing_stats["tokens_before"] += tokens_before
+    packing_stats["tokens_after"] += tokens_after
+    return PackedContext(text=text, docs=packed, tokens_before=tokens_before, tokens_after=tokens_after)
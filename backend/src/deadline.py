@@ -0,0 +1,69 @@
+"""Run-level deadlines for deep research runs.
+
+A run gets a time budget through the invocation config:
+
+    deep_research_agent.ainvoke(inputs, config={"configurable": {"time_budget_s": 180}})
+
+(or an absolute `deadline` as a unix timestamp). The first node of the run
+resolves it into two absolute timestamps kept in graph state:
+- `deadline`: when the whole run should be done
+- `research_deadline`: when research must stop, leaving the reporter a reserved slice
+
+The supervisor stops dispatching researchers when too little research time is
+left, researchers compress what they have when their deadline approaches, and
+the reporter always keeps its reserved slice.
+"""
+
+import time
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+
+# ===== CONFIGURATION =====
+
+# share of the run budget reserved for the final report, bounded below and above
+report_reserve_fraction = 0.25
+min_report_reserve_s = 20.0
+max_report_reserve_s = 120.0
+
+# the supervisor won't start a research round with less time left than this
+min_research_round_s = 45.0
+# researchers stop searching and compress once this little time is left
+compress_reserve_s = 15.0
+# slack after a researcher's deadline before its task is cancelled outright
+researcher_grace_s = 15.0
+
+
+def resolve_deadlines(config: Optional[RunnableConfig]) -> dict:
+    """
+    Turn the run's time budget into absolute deadlines.
+
+    Returns a state update with `deadline` and `research_deadline`, both None when
+    the run has no budget, so a new run on the same thread never inherits an old deadline.
+    """
+    configurable = (config or {}).get("configurable", {})
+    now = time.time()
+
+    if configurable.get("deadline") is not None:
+        deadline = float(configurable["deadline"])
+    elif configurable.get("time_budget_s") is not None:
+        deadline = now + float(configurable["time_budget_s"])
+    else:
+        return {"deadline": None, "research_deadline": None}
+
+    budget = max(deadline - now, 0.0)
+    reserve = min(max(budget * report_reserve_fraction, min_report_reserve_s), max_report_reserve_s)
+    return {"deadline": deadline, "research_deadline": deadline - reserve}
+
+
+def time_remaining(deadline: Optional[float]) -> Optional[float]:
+    """ seconds until the deadline (negative once passed), None when there is no deadline """
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def has_time_for(deadline: Optional[float], seconds: float) -> bool:
+    """ whether at least `seconds` remain before the deadline; always True without a deadline """
+    remaining = time_remaining(deadline)
+    return remaining is None or remaining >= seconds
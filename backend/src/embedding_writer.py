@@ -0,0 +1,206 @@
+"""Batched, rate-limited, retrying writer of chunk embeddings into Chroma.
+
+`PDFVectorStoreMgr.ingest_pdf` hands its chunks to a `ChunkWriter` as pages are
+parsed, which:
+- takes embeddings of chunks seen before from the chunk embedding cache
+  (`chunk_dedup.EmbeddingCache`) and embeds the rest in batches of `embed_batch_size` with the async embeddings
+  client, up to `embed_concurrency` batches at a time per process
+- waits for the process-wide rate limit (`embed_requests_per_minute`) before
+  every embedding request, since provider quotas are per API key
+- retries a failed batch with exponential backoff and jitter, up to
+  `embed_max_retries` times, without touching the other batches
+- upserts each embedded batch into Chroma on its own, and reports progress per
+  committed batch
+- stops taking chunks while `max_pending_batches` batches are in flight, which
+  holds back parsing and bounds memory on long documents
+
+Chunk ids are derived from the document id and the chunk index, so a retried
+ingestion asks Chroma which chunks of a batch it already holds and only writes
+the batches that were not committed, instead of embedding everything again.
+"""
+
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Callable, List, Optional
+
+from langchain_core.documents import Document
+
+from src.tracing import trace_span
+
+# ===== CONFIGURATION =====
+
+embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+embed_concurrency = int(os.getenv("EMBED_CONCURRENCY", "4"))                   # batches in flight per process
+embed_requests_per_minute = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "300"))
+embed_max_retries = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+max_pending_batches = 2 * embed_concurrency     # batches held in memory per document, embedding or waiting
+backoff_base_s = 1.0
+backoff_max_s = 30.0
+
+writer_stats: Counter = Counter()
+
+
+def chunk_ids(doc_id: str, count: int, start: int = 0) -> List[str]:
+    """ stable chunk ids, the same on every attempt at ingesting `doc_id` """
+    return [str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc_id}/{i}")) for i in range(start, start + count)]
+
+
+class RateLimiter:
+    """Spaces requests evenly at `per_minute`, shared by every coroutine of the process."""
+
+    def __init__(self, per_minute: float):
+        self.interval_s = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval_s:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval_s
+        if delay > 0:
+            writer_stats["rate_limited_ms"] += int(delay * 1000)
+            await asyncio.sleep(delay)
+
+
+# process-wide, so concurrent ingestions share the provider quota
+rate_limiter = RateLimiter(embed_requests_per_minute)
+_batch_slots: Optional[asyncio.Semaphore] = None
+
+
+def _slots() -> asyncio.Semaphore:
+    global _batch_slots
+    if _batch_slots is None:
+        _batch_slots = asyncio.Semaphore(embed_concurrency)
+    return _batch_slots
+
+
+async def _embed_with_retry(embeddings, texts: List[str]) -> List[List[float]]:
+    for attempt in range(embed_max_retries + 1):
+        await rate_limiter.wait()
+        try:
+            return await embeddings.aembed_documents(texts)
+        except Exception as e:
+            if attempt == embed_max_retries:
+                raise
+            delay = min(backoff_max_s, backoff_base_s * 2 ** attempt) * random.uniform(0.5, 1.5)
+            writer_stats["retries"] += 1
+            print(f"Embedding batch of {len(texts)} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def _embed_batch(embeddings, texts: List[str], cache=None) -> List[List[float]]:
+    """ embeddings for `texts`, from the chunk embedding cache where possible """
+    vectors = await asyncio.to_thread(cache.lookup, texts) if cache is not None else [None] * len(texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        embedded = await _embed_with_retry(embeddings, [texts[i] for i in missing])
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+        if cache is not None:
+            await asyncio.to_thread(cache.put, [texts[i] for i in missing], embedded)
+    return vectors
+
+
+def committed_ids(vector_store, ids: List[str]) -> set:
+    """ ids among `ids` that are already stored in the collection """
+    # _collection: langchain_chroma has no public lookup by id without fetching the documents
+    return set(vector_store._collection.get(ids=ids, include=[])["ids"]) if ids else set()
+
+
+class ChunkWriter:
+    """Embeds and upserts the chunks of one document while more are still being parsed.
+
+    Chunks are added as they come (`add`) and cut into batches of
+    `embed_batch_size`; each full batch is written in the background, at most
+    `max_pending_batches` at a time, so a long document never holds more than
+    that many batches in memory. Use as an async context manager: leaving it
+    writes the last partial batch and waits for every batch; on an error the
+    batches in flight are cancelled and the committed ones stay, so the next
+    attempt resumes after them.
+
+    `cache` (a `chunk_dedup.EmbeddingCache`) serves chunks embedded before.
+    """
+
+    def __init__(self, vector_store, embeddings, doc_id: str, progress: Optional[Callable[..., None]] = None, cache=None):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.doc_id = doc_id
+        self.progress = progress or (lambda **counts: None)
+        self.cache = cache
+        self.buffer: List[Document] = []
+        self.added = 0          # chunks handed to a batch, the index of the next chunk id
+        self.committed = 0
+        self.tasks: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "ChunkWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.close()
+        else:
+            await self._cancel()
+
+    async def add(self, docs: List[Document]) -> None:
+        self.buffer.extend(docs)
+        while len(self.buffer) >= embed_batch_size:
+            batch, self.buffer = self.buffer[:embed_batch_size], self.buffer[embed_batch_size:]
+            await self._submit(batch)
+
+    async def close(self) -> int:
+        """ write the last partial batch and wait for all of them; returns chunks written """
+        if self.buffer:
+            batch, self.buffer = self.buffer, []
+            await self._submit(batch)
+        try:
+            await asyncio.gather(*self.tasks)
+        except BaseException:
+            await self._cancel()
+            raise
+        return self.committed
+
+    async def _submit(self, batch: List[Document]) -> None:
+        # same ids and batch boundaries on every attempt, so a retry can skip committed batches
+        ids = chunk_ids(self.doc_id, len(batch), start=self.added)
+        self.added += len(batch)
+        self._reap([task for task in self.tasks if task.done()])
+        while len(self.tasks) >= max_pending_batches:
+            done, _ = await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+            self._reap(done)
+        self.tasks.add(asyncio.ensure_future(self._write(batch, ids)))
+
+    def _reap(self, done) -> None:
+        for task in done:
+            self.tasks.discard(task)
+            task.result()   # a failed batch stops the document right away
+
+    async def _cancel(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _write(self, batch: List[Document], ids: List[str]) -> None:
+        if set(ids) <= await asyncio.to_thread(committed_ids, self.vector_store, ids):
+            writer_stats["chunks_resumed"] += len(batch)
+        else:
+            async with _slots():
+                with trace_span("chroma.write_batch", "vector_store", chunks=len(batch)):
+                    vectors = await _embed_batch(self.embeddings, [doc.page_content for doc in batch], self.cache)
+                    await asyncio.to_thread(
+                        self.vector_store._collection.upsert,
+                        ids=ids,
+                        embeddings=vectors,
+                        documents=[doc.page_content for doc in batch],
+                        metadatas=[doc.metadata for doc in batch],
+                    )
+            writer_stats["batches_committed"] += 1
+            writer_stats["chunks_written"] += len(batch)
+        self.committed += len(batch)
+        self.progress(chunks_embedded=self.committed)
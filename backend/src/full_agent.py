@@ -6,53 +6,162 @@
 
 '''
 
+import time
+
 from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.config import get_stream_writer
 from langgraph.graph import START, END, StateGraph
 
+from src.citations import dedupe_citations
+from src.deadline import time_remaining
 from src.multi_agent_supervisor import supervisor_agent
+from src.note_dedup import eliminate_near_duplicates
 from src.prompts import final_report_generation_prompt
-from src.scoping_agent import clarify_with_user, write_research_brief
+from src.report_generation import generate_sectioned_report
+from src.scoping_agent import (
+    clarify_with_user,
+    write_research_brief,
+    clarify_and_write_research_brief,
+    route_after_scoping
+)
 from src.scoping_states import AgentState
+from src.profiling import profiled
+from src.admission import admitted, deep_research_admission
+from src.tracing import traced
+from src.cassettes import cassette_chat_model
 from src.utils import get_today_str
 
 
 from langchain.chat_models import init_chat_model
-report_writing_model = init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai")
+report_writing_model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "report")
+# tagged so clients can pick the report tokens out of the `messages` stream
+report_streaming_model = report_writing_model.with_config(
+    tags=["final_report"],
+    metadata={"type": "final_report"}
+)
+
+# findings larger than this are written section by section in parallel (see report_generation)
+sectioned_report_min_chars = 60_000
+
+# Jaccard similarity at which sentences repeated across notes are collapsed, None disables the pass
+near_duplicate_threshold = 0.8
+
+# scope with one structured call (clarification + brief) instead of two sequential ones
+fast_path_scoping = True
 
 
 # ===== REPORT GEN ======
 async def final_report_generation(state: AgentState):
-    notes = state.get("notes", [])
+    """
+    Stream the final report token by token.
+    
+    Chunks go out on the LangGraph `messages` stream tagged with metadata type
+    "final_report"; the `custom` stream carries progress events with
+    time-to-first-token and total latency.
+    Large runs are handed to the sectioned report engine instead.
+    """
+    # one deduplicated source table for all notes, citations rewritten to its numbers
+    notes, source_table = dedupe_citations(state.get("notes", []))
+    writer = get_stream_writer()
+    
+    if near_duplicate_threshold is not None:
+        notes, dedup_stats = eliminate_near_duplicates(notes, threshold=near_duplicate_threshold)
+        writer({"type": "final_report_progress", "stage": "notes_deduplicated", **dedup_stats})
     findings = '\n'.join(notes)
     
+    if len(findings) > sectioned_report_min_chars:
+        return await sectioned_report_generation(state, notes, source_table, writer)
+    
     final_report_prompt = final_report_generation_prompt.format(
         research_brief=state.get("research_brief", ""),
         findings=findings,
+        sources=source_table.format(),
         date=get_today_str()
     )
     
-    final_report = await report_writing_model.ainvoke([HumanMessage(content=final_report_prompt)])
+    writer({
+        "type": "final_report_progress",
+        "stage": "started",
+        "prompt_chars": len(final_report_prompt),
+        "time_remaining_s": time_remaining(state.get("deadline"))
+    })
+    
+    start = time.perf_counter()
+    time_to_first_token = None
+    final_report = None
+    async for chunk in report_streaming_model.astream([HumanMessage(content=final_report_prompt)]):
+        if time_to_first_token is None and chunk.content:
+            time_to_first_token = time.perf_counter() - start
+            writer({"type": "final_report_progress", "stage": "first_token", "time_to_first_token_s": time_to_first_token})
+        final_report = chunk if final_report is None else final_report + chunk
+    total_latency = time.perf_counter() - start
+    
+    report_content = final_report.content if final_report is not None else ""
+    timings = {
+        "time_to_first_token_s": time_to_first_token,
+        "total_latency_s": total_latency,
+    }
+    writer({"type": "final_report_progress", "stage": "done", "report_chars": len(report_content), **timings})
+    
+    return {
+        "final_report": report_content,
+        "messages": [AIMessage(
+            content="here's the final report: " + report_content,
+            # reuse the streamed message id so clients replace the streamed chunks instead of duplicating them
+            id=final_report.id if final_report is not None else None,
+            additional_kwargs={"metadata": {"type": "final_report", **timings}}
+        )]
+    }
+
+async def sectioned_report_generation(state: AgentState, notes: list[str], source_table, writer):
+    """ outline -> concurrent sections -> synthesis, for findings that don't fit one prompt """
+    writer({
+        "type": "final_report_progress",
+        "stage": "started",
+        "mode": "sectioned",
+        "time_remaining_s": time_remaining(state.get("deadline"))
+    })
+    
+    start = time.perf_counter()
+    report_content = await generate_sectioned_report(
+        notes,
+        state.get("research_brief", ""),
+        source_table,
+        on_progress=writer
+    )
+    timings = {"total_latency_s": time.perf_counter() - start}
+    writer({"type": "final_report_progress", "stage": "done", "report_chars": len(report_content), **timings})
     
     return {
-        "final_report": final_report.content,
+        "final_report": report_content,
         "messages": [AIMessage(
-            content="here's the final report: " + final_report.content,
-            additional_kwargs={"metadata": {"type": "final_report"}}
+            content="here's the final report: " + report_content,
+            additional_kwargs={"metadata": {"type": "final_report", **timings}}
         )]
     }
 
     
 deep_research_builder = StateGraph(AgentState)
-deep_research_builder.add_node("clarify_with_user", clarify_with_user)
-deep_research_builder.add_node("write_research_brief", write_research_brief)
 deep_research_builder.add_node("supervisor_subgraph", supervisor_agent)
 deep_research_builder.add_node("final_report_generation", final_report_generation)
 
-deep_research_builder.add_edge(START, "clarify_with_user")
-# since clarify_with_user uses Command to navigate to next node
-# deep_research_builder.add_edge("clarify_with_user", "write_research_brief")
-deep_research_builder.add_edge("write_research_brief", "supervisor_subgraph")
+if fast_path_scoping:
+    deep_research_builder.add_node("clarify_and_write_research_brief", clarify_and_write_research_brief)
+    deep_research_builder.add_edge(START, "clarify_and_write_research_brief")
+    deep_research_builder.add_conditional_edges(
+        "clarify_and_write_research_brief",
+        route_after_scoping,
+        {"start_research": "supervisor_subgraph", END: END}
+    )
+else:
+    deep_research_builder.add_node("clarify_with_user", clarify_with_user)
+    deep_research_builder.add_node("write_research_brief", write_research_brief)
+    deep_research_builder.add_edge(START, "clarify_with_user")
+    # since clarify_with_user uses Command to navigate to next node
+    # deep_research_builder.add_edge("clarify_with_user", "write_research_brief")
+    deep_research_builder.add_edge("write_research_brief", "supervisor_subgraph")
+
 deep_research_builder.add_edge("supervisor_subgraph", "final_report_generation")
 deep_research_builder.add_edge("final_report_generation", END)
 
-deep_research_agent = deep_research_builder.compile()
\ No newline at end of file
+deep_research_agent = admitted(profiled(traced(deep_research_builder.compile())), deep_research_admission)
\ No newline at end of file
@@ -0,0 +1,340 @@
+"""Background ingestion queue for uploaded PDFs.
+
+`POST /upload/pdf` only stores the file, creates the document (status
+`processing`) and queues an ingestion job, then returns. Workers parse, split
+and embed the PDF (`PDFVectorStoreMgr.ingest_pdf`), recording progress (pages
+parsed, chunks embedded) on the job, which `GET /documents/{doc_id}/status`
+reports. On success the document becomes `processed`, after `max_attempts`
+failures `failed`, and the chunks it had stored are deleted so they never
+show up in searches.
+
+Jobs live in the database (`ingestion_jobs`) and are claimed like research
+jobs (`src/research_jobs.py`): an atomic conditional UPDATE, a periodic
+heartbeat, and stale jobs are requeued. A job is only finished or requeued by
+the worker that holds it, so a late attempt never overwrites (or deletes the
+chunks of) the one that took over. Database calls run in
+worker threads, and progress updates are coalesced into one UPDATE in flight
+per job, so they never block the event loop. Each worker runs at most
+`ingestion_concurrency` ingestions at a time. The API process runs one worker
+itself (`INGESTION_IN_PROCESS_WORKER=0` to disable); more can be started from
+backend/ on the same upload directory:
+
+    python -m src.ingestion_jobs --workers 2
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from src.database import DBDocument, DBIngestionJob, SessionLocal
+
+# ===== CONFIGURATION =====
+
+ingestion_concurrency = int(os.getenv("INGESTION_CONCURRENCY", "2"))     # ingestions per worker
+in_process_worker = os.getenv("INGESTION_IN_PROCESS_WORKER", "1") != "0"
+upload_dir = os.getenv("UPLOAD_DIR", "temp_uploads")
+poll_interval_s = 1.0
+heartbeat_interval_s = 10.0
+stale_after_s = 120.0       # running jobs without a heartbeat for this long are requeued
+max_attempts = 3
+terminal_statuses = {"succeeded", "failed"}
+
+
+# ===== QUEUE =====
+
+def submit_ingestion(db: Session, doc_id: str, user_id: int, file_path: str) -> DBIngestionJob:
+    """ queue the ingestion of an uploaded file, returns the stored job """
+    job = DBIngestionJob(job_id=str(uuid.uuid4()), doc_id=doc_id, user_id=user_id, file_path=file_path)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def latest_ingestion(db: Session, doc_id: str) -> Optional[DBIngestionJob]:
+    return (
+        db.query(DBIngestionJob)
+        .filter(DBIngestionJob.doc_id == doc_id)
+        .order_by(DBIngestionJob.id.desc())
+        .first()
+    )
+
+
+def claim_next_ingestion(db: Session, worker_id: str) -> Optional[DBIngestionJob]:
+    """ atomically move the oldest queued job to running, None when the queue is empty """
+    candidates = (
+        db.query(DBIngestionJob.id)
+        .filter(DBIngestionJob.status == "queued")
+        .order_by(DBIngestionJob.id)
+        .limit(10)
+        .all()
+    )
+    now = datetime.utcnow()
+    for (job_pk,) in candidates:
+        # only one worker's UPDATE can match status == "queued"
+        claimed = (
+            db.query(DBIngestionJob)
+            .filter(DBIngestionJob.id == job_pk, DBIngestionJob.status == "queued")
+            .update({
+                "status": "running",
+                "worker_id": worker_id,
+                "started_at": now,
+                "heartbeat_at": now,
+                "attempts": DBIngestionJob.attempts + 1,
+                "pages_parsed": 0,
+                "chunks_embedded": 0,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return db.get(DBIngestionJob, job_pk)
+    return None
+
+
+def _held(db: Session, job: DBIngestionJob):
+    """ the job's row, as long as it is still running on the worker that claimed it """
+    return db.query(DBIngestionJob).filter(
+        DBIngestionJob.id == job.id,
+        DBIngestionJob.worker_id == job.worker_id,
+        DBIngestionJob.status == "running",
+    )
+
+
+def heartbeat_ingestion(db: Session, job: DBIngestionJob) -> bool:
+    """ refresh the heartbeat of a running job, False once another worker took it over """
+    held = _held(db, job).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return bool(held)
+
+
+def record_progress(db: Session, job: DBIngestionJob, **counts) -> None:
+    """ store progress counters, doubles as a heartbeat """
+    _held(db, job).update({**counts, "heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+def finish_ingestion(db: Session, job: DBIngestionJob, status: str, error: Optional[str] = None) -> bool:
+    """ move a held job to a terminal status, False (and nothing touched) if it is no longer held """
+    finished = _held(db, job).update(
+        {"status": status, "error": error, "finished_at": datetime.utcnow()}, synchronize_session=False
+    )
+    if not finished:
+        db.commit()
+        return False
+    db.query(DBDocument).filter(DBDocument.doc_id == job.doc_id).update(
+        {"status": "processed" if status == "succeeded" else "failed"}, synchronize_session=False
+    )
+    db.commit()
+    if status == "failed":
+        from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+        # chunks embedded before the failure must not be searchable
+        try:
+            pdf_vector_store_mgr.delete_document_chunks(job.user_id, job.doc_id)
+        except Exception as e:
+            print(f"Could not delete the chunks of failed document {job.doc_id}: {e}")
+    if os.path.exists(job.file_path):
+        os.remove(job.file_path)
+    return True
+
+
+def requeue_ingestion(db: Session, job: DBIngestionJob, error: Optional[str] = None) -> bool:
+    """ hand a held job back to the queue, False if it is no longer held """
+    requeued = _held(db, job).update(
+        {"status": "queued", "worker_id": None, **({"error": error} if error else {})}, synchronize_session=False
+    )
+    db.commit()
+    return bool(requeued)
+
+
+def requeue_stale_ingestions(db: Session) -> int:
+    """ put jobs of dead workers back in the queue (or fail them after max_attempts) """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_s)
+    stale = (
+        db.query(DBIngestionJob)
+        .filter(DBIngestionJob.status == "running", DBIngestionJob.heartbeat_at < cutoff)
+        .all()
+    )
+    for job in stale:
+        if job.attempts >= max_attempts:
+            finish_ingestion(db, job, "failed", error=f"worker lost {job.attempts} times")
+        else:
+            job.status = "queued"
+            job.worker_id = None
+            db.commit()
+    return len(stale)
+
+
+def _requeue_and_claim(db: Session, worker_id: str) -> Optional[DBIngestionJob]:
+    requeue_stale_ingestions(db)
+    return claim_next_ingestion(db, worker_id)
+
+
+# ===== WORKER =====
+
+# ingestions share the worker's event loop: database calls go to worker
+# threads, each with a session of its own
+
+def _in_session(fn, *args, **kwargs):
+    """ fn(db, *args, **kwargs) with a fresh session, for asyncio.to_thread """
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+class ProgressWriter:
+    """Stores a job's progress counters from a worker thread, one UPDATE in flight at a time.
+
+    Counters reported while an UPDATE runs are merged (latest value wins) and
+    written by the next one, so a fast ingestion costs a few UPDATEs per
+    second however often it reports.
+    """
+
+    def __init__(self, job: DBIngestionJob):
+        self.job = job
+        self.pending: dict = {}
+        self.flushing: Optional[asyncio.Task] = None
+
+    def update(self, **counts) -> None:
+        self.pending.update(counts)
+        if self.flushing is None or self.flushing.done():
+            self.flushing = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self.pending:
+            counts, self.pending = self.pending, {}
+            try:
+                await asyncio.to_thread(_in_session, record_progress, self.job, **counts)
+            except Exception as e:
+                print(f"Could not record the progress of ingestion job {self.job.job_id}: {e}")
+
+    async def close(self) -> None:
+        """ wait until the counters reported so far are stored """
+        if self.flushing is not None:
+            await asyncio.shield(self.flushing)
+        if self.pending:
+            await self._flush()
+
+
+async def run_ingestion(job: DBIngestionJob) -> None:
+    """ ingest one claimed job, recording progress in the database """
+    from src.answer_cache import answer_cache
+    from src.pdf_vector_store_manager import pdf_vector_store_mgr
+
+    progress = ProgressWriter(job)
+    run_task = asyncio.current_task()
+    lost = False
+
+    async def keep_alive():
+        nonlocal lost
+        while True:
+            await asyncio.sleep(heartbeat_interval_s)
+            try:
+                held = await asyncio.to_thread(_in_session, heartbeat_ingestion, job)
+            except Exception as e:
+                print(f"Could not refresh the heartbeat of ingestion job {job.job_id}: {e}")
+                continue
+            if not held:
+                # requeued as stale and claimed again, that attempt owns the document now
+                lost = True
+                run_task.cancel()
+                return
+
+    keep_alive_task = asyncio.create_task(keep_alive())
+    try:
+        await pdf_vector_store_mgr.ingest_pdf(job.file_path, job.doc_id, job.user_id, progress=progress.update)
+        keep_alive_task.cancel()
+        await progress.close()
+        if await asyncio.to_thread(_in_session, finish_ingestion, job, "succeeded"):
+            # the user's document set changed, cached answers are stale
+            answer_cache.invalidate_user(job.user_id)
+    except asyncio.CancelledError:
+        if lost:
+            print(f"Ingestion job {job.job_id} was taken over by another worker, dropping this attempt")
+            return
+        # worker shutting down: hand the job back to the queue
+        await progress.close()
+        await asyncio.to_thread(_in_session, requeue_ingestion, job)
+        raise
+    except Exception as e:
+        print(f"Ingestion of document {job.doc_id} failed (attempt {job.attempts}): {e}")
+        keep_alive_task.cancel()
+        await progress.close()
+        error = f"{type(e).__name__}: {e}"
+        if job.attempts >= max_attempts:
+            await asyncio.to_thread(_in_session, finish_ingestion, job, "failed", error=error)
+        else:
+            await asyncio.to_thread(_in_session, requeue_ingestion, job, error=error)
+    finally:
+        keep_alive_task.cancel()
+
+
+async def worker_loop(worker_id: str, concurrency: int = ingestion_concurrency) -> None:
+    """ claim and run ingestion jobs forever, at most `concurrency` at a time """
+    slots = asyncio.Semaphore(concurrency)
+    running: set[asyncio.Task] = set()
+    print(f"Ingestion worker {worker_id} started")
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                job = await asyncio.to_thread(_in_session, _requeue_and_claim, worker_id)
+            except asyncio.CancelledError:
+                slots.release()
+                raise
+            except Exception as e:
+                # e.g. tables not created yet, keep polling
+                print(f"Ingestion worker {worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                await asyncio.sleep(poll_interval_s)
+                continue
+
+            task = asyncio.create_task(run_ingestion(job))
+            running.add(task)
+            task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+def _worker_process(index: int, concurrency: int) -> None:
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    try:
+        asyncio.run(worker_loop(worker_id, concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run PDF ingestion workers.")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--concurrency", type=int, default=ingestion_concurrency, help="concurrent ingestions per worker process")
+    args = parser.parse_args()
+    if args.workers == 1:
+        _worker_process(0, args.concurrency)
+        return
+    processes = [multiprocessing.Process(target=_worker_process, args=(i, args.concurrency)) for i in range(args.workers)]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from datetime import datetime
+import asyncio
+import json
+
+from src.database import get_db, SessionLocal, DBResearchJob
+from src.auth import get_current_user
+from src.research_jobs import submit_job, cancel_job, list_events, pending_job_count, max_pending_jobs_per_user
+
+router = APIRouter()
+
+terminal_statuses = {"succeeded", "needs_clarification", "failed", "cancelled"}
+event_poll_interval_s = 1.0
+
+# Request/Response models
+class JobRequest(BaseModel):
+    query: str
+    time_budget_s: Optional[float] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    query: str
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    has_report: bool
+
+class JobListResponse(BaseModel):
+    jobs: List[JobResponse]
+
+class JobReportResponse(BaseModel):
+    job_id: str
+    report: str
+
+def to_response(job: DBResearchJob) -> JobResponse:
+    return JobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        query=job.query,
+        attempts=job.attempts or 0,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+        has_report=bool(job.report),
+    )
+
+def get_user_job(job_id: str, current_user_id: str, db: Session) -> DBResearchJob:
+    job = (
+        db.query(DBResearchJob)
+        .filter(DBResearchJob.job_id == job_id, DBResearchJob.user_id == int(current_user_id))
+        .first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Job routes
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(
+    request: JobRequest,
+    current_user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Queue a deep research job, executed by the workers in `src/research_jobs.py`"""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query required")
+    if pending_job_count(db, int(current_user_id)) >= max_pending_jobs_per_user:
+        raise HTTPException(status_code=429, detail="Too many pending research jobs")
+
+    job = submit_job(db, int(current_user_id), request.query, request.time_budget_s)
+    return to_response(job)
+
+@router.get("/jobs", response_model=JobListResponse)
+async def list_jobs(
+    current_user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List the current user's jobs, newest first"""
+    jobs = (
+        db.query(DBResearchJob)
+        .filter(DBResearchJob.user_id == int(current_user_id))
+        .order_by(DBResearchJob.id.desc())
+        .all()
+    )
+    return JobListResponse(jobs=[to_response(job) for job in jobs])
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Poll job status"""
+    return to_response(get_user_job(job_id, current_user_id, db))
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    after: int = 0,
+    current_user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream progress events as server-sent events until the job finishes.
+
+    Each event carries its id, so a client can reconnect with `?after=<last id>`.
+    """
+    get_user_job(job_id, current_user_id, db)
+
+    async def event_stream():
+        last_id = after
+        while True:
+            # own session: request-scoped dependencies are closed once streaming starts
+            stream_db = SessionLocal()
+            try:
+                events = list_events(stream_db, job_id, last_id)
+                status = stream_db.query(DBResearchJob.status).filter(DBResearchJob.job_id == job_id).scalar()
+            finally:
+                stream_db.close()
+
+            for event in events:
+                last_id = event.id
+                yield f"id: {event.id}\ndata: {event.event}\n\n"
+            if status in terminal_statuses and not events:
+                yield f"event: end\ndata: {json.dumps({'status': status})}\n\n"
+                return
+            await asyncio.sleep(event_poll_interval_s)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+async def cancel_research_job(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cancel a job; a running job stops within one worker heartbeat"""
+    job = get_user_job(job_id, current_user_id, db)
+    if job.status in terminal_statuses:
+        raise HTTPException(status_code=409, detail=f"Job already finished with status {job.status}")
+    cancel_job(db, job)
+    db.refresh(job)
+    return to_response(job)
+
+@router.get("/jobs/{job_id}/report", response_model=JobReportResponse)
+async def get_job_report(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Fetch the final report of a finished job"""
+    job = get_user_job(job_id, current_user_id, db)
+    if job.status != "succeeded" or not job.report:
+        raise HTTPException(status_code=409, detail=f"Report not available, job status is {job.status}")
+    return JobReportResponse(job_id=job.job_id, report=job.report)
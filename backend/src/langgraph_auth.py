@@ -0,0 +1,52 @@
+"""Authentication of LangGraph server requests with the app's own JWTs.
+
+Registered in langgraph.json (`"auth"`), so every request to the graphs
+carries the user who sent it: the server puts the token's `sub` into the run
+config as `configurable.langgraph_auth_user_id`, which clients cannot override.
+Document retrieval and the answer cache are scoped by it (`run_user_id`), and
+threads are only visible to the user who created them. The `/chat` route sets
+the same key itself from the user it authenticated.
+"""
+
+from typing import List, Optional
+
+from langgraph_sdk import Auth
+
+from src.auth import auth_handler
+
+auth = Auth()
+
+USER_KEY = "langgraph_auth_user_id"
+
+
+@auth.authenticate
+async def authenticate(authorization: Optional[str]) -> str:
+    """ user id from the `Authorization: Bearer <jwt>` header """
+    scheme, _, token = (authorization or "").partition(" ")
+    payload = auth_handler.decode_token(token) if scheme.lower() == "bearer" else None
+    if payload is None or payload.get("sub") is None:
+        raise Auth.exceptions.HTTPException(status_code=401, detail="Could not validate credentials")
+    return str(payload["sub"])
+
+
+@auth.on
+async def owner_only(ctx: Auth.types.AuthContext, value: dict):
+    """ tag created resources with their owner and only show a user their own """
+    filters = {"owner": ctx.user.identity}
+    metadata = value.setdefault("metadata", {})
+    metadata.update(filters)
+    return filters
+
+
+def run_user_id(config: Optional[dict]) -> Optional[str]:
+    """ authenticated user of a graph run, None outside the server and `/chat` """
+    configurable = (config or {}).get("configurable") or {}
+    user_id = configurable.get(USER_KEY)
+    return str(user_id) if user_id is not None else None
+
+
+def run_doc_ids(config: Optional[dict]) -> Optional[List[str]]:
+    """ documents the run is restricted to (`configurable.doc_ids`), None for all of the user's """
+    configurable = (config or {}).get("configurable") or {}
+    doc_ids = configurable.get("doc_ids")
+    return [str(d) for d in doc_ids] if doc_ids else None
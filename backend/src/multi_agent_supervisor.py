@@ -1,8 +1,10 @@
 import asyncio
+import time
 from langgraph.graph import END, START, StateGraph
-from typing_extensions import Literal
+from typing_extensions import Literal, Optional
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage, filter_messages
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import Command
 
 from src.multi_agent_supervisor_state import (
@@ -11,16 +13,32 @@ from src.multi_agent_supervisor_state import (
     ResearchComplete
 )
 from src.research_agent import research_agent
+from src.deadline import (
+    resolve_deadlines,
+    time_remaining,
+    has_time_for,
+    min_research_round_s,
+    researcher_grace_s
+)
 from src.utils import get_today_str, think_tool
 from src.prompts import lead_researcher_prompt
+from src.profiling import profiled
+from src.admission import admitted, deep_research_admission
+from src.tracing import trace_event, traced
+from src.cancellation import gather_cancellable, record_cancelled
+from src.cassettes import cassette_chat_model
 
 def get_notes_from_tool_calls(messages: list[BaseMessage]) -> list[str]:
-    return [tool_msg.content for tool_msg in filter_messages(messages, include_types=["tool"])]
+    # failed or timed out research (status "error") has no findings for the report
+    return [
+        tool_msg.content for tool_msg in filter_messages(messages, include_types=["tool"])
+        if tool_msg.status != "error"
+    ]
 
 
 
 supervisor_tools = [ConductResearch, ResearchComplete, think_tool]
-supervisor_model = init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai")
+supervisor_model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "supervisor")
 supervisor_model_with_tools = supervisor_model.bind_tools(supervisor_tools)
 
 # max # of tool calls for each research agent 
@@ -32,7 +50,7 @@ max_concurrent_researhcers = 3
 
 # ========== nodes ==========
 
-async def llm_call(state: SupervisorState) -> Command[Literal["supervisor_tools"]]:
+async def llm_call(state: SupervisorState, config: RunnableConfig) -> Command[Literal["supervisor_tools"]]:
     # look at current research brief research brief and supervisor messages to determine next step
     
     system_message = lead_researcher_prompt.format(
@@ -49,14 +67,42 @@ async def llm_call(state: SupervisorState) -> Command[Literal["supervisor_tools"
     
     response = await supervisor_model_with_tools.ainvoke(msgs)
     
+    update = {
+        "supervisor_messages": [response],
+        "research_iterations": state.get("research_iterations", 0)+1
+    }
+    # run as a standalone graph: no parent resolved the time budget yet
+    if "research_deadline" not in state:
+        update["research_deadline"] = resolve_deadlines(config)["research_deadline"]
+    
     return Command(
         goto="supervisor_tools",
-        update={
-            "supervisor_messages": [response],
-            "research_iterations": state.get("research_iterations", 0)+1
-        }
+        update=update
     )
     
+async def run_researcher(research_topic: str, research_deadline: Optional[float]) -> dict:
+    """ run one research sub-agent, cancelled if it overruns the research deadline by more than the grace period """
+    coro = research_agent.ainvoke({
+        "researcher_messages": [
+            HumanMessage(content=research_topic)
+        ],
+        "research_topic": research_topic,
+        "deadline": research_deadline
+    })
+    
+    remaining = time_remaining(research_deadline)
+    if remaining is None:
+        return await coro
+    
+    started_at = time.time()
+    try:
+        return await asyncio.wait_for(coro, timeout=max(remaining, 0) + researcher_grace_s)
+    except asyncio.TimeoutError:
+        # no findings: supervisor_tools turns this into an error tool message, which is not a note
+        record_cancelled("researcher_timeout", 1)
+        trace_event("timeout.researcher", "cancel", start=started_at, topic=research_topic[:80])
+        return {"raw_notes": []}
+    
 async def supervisor_tools(state: SupervisorState) -> Command[Literal["llm_call", "__end__"]]:
     # handles:
     # 1. think_tool calls before and after other tool calls
@@ -65,6 +111,7 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["llm_call"
     
     supervisor_messages = state.get("supervisor_messages", [])
     research_iterations = state.get("research_iterations", 0)
+    research_deadline = state.get("research_deadline")
     most_recent_message = supervisor_messages[-1]
     
     tool_messages = []
@@ -79,7 +126,10 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["llm_call"
         for tool_call in most_recent_message.tool_calls
     )
     
-    if exceeded_max_iterations or no_tool_calls or research_completed:
+    # not enough time left for another round of researchers, hand over to the reporter
+    out_of_time = not has_time_for(research_deadline, min_research_round_s)
+    
+    if exceeded_max_iterations or no_tool_calls or research_completed or out_of_time:
         should_end = True
         next_step = END
         
@@ -112,27 +162,28 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["llm_call"
             if conduct_research_calls:
                 # Launch parallel research agents
                 coros = [
-                    research_agent.ainvoke({
-                        "researcher_messages": [
-                            HumanMessage(content=tool_call["args"]["research_topic"])
-                        ],
-                        "research_topic": tool_call["args"]["research_topic"]
-                    }) 
+                    run_researcher(tool_call["args"]["research_topic"], research_deadline)
                     for tool_call in conduct_research_calls
                 ]
 
-                # Wait for all research to complete
-                tool_results = await asyncio.gather(*coros)
+                # Wait for all research to complete, a cancelled run cancels every researcher
+                tool_results = await gather_cancellable(coros, kind="researcher")
 
                 # Format research results as tool messages
                 # Each sub-agent returns compressed research findings in result["compressed_research"]
                 # We write this compressed research as the content of a ToolMessage, which allows
                 # the supervisor to later retrieve these findings via get_notes_from_tool_calls()
+                # Research without findings (timed out) still answers its tool call, as an error
                 research_tool_messages = [
                     ToolMessage(
-                        content=result.get("compressed_research", "Error synthesizing research report"),
+                        content=result["compressed_research"],
                         name=tool_call["name"],
                         tool_call_id=tool_call["id"]
+                    ) if result.get("compressed_research") else ToolMessage(
+                        content="Research on this topic did not finish in time, no findings.",
+                        name=tool_call["name"],
+                        tool_call_id=tool_call["id"],
+                        status="error"
                     ) for result, tool_call in zip(tool_results, conduct_research_calls)
                 ]
                 
@@ -176,6 +227,6 @@ supervisor_builder.add_node("supervisor_tools", supervisor_tools)
 supervisor_builder.add_edge(START, "llm_call")
 
 # supervisor agent
-supervisor_agent = supervisor_builder.compile()
+supervisor_agent = admitted(profiled(traced(supervisor_builder.compile())), deep_research_admission)
 
     
\ No newline at end of file
@@ -2,7 +2,7 @@
 
 
 import operator
-from typing import Annotated, Sequence, TypedDict
+from typing import Annotated, Optional, Sequence, TypedDict
 
 from langchain_core.messages import BaseMessage
 from langchain_core.tools import tool
@@ -21,6 +21,9 @@ class SupervisorState(TypedDict):
    
    research_iterations: int 
    
+   # unix timestamp after which no new research should be dispatched, None without a time budget
+   research_deadline: Optional[float]
+   
    
 @tool
 class ConductResearch(BaseModel):
@@ -0,0 +1,112 @@
+"""Near-duplicate text detection, shared by chunk, note and context deduplication.
+
+Texts are compared as sets of word shingles (`shingles`) by Jaccard
+similarity. `NearDuplicateIndex` finds the texts seen so far that are at least
+`threshold` similar to a new one without comparing it to all of them: MinHash
+signatures, split into LSH bands, propose candidates, which are then verified
+by exact Jaccard. With a `window` it only remembers the last texts added, so
+memory stays bounded on long inputs.
+
+    index = NearDuplicateIndex(threshold=0.8)
+    text_shingles = shingles(text)
+    if not index.matches(text_shingles):
+        index.add(text_shingles, text)
+"""
+
+import hashlib
+import re
+import zlib
+from collections import defaultdict, deque
+from typing import Any, Optional
+
+import numpy as np
+
+# ===== CONFIGURATION =====
+
+shingle_size = 3            # words per shingle
+num_perm = 64               # MinHash signature length
+lsh_bands = 16              # num_perm / lsh_bands rows per band
+
+_PRIME = 4294967291         # largest prime below 2**32: (a * h + b) fits in uint64
+_A, _B = (
+    np.array([
+        int.from_bytes(hashlib.blake2b(f"{name}{i}".encode(), digest_size=8).digest(), "big") % _PRIME | 1
+        for i in range(num_perm)
+    ], dtype=np.uint64)
+    for name in ("a", "b")
+)
+
+WORD_RE = re.compile(r"\w+")
+
+
+def words(text: str) -> list[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def shingles(text: str, size: int = shingle_size) -> frozenset[str]:
+    """ word shingles of `text`, lower-cased, punctuation ignored """
+    tokens = words(text)
+    if len(tokens) < size:
+        return frozenset({" ".join(tokens)} if tokens else ())
+    return frozenset(" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def minhash(shingle_set: frozenset) -> np.ndarray:
+    """ MinHash signature, `num_perm` uint64 values """
+    if not shingle_set:
+        return np.full(num_perm, _PRIME, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """Texts added so far (or the last `window` of them), looked up by shingle Jaccard similarity."""
+
+    def __init__(self, threshold: float, window: Optional[int] = None):
+        self.threshold = threshold
+        self.window = window
+        self.buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+        self.items: dict[int, tuple[frozenset, list, Any]] = {}     # id -> (shingles, band keys, value)
+        self.order: deque = deque()
+        self.added = 0
+        self._last: tuple = (None, [])      # band keys of the last text looked up, reused by `add`
+
+    def _band_keys(self, shingle_set: frozenset) -> list[tuple[int, bytes]]:
+        if self._last[0] is shingle_set:
+            return self._last[1]
+        signature = minhash(shingle_set)
+        rows = num_perm // lsh_bands
+        band_keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(lsh_bands)]
+        self._last = (shingle_set, band_keys)
+        return band_keys
+
+    def matches(self, shingle_set: frozenset) -> list:
+        """ values of the remembered texts at least `threshold` similar, oldest first """
+        candidates = {item for key in self._band_keys(shingle_set) for item in self.buckets.get(key, ())}
+        return [
+            self.items[item][2] for item in sorted(candidates)
+            if jaccard(shingle_set, self.items[item][0]) >= self.threshold
+        ]
+
+    def add(self, shingle_set: frozenset, value: Any = None) -> None:
+        item = self.added
+        self.added += 1
+        band_keys = self._band_keys(shingle_set)
+        self.items[item] = (shingle_set, band_keys, value)
+        self.order.append(item)
+        for key in band_keys:
+            self.buckets[key].append(item)
+        if self.window is not None and len(self.order) > self.window:
+            self._forget(self.order.popleft())
+
+    def _forget(self, item: int) -> None:
+        _, band_keys, _ = self.items.pop(item)
+        for key in band_keys:
+            bucket = self.buckets[key]
+            bucket.remove(item)
+            if not bucket:
+                del self.buckets[key]
@@ -0,0 +1,112 @@
+"""Near-duplicate sentence elimination across research notes.
+
+Parallel researchers often report the same facts in slightly different words,
+and the report model would re-read every copy. This stage runs over the
+sentences of all notes before report generation and collapses near-duplicates
+found with MinHash + LSH over word shingles, verified by exact Jaccard
+similarity (`src/near_duplicates.py`). The first occurrence of a claim is kept
+and inherits the citations of the copies that were dropped, so no source is
+lost.
+
+Runs locally (no LLM or embedding calls) and expects notes whose citations have
+already been rewritten to global numbers by `citations.dedupe_citations`.
+"""
+
+import re
+from collections import defaultdict
+
+from src.citations import CITATION_RE
+from src.near_duplicates import NearDuplicateIndex, shingles, words
+
+# ===== CONFIGURATION =====
+
+default_threshold = 0.8     # Jaccard similarity above which two sentences are duplicates
+min_sentence_words = 6      # shorter sentences (headings, labels) are always kept
+
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+
+
+def _merge_citations(sentence: str, extra: list[int]) -> str:
+    """ append citation numbers from dropped duplicates that the kept sentence lacks """
+    present = {int(n) for match in CITATION_RE.finditer(sentence) for n in re.split(r"\s*,\s*", match.group(1))}
+    missing = [n for n in dict.fromkeys(extra) if n not in present]
+    if not missing:
+        return sentence
+
+    citation = "[" + ", ".join(str(n) for n in missing) + "]"
+    stripped = sentence.rstrip()
+    if stripped and stripped[-1] in ".!?":
+        return f"{stripped[:-1]} {citation}{stripped[-1]}"
+    return f"{stripped} {citation}"
+
+
+# ===== DEDUP =====
+
+def eliminate_near_duplicates(
+    notes: list[str],
+    threshold: float = default_threshold
+) -> tuple[list[str], dict]:
+    """Collapse near-duplicate sentences across notes.
+
+    Args:
+        notes: Research notes with globally numbered citations
+        threshold: Jaccard similarity (0-1] of word shingles at which two sentences are merged
+
+    Returns:
+        The deduplicated notes and stats about what was removed
+    """
+    # (note index, line index, sentence index) -> sentence
+    sentences: dict[tuple[int, int, int], str] = {}
+    layout: list[list[list[tuple[int, int, int]]]] = []
+    for n, note in enumerate(notes):
+        note_layout = []
+        for l, line in enumerate(note.split("\n")):
+            keys = []
+            for s, sentence in enumerate(SENTENCE_SPLIT_RE.split(line)):
+                sentences[(n, l, s)] = sentence
+                keys.append((n, l, s))
+            note_layout.append(keys)
+        layout.append(note_layout)
+
+    index = NearDuplicateIndex(threshold)
+    kept_citations: dict[tuple[int, int, int], list[int]] = defaultdict(list)
+    dropped: set[tuple[int, int, int]] = set()
+
+    for key, sentence in sentences.items():
+        if len(words(sentence)) < min_sentence_words:
+            continue
+        sentence_shingles = shingles(CITATION_RE.sub(" ", sentence))
+        duplicates_of = index.matches(sentence_shingles)
+        if duplicates_of:
+            duplicate_of = duplicates_of[0]
+            dropped.add(key)
+            kept_citations[duplicate_of].extend(
+                int(n) for match in CITATION_RE.finditer(sentence) for n in re.split(r"\s*,\s*", match.group(1))
+            )
+            continue
+        index.add(sentence_shingles, key)
+
+    deduplicated = []
+    for note_layout in layout:
+        lines = []
+        for keys in note_layout:
+            kept = [
+                _merge_citations(sentences[key], kept_citations[key]) if key in kept_citations else sentences[key]
+                for key in keys if key not in dropped
+            ]
+            # drop lines that only consisted of duplicates, keep intentional blank lines
+            if kept or not keys:
+                lines.append(" ".join(kept))
+        deduplicated.append("\n".join(lines))
+
+    chars_before = sum(len(note) for note in notes)
+    chars_after = sum(len(note) for note in deduplicated)
+    stats = {
+        "sentences": len(sentences),
+        "sentences_removed": len(dropped),
+        "chars_removed": chars_before - chars_after,
+        # rough estimate, ~4 characters per token
+        "tokens_removed": (chars_before - chars_after) // 4,
+        "threshold": threshold,
+    }
+    return deduplicated, stats
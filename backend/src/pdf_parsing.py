@@ -0,0 +1,83 @@
+"""Page-by-page PDF parsing in a process pool, for streaming ingestion.
+
+Text extraction with pypdf is pure Python and CPU bound: in a thread it holds
+the GIL, slowing the event loop and every other ingestion of the process.
+`stream_pages` has runs of `parse_batch_pages` pages parsed by a pool of
+`parse_processes` processes (shared by all ingestions of the process) and
+yields them in page order, with at most `parse_prefetch` runs parsed ahead of
+the consumer, so memory stays bounded however long the PDF is and a consumer
+that falls behind (embedding) holds parsing back.
+
+`PDF_PARSE_PROCESSES=0` parses in a worker thread instead. The pool uses the
+spawn start method (forking a process that runs threads is unsafe), which is
+why this module only imports pypdf and langchain_core.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+# ===== CONFIGURATION =====
+
+parse_processes = int(os.getenv("PDF_PARSE_PROCESSES", str(min(4, os.cpu_count() or 1))))
+parse_batch_pages = int(os.getenv("PDF_PARSE_BATCH_PAGES", "8"))     # pages per pool task
+parse_prefetch = 2 * max(parse_processes, 1)                          # runs parsed ahead of the consumer
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _executor() -> Optional[ProcessPoolExecutor]:
+    """ the shared parsing pool, None to parse in threads """
+    global _pool
+    if parse_processes <= 0:
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=parse_processes, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def parse_pages(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """ (page index, text) of pages `start` to `end` - 1, runs in a pool process """
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text()) for i in range(start, min(end, len(reader.pages)))]
+
+
+async def stream_pages(file_path: str, pages_total: int) -> AsyncIterator[List[Document]]:
+    """ the pages of a PDF in order, one run of up to `parse_batch_pages` at a time
+
+    Same page documents as `PyPDFLoader` (`source`, 0-based `page`, `total_pages`),
+    without the PDF's own metadata.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _executor()
+    starts = iter(range(0, pages_total, parse_batch_pages))
+    pending: deque = deque()
+
+    def submit() -> None:
+        start = next(starts, None)
+        if start is not None:
+            pending.append(loop.run_in_executor(pool, parse_pages, file_path, start, start + parse_batch_pages))
+
+    for _ in range(parse_prefetch if pool is not None else 1):
+        submit()
+    try:
+        while pending:
+            parsed = await pending.popleft()
+            submit()
+            yield [
+                Document(page_content=text, metadata={"source": file_path, "page": i, "total_pages": pages_total})
+                for i, text in parsed
+            ]
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,19 +1,34 @@
-from typing import List, Optional
+from collections import defaultdict
+from contextlib import aclosing
+from typing import Callable, List, Optional
 from pathlib import Path
+import argparse
 import asyncio
 import nest_asyncio
 import shutil
 
 from sqlalchemy.orm import Session
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma 
+import chromadb
 
-from src.database import DBDocument
+from src.database import DBDocument, SessionLocal
+from src.tracing import trace_span, traced_embeddings
+from src.cassettes import cassette_embeddings
+from src.embedding_writer import ChunkWriter
+from src.chunk_dedup import ChunkDeduplicator, EmbeddingCache, strip_page_numbers
+from src.pdf_parsing import count_pages, stream_pages
 import uuid
 import os
+import re
+
+user_collection_prefix = "documents_u"    # one Chroma collection per user: documents_u<user id>
+legacy_collection = "document_collection"  # shared collection of untagged chunks, before per-user collections
+legacy_page_size = 1000
+# uploads used to be parsed from temp_uploads/temp_<uuid>_<original filename>
+LEGACY_SOURCE_RE = re.compile(r"^temp_[0-9a-f-]{36}_(.+)$")
 
 class PDFVectorStoreMgr:
     def __init__(self):
@@ -23,29 +38,43 @@ class PDFVectorStoreMgr:
             length_function=len,
         )
 
-        # Create vector store from documents
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        self.vector_store = Chroma(
-            collection_name="document_collection",
-            embedding_function=self.embeddings,
-            persist_directory=".chroma_db"
+        self.embeddings = traced_embeddings(cassette_embeddings(GoogleGenerativeAIEmbeddings(model="models/embedding-001"), "embedding-001"))
+        self.chroma_client = chromadb.PersistentClient(path=".chroma_db")
+        # per-user vector stores, so a search only scans the caller's own chunks
+        self.user_stores: dict[str, Chroma] = {}
+        # chunk embeddings by content hash, reused across documents and re-uploads
+        self.embedding_cache = EmbeddingCache(
+            Chroma(collection_name="chunk_embedding_cache", client=self.chroma_client),
+            model="models/embedding-001",
         )
 
-    async def process_pdf(
-        self, 
-        file_path: str, 
-        original_filename: str, 
-        user_id: int, 
+    def user_store(self, user_id) -> Chroma:
+        """The vector store holding one user's chunks, created on first use"""
+        key = str(user_id)
+        if key not in self.user_stores:
+            self.user_stores[key] = Chroma(
+                collection_name=f"{user_collection_prefix}{key}",
+                embedding_function=self.embeddings,
+                client=self.chroma_client,
+            )
+        return self.user_stores[key]
+
+    @staticmethod
+    def doc_filter(doc_ids: Optional[List[str]]) -> Optional[dict]:
+        """Chroma metadata filter restricting a search to `doc_ids`, None for all documents"""
+        return {"doc_id": {"$in": list(doc_ids)}} if doc_ids else None
+
+    def create_document(
+        self,
+        file_path: str,
+        original_filename: str,
+        user_id: int,
         db: Session
     ) -> DBDocument:
-        """
-        Process a PDF file, extract text, create vector embeddings, 
-        and store document metadata in PostgreSQL
-        """
+        """Store the document metadata in PostgreSQL, in processing state until ingested"""
         # Generate a unique document ID
         doc_id = str(uuid.uuid4())
-        
-        # Create document record in database (initially in processing state)
+
         db_document = DBDocument(
             doc_id=doc_id,
             user_id=user_id,
@@ -57,45 +86,172 @@ class PDFVectorStoreMgr:
         db.add(db_document)
         db.commit()
         db.refresh(db_document)
-        
+        return db_document
+
+    async def ingest_pdf(
+        self,
+        file_path: str,
+        doc_id: str,
+        user_id: int,
+        progress: Optional[Callable[..., None]] = None
+    ) -> int:
+        """Parse, split and embed a PDF into its owner's vector store, streaming page by page.
+
+        Pages are embedded while later ones are still being parsed, and memory
+        is bounded by the pages and batches in flight, not by the size of the
+        PDF. Every chunk is tagged with `doc_id` and `user_id`.
+        `progress(**counts)` is called with pages_total, pages_parsed,
+        chunks_embedded as they change, and chunks_total once parsing is done.
+        Returns the number of chunks stored.
+        """
+        progress = progress or (lambda **counts: None)
+        dedup = ChunkDeduplicator()
+        pages = chunks = kept = 0
+
+        with trace_span("pdf.ingest", "parse", doc_id=doc_id) as span_attrs:
+            pages_total = await asyncio.to_thread(count_pages, file_path)
+            progress(pages_total=pages_total)
+            # pages are parsed in a process pool and split, deduplicated and embedded as they come;
+            # batched, rate limited and retried, stable ids let a retried job resume
+            async with ChunkWriter(self.user_store(user_id), self.embeddings, doc_id, progress, cache=self.embedding_cache) as writer:
+                async with aclosing(stream_pages(file_path, pages_total)) as page_runs:
+                    async for page_docs in page_runs:
+                        for page in page_docs:
+                            page.page_content = strip_page_numbers(page.page_content)
+                        page_chunks = self.text_splitter.split_documents(page_docs)
+                        for chunk in page_chunks:
+                            chunk.metadata.update(doc_id=doc_id, user_id=user_id)
+                        # repeated headers, legal text, ... are stored once
+                        new_chunks = await asyncio.to_thread(dedup.filter, page_chunks)
+                        pages += len(page_docs)
+                        chunks += len(page_chunks)
+                        kept += len(new_chunks)
+                        progress(pages_parsed=pages)
+                        await writer.add(new_chunks)
+                progress(chunks_total=kept)
+            span_attrs.update(pages=pages, chunks=kept, duplicates=chunks - kept)
+        return kept
+
+    def delete_document_chunks(self, user_id: int, doc_id: str) -> None:
+        """Remove every chunk of a document from its owner's vector store (blocking)"""
+        self.user_store(user_id).delete(where={"doc_id": doc_id})
+
+    def migrate_legacy_chunks(self, db: Session) -> dict:
+        """Copy the chunks of the old shared collection into their owners' collections (blocking).
+
+        Legacy chunks carry no doc_id or user_id, only the temp path they were
+        parsed from, which ends with the original filename. A chunk is copied
+        (with its embedding, tagged with doc_id and user_id) when exactly one
+        processed document without chunks of its own has that filename.
+        The other documents without chunks (e.g. two sharing a filename, which
+        cannot be told apart) are marked `needs_reupload` instead of showing as
+        processed while unsearchable. Safe to run again; the legacy collection
+        is left in place.
+        """
+        stats = {"chunks_copied": 0, "chunks_unattributed": 0, "documents_migrated": 0, "documents_need_reupload": 0}
         try:
-            # Load and split PDF content
-            loader = PyPDFLoader(file_path)
-            pages = loader.load_and_split()
-            docs = self.text_splitter.split_documents(pages)
-            
-            doc_uids = [str(uuid.uuid4()) for _ in docs]
-            
-            self.vector_store.add_documents(documents=docs, ids=doc_uids) # just add one
-            
-            # Update document status to processed
-            db_document.status = "processed"
-            db.commit()
-            
-            return db_document
-            
-        except Exception as e:
-            # Update document status to failed
-            db_document.status = "failed"
-            db.commit()
-            raise e
-    
+            legacy = self.chroma_client.get_collection(legacy_collection)
+        except Exception:
+            return stats
+
+        # processed documents with nothing in their owner's collection predate per-user collections
+        candidates: dict[str, list[DBDocument]] = defaultdict(list)
+        for document in db.query(DBDocument).filter(DBDocument.status == "processed").all():
+            if not self.user_store(document.user_id).get(where={"doc_id": document.doc_id}, limit=1)["ids"]:
+                candidates[document.original_filename].append(document)
+
+        migrated: set[str] = set()
+        offset = 0
+        while True:
+            page = legacy.get(include=["documents", "metadatas", "embeddings"], limit=legacy_page_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+
+            by_owner: dict[DBDocument, list[int]] = defaultdict(list)
+            for i, metadata in enumerate(page["metadatas"]):
+                match = LEGACY_SOURCE_RE.match(os.path.basename((metadata or {}).get("source", "")))
+                owners = candidates.get(match.group(1), []) if match else []
+                if len(owners) == 1:
+                    by_owner[owners[0]].append(i)
+                else:
+                    stats["chunks_unattributed"] += 1
+
+            for document, rows in by_owner.items():
+                self.user_store(document.user_id)._collection.upsert(
+                    ids=[page["ids"][i] for i in rows],
+                    embeddings=[page["embeddings"][i] for i in rows],
+                    documents=[page["documents"][i] for i in rows],
+                    metadatas=[{**(page["metadatas"][i] or {}), "doc_id": document.doc_id, "user_id": document.user_id} for i in rows],
+                )
+                stats["chunks_copied"] += len(rows)
+                migrated.add(document.doc_id)
+
+        for document in (d for documents in candidates.values() for d in documents):
+            if document.doc_id not in migrated:
+                document.status = "needs_reupload"
+                stats["documents_need_reupload"] += 1
+        db.commit()
+        stats["documents_migrated"] = len(migrated)
+        return stats
+
     async def similarity_search(
         self,
-        # doc_id: str,
         query: str,
-        k: int = 4
-    ) -> List[Document]:
-        """Search for similar documents in a specific vector store"""
-        # todo: implement per-document vector stores to utilize doc_id or collection_id etc
+        k: int = 4,
+        user_id: Optional[str] = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> tuple[str, List[Document]]:
+        """Search one user's documents (or only `doc_ids` among them) without blocking the event loop.
+
+        The query is embedded with the async embeddings client, and the Chroma
+        lookup (a local, blocking client) runs in a worker thread. Without a
+        user there is nothing to search.
+        """
+        if user_id is None:
+            return "", []
+
+        with trace_span("chroma.similarity_search", "vector_store", k=k, scoped_docs=len(doc_ids or [])) as span_attrs:
+            query_embedding = await self.embeddings.aembed_query(query)
+            retrieved_docs = await asyncio.to_thread(
+                self.user_store(user_id).similarity_search_by_vector, query_embedding, k, filter=self.doc_filter(doc_ids)
+            )
+            span_attrs["results"] = len(retrieved_docs)
         
-        retrieved_docs = self.vector_store.similarity_search(query=query, k=k)
-        serialized = "\n\n".join(
+        return self.format_docs(retrieved_docs), retrieved_docs
+
+    async def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        user_id: Optional[str] = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> tuple[str, List[Document], List[float]]:
+        """Like `similarity_search`, plus the cosine similarity of each result.
+
+        Chroma returns squared L2 distances; the embeddings are unit length, so
+        similarity = 1 - distance / 2.
+        """
+        if user_id is None:
+            return "", [], []
+
+        with trace_span("chroma.similarity_search", "vector_store", k=k, scoped_docs=len(doc_ids or [])) as span_attrs:
+            query_embedding = await self.embeddings.aembed_query(query)
+            results = await asyncio.to_thread(
+                self.user_store(user_id).similarity_search_by_vector_with_relevance_scores, query_embedding, k, filter=self.doc_filter(doc_ids)
+            )
+            span_attrs["results"] = len(results)
+
+        retrieved_docs = [doc for doc, _ in results]
+        similarities = [1 - distance / 2 for _, distance in results]
+        return self.format_docs(retrieved_docs), retrieved_docs, similarities
+
+    @staticmethod
+    def format_docs(retrieved_docs: List[Document]) -> str:
+        return "\n\n".join(
             (f"source: {doc.metadata}\n content: {doc.page_content}")
             for doc in retrieved_docs
         )
-        
-        return serialized, retrieved_docs
     
     # def delete_vectorstore(self, doc_id: str) -> bool:
     #     """Delete vectorstore for a document"""
@@ -119,3 +275,17 @@ class PDFVectorStoreMgr:
 
 # singleton instance
 pdf_vector_store_mgr = PDFVectorStoreMgr()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Copy the chunks of the old shared `{legacy_collection}` into per-user collections.")
+    parser.parse_args()
+    db = SessionLocal()
+    try:
+        print(pdf_vector_store_mgr.migrate_legacy_chunks(db))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
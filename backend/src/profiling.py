@@ -0,0 +1,196 @@
+"""On-demand CPU and allocation profiling for single requests and graph runs.
+
+Off unless the process runs with `PROFILING_ENABLED=1`: the profilers are
+process-wide and write files on the server, so clients of a public deployment
+must not be able to start them. When enabled, opt-in per request or per run:
+- FastAPI: send the `X-Profile: 1` header (see `profiling_middleware` in app.py);
+  a streaming response is profiled until its body has been sent
+- Graphs: pass `{"configurable": {"profile": True}}` in the run config
+
+The profiled block runs under a sampling profiler (pyinstrument when installed,
+cProfile otherwise) plus `tracemalloc`. Artifacts are written to `PROFILE_DIR`
+(default `.profiles/`):
+- `<label>-<timestamp>.html` (pyinstrument) or `.prof` (cProfile, open with snakeviz / pstats)
+- `<label>-<timestamp>-alloc.txt` with peak traced memory and the top allocation sites
+
+When the flag is absent the only cost is a header / metadata lookup. Only one
+profile runs at a time; the profilers are process-wide, so concurrent requests
+that overlap a profiled one show up in its CPU profile.
+"""
+
+import cProfile
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:  # optional dependency, cProfile is always available
+    SamplingProfiler = None
+
+# ===== CONFIGURATION =====
+
+profiling_enabled = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", ".profiles"))
+PROFILE_HEADER = "x-profile"
+tracemalloc_frames = 10
+top_allocation_sites = 30
+
+_active_lock = threading.Lock()
+
+
+class RunProfiler:
+    """CPU profiler + tracemalloc around one request or run, writing artifacts on stop."""
+
+    def __init__(self, label: str):
+        self.label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_") or "profile"
+        self._cpu = None
+        self._started_tracemalloc = False
+
+    def start(self) -> bool:
+        """ returns False (and profiles nothing) if another profile is already running """
+        if not _active_lock.acquire(blocking=False):
+            print(f"Profiling already active, skipping profile for {self.label}")
+            return False
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(tracemalloc_frames)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+
+        if SamplingProfiler is not None:
+            self._cpu = SamplingProfiler(async_mode="enabled")
+            self._cpu.start()
+        else:
+            self._cpu = cProfile.Profile()
+            self._cpu.enable()
+        return True
+
+    def stop(self) -> list[Path]:
+        """ stop profiling and write the artifacts, returns their paths """
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            stem = PROFILE_DIR / f"{self.label}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+            if SamplingProfiler is not None:
+                self._cpu.stop()
+                cpu_path = stem.with_suffix(".html")
+                cpu_path.write_text(self._cpu.output_html())
+            else:
+                self._cpu.disable()
+                cpu_path = stem.with_suffix(".prof")
+                self._cpu.dump_stats(cpu_path)
+
+            alloc_path = Path(f"{stem}-alloc.txt")
+            stats = snapshot.statistics("lineno")[:top_allocation_sites]
+            with open(alloc_path, "w") as f:
+                f.write(f"peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+                f.write(f"traced memory at stop: {current / 1024 / 1024:.1f} MiB\n\n")
+                f.write(f"top {len(stats)} allocation sites still alive at stop:\n")
+                for stat in stats:
+                    f.write(f"{stat}\n")
+
+            print(f"Profile written: {cpu_path}, {alloc_path}")
+            return [cpu_path, alloc_path]
+        finally:
+            _active_lock.release()
+
+
+@asynccontextmanager
+async def profile_block(label: str):
+    """ profile everything awaited inside the block """
+    profiler = RunProfiler(label)
+    started = profiler.start()
+    try:
+        yield
+    finally:
+        if started:
+            profiler.stop()
+
+
+# ===== FASTAPI HOOK =====
+
+async def profiling_middleware(request, call_next):
+    """ profile a single request when it carries the `X-Profile: 1` header, body included """
+    if not profiling_enabled or request.headers.get(PROFILE_HEADER) not in ("1", "true"):
+        return await call_next(request)
+
+    profiler = RunProfiler(f"http-{request.method}-{request.url.path}")
+    if not profiler.start():
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        profiler.stop()
+        raise
+
+    # the handler has only produced the headers so far: stop once the body is sent
+    body = response.body_iterator
+
+    async def profiled_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            profiler.stop()
+
+    response.body_iterator = profiled_body()
+    return response
+
+
+# ===== GRAPH HOOK =====
+
+class ProfilingCallbackHandler(BaseCallbackHandler):
+    """Profiles a whole graph run when its config sets `configurable.profile`.
+
+    LangChain copies primitive `configurable` values into run metadata, so the
+    flag is visible on the root chain's start event.
+    """
+
+    run_inline = True
+    ignore_llm = True
+    ignore_chat_model = True
+    ignore_retriever = True
+    ignore_agent = True
+    ignore_custom_event = True
+
+    def __init__(self):
+        self._profilers: dict = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs):
+        if not profiling_enabled or parent_run_id is not None or not (metadata or {}).get("profile"):
+            return
+        profiler = RunProfiler(f"graph-{(metadata or {}).get('graph_id') or name or 'run'}")
+        if profiler.start():
+            self._profilers[run_id] = profiler
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._stop(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._stop(run_id)
+
+    def _stop(self, run_id) -> Optional[list[Path]]:
+        profiler = self._profilers.pop(run_id, None)
+        return profiler.stop() if profiler is not None else None
+
+
+# singleton instance
+profiling_handler = ProfilingCallbackHandler()
+
+
+def profiled(graph):
+    """ attach the on-demand profiling hook to a compiled graph """
+    return graph.with_config(callbacks=[profiling_handler])
@@ -87,6 +87,41 @@ Guidelines:
 - If the query is in a specific language, prioritize sources published in that language.
 """
 
+clarify_and_write_research_brief_prompt = """These are the messages that have been exchanged so far from the user asking for the report:
+<Messages>
+{messages}
+</Messages>
+
+Today's date is {date}.
+
+You have two jobs, done in a single response:
+1. Assess whether you need to ask a clarifying question, or if the user has already provided enough information for you to start research.
+2. If no clarification is needed, translate the messages into a detailed and concrete research brief that will be used to guide the research.
+
+IMPORTANT: If you can see in the messages history that you have already asked a clarifying question, you almost always do not need to ask another one. Only ask another question if ABSOLUTELY NECESSARY.
+If there are acronyms, abbreviations, or unknown terms, ask the user to clarify.
+
+If you need to ask a clarifying question, return:
+"need_further_clarification": true,
+"question": "<your clarifying question, concise, markdown formatted, not asking for information the user already provided>",
+"verification": "",
+"research_brief": ""
+
+If you do not need to ask a clarifying question, return:
+"need_further_clarification": false,
+"question": "",
+"verification": "<concise acknowledgement that summarizes the key aspects of the request and confirms that research will now begin>",
+"research_brief": "<the research brief>"
+
+Guidelines for the research brief:
+1. Maximize specificity and detail - include all known user preferences and explicitly list key attributes or dimensions to consider.
+2. Handle unstated dimensions carefully - acknowledge them as open considerations rather than assumed preferences.
+3. Avoid unwarranted assumptions - never invent preferences, constraints, or requirements the user did not state, and treat unspecified aspects as flexible.
+4. Distinguish research scope (what to investigate, can be broader than the user's explicit mentions) from user preferences (must only include what the user stated).
+5. Use the first person - phrase the request from the perspective of the user.
+6. Sources - if specific sources should be prioritized, name them. Prefer official or primary sources, original papers over secondary summaries, and sources in the language of the query.
+"""
+
 research_agent_prompt =  """You are a research assistant conducting research on the user's input topic. For context, today's date is {date}.
 
 <Task>
@@ -376,15 +411,20 @@ This is critical. The user will only understand the answer if it is written in t
 
 Today's date is {date}.
 
-Here are the findings from the research that you conducted:
+Here are the findings from the research that you conducted. Findings cite sources by number, e.g. [3]:
 <Findings>
 {findings}
 </Findings>
 
+Here is the table of every source cited in the findings:
+<Sources>
+{sources}
+</Sources>
+
 Please create a detailed answer to the overall research brief that:
 1. Is well-organized with proper headings (# for title, ## for sections, ### for subsections)
 2. Includes specific facts and insights from the research
-3. References relevant sources using [Title](URL) format
+3. References relevant sources inline with their numbers from the Sources table, e.g. [3]
 4. Provides a balanced, thorough analysis. Be as comprehensive as possible, and include all information that is relevant to the overall research question. People are using you for deep research and will expect detailed, comprehensive answers.
 5. Includes a "Sources" section at the end with all referenced links
 
@@ -432,17 +472,101 @@ Make sure the final answer report is in the SAME language as the human messages
 Format the report in clear markdown with proper structure and include source references where appropriate.
 
 <Citation Rules>
-- Assign each unique URL a single citation number in your text
-- End with ### Sources that lists each source with corresponding numbers
-- IMPORTANT: Number sources sequentially without gaps (1,2,3,4...) in the final list regardless of which sources you choose
+- Always cite a source with its number from the Sources table, so every unique URL keeps a single citation number
+- End with ### Sources that lists each source you cited, with its number and title/URL exactly as in the Sources table
+- Only list sources you actually cited, in ascending order of their numbers
 - Each source should be a separate line item in a list, so that in markdown it is rendered as a list.
 - Example format:
   [1] Source Title: URL
-  [2] Source Title: URL
+  [4] Source Title: URL
 - Citations are extremely important. Make sure to include these, and pay a lot of attention to getting these right. Users will often use these citations to look into more information.
 </Citation Rules>
 """
 
+report_outline_prompt = """You are planning the structure of a research report that answers the following research brief:
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+Today's date is {date}.
+
+The research produced the numbered findings below. Each finding is shown as a short preview.
+<Findings>
+{findings_preview}
+</Findings>
+
+Plan an outline for the report:
+- Choose between 2 and {max_sections} sections. Each section should cover a distinct, non-overlapping part of the answer.
+- For each section, give a title, a one or two sentence description of what it should cover, and the numbers of the findings that are relevant to it.
+- Every finding should be assigned to at least one section. A finding may be relevant to several sections.
+- Do not plan an introduction, conclusion or sources section, those are written separately.
+- Write section titles in the same language as the research brief.
+"""
+
+report_section_prompt = """You are writing one section of a research report that answers the following research brief:
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+Today's date is {date}.
+
+The full report has these sections, in order:
+{outline}
+
+You are writing ONLY this section:
+<Section>
+{section_title}: {section_description}
+</Section>
+
+Use only the findings below:
+<Findings>
+{findings}
+</Findings>
+
+Guidelines:
+- Start with "## {section_title}" and use ### for any subsections.
+- Include specific facts, numbers and insights from the findings. Be thorough, this is a deep research report.
+- Do not repeat material that clearly belongs to another section of the outline.
+- Findings cite sources by number, e.g. [3]. Cite sources inline with exactly those numbers. Do not add a sources list.
+- Do NOT refer to yourself as the writer, and do not add an introduction or conclusion to the report.
+- Write in the same language as the research brief.
+"""
+
+report_synthesis_prompt = """The sections of a research report answering the following research brief have been written separately:
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+Today's date is {date}.
+
+<Sections>
+{sections}
+</Sections>
+
+Write the parts that tie the report together:
+- title: a concise report title
+- introduction: a short overview (one or two paragraphs) of what the report covers and its key takeaways
+- conclusion: a short conclusion that synthesizes the sections and directly answers the research brief
+
+Do not rewrite the sections, and do not add a sources list. Write in the same language as the research brief.
+"""
+
+reduce_findings_prompt = """You are condensing research findings so they fit into the context of a report writer. The findings answer this research brief:
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+<Findings>
+{findings}
+</Findings>
+
+Merge these findings into a single, shorter set of findings:
+- Keep every distinct fact, number, name, date and claim that is relevant to the research brief.
+- Merge statements that say the same thing, and keep all of their sources.
+- Keep inline citations, e.g. [3], and any source URLs exactly as they appear.
+- Drop filler, repetition and internal reasoning.
+"""
+
 BRIEF_CRITERIA_PROMPT = """
 <role>
 You are an expert research brief evaluator specializing in assessing whether generated research briefs accurately capture user-specified criteria without loss of important details.
@@ -569,4 +693,22 @@ Judgment: FAIL - assumes "modern", "safe", and "good schools" preferences
 
 <output_instructions>
 Carefully scan the brief for any details not explicitly provided by the user. Be strict - when in doubt about whether something was user-specified, lean toward FAIL.
-</output_instructions>"""
\ No newline at end of file
+</output_instructions>"""
+conversation_summary_prompt = """You maintain a running summary of a conversation between a user and an AI assistant. Older messages are dropped from the assistant's context and only this summary is kept, so it must preserve what the assistant needs to continue the conversation.
+
+<Current Summary>
+{summary}
+</Current Summary>
+
+<New Messages>
+{new_messages}
+</New Messages>
+
+Update the summary with the new messages:
+- Keep facts the user shared about themselves, their goals and their preferences
+- Keep questions asked, the answers given and any decisions or open follow-ups
+- Keep names, numbers, dates and document references exactly
+- Drop greetings, filler and repetition
+- Write plain prose in the third person, at most 250 words
+
+Return only the updated summary."""
@@ -0,0 +1,247 @@
+"""Sectioned Final Report Generation.
+
+Map-reduce report engine for large research runs, where joining every note into
+one prompt would overrun the context window and serialize the whole report
+into a single generation:
+1. Reduce findings hierarchically until they fit the context budget
+2. Plan an outline that assigns findings to sections
+3. Write all sections concurrently, each from only its own findings
+4. Write title, introduction and conclusion in a short synthesis pass and stitch
+
+Report latency is then bounded by the slowest section rather than the report length.
+"""
+
+import asyncio
+from typing import Callable, Optional
+
+from langchain.chat_models import init_chat_model
+from langchain_core.messages import HumanMessage
+
+from src.cassettes import cassette_chat_model
+from src.cancellation import gather_cancellable
+from src.citations import SourceTable, cited_numbers
+from src.prompts import (
+    report_outline_prompt,
+    report_section_prompt,
+    report_synthesis_prompt,
+    reduce_findings_prompt
+)
+from src.report_states import ReportOutline, ReportSectionPlan, ReportSynthesis
+from src.utils import get_today_str
+
+# ===== CONFIGURATION =====
+
+report_model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "report_sections")
+
+# budgets are in characters (~4 characters per token)
+max_findings_chars = 400_000        # findings sent to one section / reduce call
+findings_preview_chars = 600        # per finding, when planning the outline
+max_reduce_rounds = 3
+
+max_report_sections = 6
+max_concurrent_report_calls = 4
+
+ProgressCallback = Callable[[dict], None]
+
+
+# ===== FINDINGS REDUCTION =====
+
+def _split_oversized(note: str, budget: int) -> list[str]:
+    """ split a single note that is larger than the budget on paragraph boundaries """
+    if len(note) <= budget:
+        return [note]
+
+    pieces, current = [], ""
+    for paragraph in note.split("\n\n"):
+        while len(paragraph) > budget:
+            pieces.append(paragraph[:budget])
+            paragraph = paragraph[budget:]
+        if current and len(current) + len(paragraph) + 2 > budget:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def pack_findings(notes: list[str], budget: int) -> list[list[str]]:
+    """ greedily pack notes, in order, into groups whose total size fits the budget """
+    groups, current, current_size = [], [], 0
+    for note in notes:
+        for piece in _split_oversized(note, budget):
+            if current and current_size + len(piece) > budget:
+                groups.append(current)
+                current, current_size = [], 0
+            current.append(piece)
+            current_size += len(piece)
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def reduce_findings(
+    notes: list[str],
+    research_brief: str,
+    budget: int = max_findings_chars,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> list[str]:
+    """
+    Condense findings until their total size fits the budget.
+
+    Each round packs the findings into budget-sized groups and reduces every group
+    to a single finding concurrently, so the depth of the reduction tree grows with
+    log(total size) instead of the total size.
+    """
+    semaphore = semaphore or asyncio.Semaphore(max_concurrent_report_calls)
+
+    async def reduce_group(group: list[str]) -> str:
+        if len(group) == 1 and len(group[0]) <= budget // 2:
+            return group[0]
+        async with semaphore:
+            response = await report_model.ainvoke([HumanMessage(content=reduce_findings_prompt.format(
+                research_brief=research_brief,
+                findings="\n\n".join(group)
+            ))])
+        return str(response.content)
+
+    for _ in range(max_reduce_rounds):
+        if sum(len(note) for note in notes) <= budget:
+            break
+        notes = await gather_cancellable((reduce_group(group) for group in pack_findings(notes, budget)), kind="report_reduce")
+        notes = list(notes)
+
+    return notes
+
+
+# ===== OUTLINE / SECTIONS / SYNTHESIS =====
+
+def _format_findings(notes: list[str], ids: list[int], preview_chars: Optional[int] = None) -> str:
+    formatted = []
+    for i in ids:
+        note = notes[i]
+        if preview_chars is not None and len(note) > preview_chars:
+            note = note[:preview_chars] + " ..."
+        formatted.append(f"<Finding {i + 1}>\n{note}\n</Finding {i + 1}>")
+    return "\n".join(formatted)
+
+
+async def plan_report_outline(notes: list[str], research_brief: str) -> list[ReportSectionPlan]:
+    """ plan report sections and map each finding to the sections it is relevant to """
+    structured_output_model = report_model.with_structured_output(ReportOutline)
+    response = await structured_output_model.ainvoke([HumanMessage(content=report_outline_prompt.format(
+        research_brief=research_brief,
+        date=get_today_str(),
+        max_sections=max_report_sections,
+        findings_preview=_format_findings(notes, list(range(len(notes))), findings_preview_chars)
+    ))])
+
+    sections = list(response.sections)[:max_report_sections] if response and response.sections else []
+    if not sections:
+        return [ReportSectionPlan(
+            title="Findings",
+            description="All findings relevant to the research brief",
+            finding_ids=list(range(1, len(notes) + 1))
+        )]
+
+    # finding ids are 1-based in the prompt, keep only valid ones
+    for section in sections:
+        section.finding_ids = sorted({i for i in section.finding_ids if 1 <= i <= len(notes)})
+
+    # never drop research: unassigned findings go to the section with the fewest findings
+    assigned = {i for section in sections for i in section.finding_ids}
+    for i in range(1, len(notes) + 1):
+        if i not in assigned:
+            min(sections, key=lambda s: len(s.finding_ids)).finding_ids.append(i)
+
+    return sections
+
+
+async def write_report_section(
+    section: ReportSectionPlan,
+    outline: str,
+    notes: list[str],
+    research_brief: str,
+    semaphore: asyncio.Semaphore
+) -> str:
+    section_notes = [notes[i - 1] for i in section.finding_ids]
+    section_notes = await reduce_findings(section_notes, research_brief, semaphore=semaphore)
+
+    async with semaphore:
+        response = await report_model.ainvoke([HumanMessage(content=report_section_prompt.format(
+            research_brief=research_brief,
+            date=get_today_str(),
+            outline=outline,
+            section_title=section.title,
+            section_description=section.description,
+            findings=_format_findings(section_notes, list(range(len(section_notes))))
+        ))])
+    return str(response.content).strip()
+
+
+async def synthesize_report(sections: list[str], research_brief: str) -> ReportSynthesis:
+    structured_output_model = report_model.with_structured_output(ReportSynthesis)
+    response = await structured_output_model.ainvoke([HumanMessage(content=report_synthesis_prompt.format(
+        research_brief=research_brief,
+        date=get_today_str(),
+        sections="\n\n".join(sections)
+    ))])
+    return response or ReportSynthesis(title="Research Report", introduction="", conclusion="")
+
+
+def collect_sources(sections: list[str], source_table: SourceTable) -> str:
+    """ build the sources list from the global numbers cited in the sections """
+    numbers = sorted(cited_numbers("\n\n".join(sections), source_table))
+    if not numbers:
+        return ""
+    return "### Sources\n" + source_table.format(numbers)
+
+
+# ===== ENTRYPOINT =====
+
+async def generate_sectioned_report(
+    notes: list[str],
+    research_brief: str,
+    source_table: SourceTable,
+    on_progress: Optional[ProgressCallback] = None
+) -> str:
+    """Write the final report as outline -> concurrent sections -> synthesis.
+
+    Args:
+        notes: Research findings, with citations rewritten against `source_table`
+        research_brief: The research brief the report answers
+        source_table: Global source table built by `citations.dedupe_citations`
+        on_progress: Optional callback receiving progress events (e.g. a LangGraph stream writer)
+
+    Returns:
+        The stitched markdown report
+    """
+    on_progress = on_progress or (lambda event: None)
+    semaphore = asyncio.Semaphore(max_concurrent_report_calls)
+
+    notes = [note for note in notes if note.strip()]
+    notes = await reduce_findings(notes, research_brief, semaphore=semaphore)
+    on_progress({"type": "final_report_progress", "stage": "findings_reduced", "findings": len(notes)})
+
+    section_plans = await plan_report_outline(notes, research_brief)
+    outline = "\n".join(f"{n}. {s.title}: {s.description}" for n, s in enumerate(section_plans, start=1))
+    on_progress({"type": "final_report_progress", "stage": "outline", "sections": [s.title for s in section_plans]})
+
+    async def write_and_report(section: ReportSectionPlan) -> str:
+        text = await write_report_section(section, outline, notes, research_brief, semaphore)
+        on_progress({"type": "final_report_progress", "stage": "section_done", "section": section.title})
+        return text
+
+    sections = await gather_cancellable((write_and_report(section) for section in section_plans), kind="report_section")
+    sections = list(sections)
+
+    synthesis = await synthesize_report(sections, research_brief)
+
+    parts = [f"# {synthesis.title}", synthesis.introduction, *sections]
+    if synthesis.conclusion:
+        parts.append(f"## Conclusion\n{synthesis.conclusion}")
+    sources = collect_sources(sections, source_table)
+    if sources:
+        parts.append(sources)
+
+    return "\n\n".join(part.strip() for part in parts if part and part.strip())
@@ -0,0 +1,28 @@
+"""
+Structured schemas for sectioned report generation.
+
+"""
+
+from pydantic import BaseModel, Field
+
+
+class ReportSectionPlan(BaseModel):
+    """Schema for one planned section of the final report."""
+    title: str = Field(description="Title of the section")
+    description: str = Field(description="What the section should cover, in one or two sentences")
+    finding_ids: list[int] = Field(
+        description="Numbers of the findings that are relevant to this section",
+        default_factory=list,
+    )
+
+
+class ReportOutline(BaseModel):
+    """Schema for the report outline planned before sections are written."""
+    sections: list[ReportSectionPlan] = Field(description="Sections of the report, in order")
+
+
+class ReportSynthesis(BaseModel):
+    """Schema for the parts of the report written after the sections."""
+    title: str = Field(description="Concise report title")
+    introduction: str = Field(description="Short overview of the report and its key takeaways")
+    conclusion: str = Field(description="Short conclusion that answers the research brief")
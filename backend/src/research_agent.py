@@ -13,6 +13,12 @@ from langgraph.checkpoint.memory import MemorySaver
 from src.prompts import research_agent_prompt, compress_research_system_prompt, compress_research_human_message
 from src.research_states import ResearcherAgentState
 from src.utils import tavily_search_tool, think_tool, get_today_str
+from src.deadline import has_time_for, compress_reserve_s
+from src.profiling import profiled
+from src.admission import admitted, deep_research_admission
+from src.tracing import traced
+from src.cassettes import cassette_chat_model
+from src.cancellation import gather_cancellable
 
 
 
@@ -24,15 +30,15 @@ tools_by_name = {tool.name: tool for tool in tools}
 load_dotenv()
 if not os.environ.get("GOOGLE_API_KEY"):
     os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter API key for Google Gemini: ")
-model = init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai")
+model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "researcher")
 model_with_tools = model.bind_tools(tools)
-summarize_model = init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai")
-compress_model = init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai")
+summarize_model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "researcher_summarize")
+compress_model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "compress")
 
 
 # ===== workflow nodes =====
 
-def llm_call(state: ResearcherAgentState):
+async def llm_call(state: ResearcherAgentState):
     
     # Ensure the model receives at least one HumanMessage; Gemini rejects empty contents
     prior_messages = state.get("researcher_messages", [])
@@ -49,20 +55,20 @@ def llm_call(state: ResearcherAgentState):
 
     return {
         "researcher_messages": [
-            model_with_tools.invoke(
+            await model_with_tools.ainvoke(
                 [system_instruction] + prior_messages
             )
         ]
     }
 
-def tool_node(state: ResearcherAgentState):
+async def tool_node(state: ResearcherAgentState):
     tool_calls = state['researcher_messages'][-1].tool_calls
 
-    observations = []
-    for tool_call in tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observation = tool.invoke(tool_call['args'])
-        observations.append(observation)
+    # async tools, so a cancelled run also cancels in-flight searches and summarizations
+    observations = await gather_cancellable(
+        (tools_by_name[tool_call["name"]].ainvoke(tool_call['args']) for tool_call in tool_calls),
+        kind="tool_call",
+    )
     
     tool_outputs = [
         ToolMessage(
@@ -75,13 +81,13 @@ def tool_node(state: ResearcherAgentState):
     # add to state messages
     return {"researcher_messages": tool_outputs}
 
-def compress_research(state: ResearcherAgentState):
+async def compress_research(state: ResearcherAgentState):
     """ Takes all AI and tool outputs and compresses them into a summary suitable for the supervisor's decision making """
-    system_message = compress_research_system_prompt.format(date=get_today_str())
+    system_message = SystemMessage(content=compress_research_system_prompt.format(date=get_today_str()))
     human_instruction = HumanMessage(content=compress_research_human_message.format(research_topic=state.get("research_topic", "No topic specified")))
-    messages = [system_message] + state.get("researcher_messages", []) + human_instruction
+    messages = [system_message] + list(state.get("researcher_messages", [])) + [human_instruction]
 
-    compressed_research = compress_model.invoke(messages)
+    compressed_research = await compress_model.ainvoke(messages)
 
     raw_notes = [
         str(m.content) for m in filter_messages(
@@ -91,7 +97,7 @@ def compress_research(state: ResearcherAgentState):
     ]
 
     return {
-        "compressed_research": compressed_research,
+        "compressed_research": str(compressed_research.content),
         "raw_notes": ['\n'.join(raw_notes)]
     }
 
@@ -103,6 +109,8 @@ def should_continue(state: ResearcherAgentState) -> Literal["tool_node", "compre
 
     if last_message.tool_calls == []:
         return "compress_research"
+    elif not has_time_for(state.get("deadline"), compress_reserve_s):
+        return "compress_research" # out of time, compress what has been found so far
     else:
         return "tool_node" # there are more tool calls to be made
     
@@ -125,7 +133,7 @@ agent_builder.add_conditional_edges(
 )
 agent_builder.add_edge("tool_node", "llm_call") # loop back to LLM after tool use
 agent_builder.add_edge("compress_research", END)
-research_agent = agent_builder.compile()
+research_agent = admitted(profiled(traced(agent_builder.compile())), deep_research_admission)
 
 
 
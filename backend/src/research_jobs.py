@@ -0,0 +1,411 @@
+"""Persistent job queue and worker pool for deep research runs.
+
+A deep research run takes minutes, so instead of holding an HTTP connection
+open, clients submit a job (see `job_routes.py`), get a job id back and poll or
+stream its progress. Jobs and their progress events live in the database
+(`research_jobs` / `research_job_events`), so they survive API and worker
+restarts, and any number of worker processes can share the queue:
+
+    python -m src.research_jobs --workers 4 --jobs-per-worker 2
+
+Workers claim queued jobs with an atomic conditional UPDATE (works on Postgres
+and SQLite), sharing the queue fairly across users (see `claim_next_job`),
+refresh a heartbeat while running, and requeue jobs whose worker stopped
+heartbeating. Throughput scales with the number of workers.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.admission import deep_research_per_user, max_waiting_per_user
+from src.cancellation import record_cancelled
+from src.database import DBJobEvent, DBResearchJob, SessionLocal
+
+# ===== CONFIGURATION =====
+
+poll_interval_s = 2.0
+heartbeat_interval_s = 5.0    # also how often a running job checks for a cancel request
+stale_after_s = 120.0       # running jobs without a heartbeat for this long are requeued
+max_attempts = 3
+max_event_chars = 4_000     # progress events are for display, not for the report
+claim_scan_limit = 50       # queued jobs considered per claim
+max_pending_jobs_per_user = deep_research_per_user + max_waiting_per_user
+
+
+# ===== QUEUE =====
+
+def submit_job(db: Session, user_id: int, query: str, time_budget_s: Optional[float] = None) -> DBResearchJob:
+    """ enqueue a research request, returns the stored job """
+    job = DBResearchJob(job_id=str(uuid.uuid4()), user_id=user_id, query=query, time_budget_s=time_budget_s)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    record_event(db, job.job_id, {"type": "job_status", "status": "queued"})
+    return job
+
+
+def _event_row(job_id: str, event: dict) -> DBJobEvent:
+    payload = json.dumps(event, default=str)
+    if len(payload) > max_event_chars:
+        payload = json.dumps({"type": event.get("type", "event"), "truncated": True})
+    return DBJobEvent(job_id=job_id, event=payload)
+
+
+def record_event(db: Session, job_id: str, event: dict) -> None:
+    record_events(db, job_id, [event])
+
+
+def record_events(db: Session, job_id: str, events: list[dict]) -> None:
+    """ insert events in order, one commit for all of them """
+    db.add_all([_event_row(job_id, event) for event in events])
+    db.commit()
+
+
+def list_events(db: Session, job_id: str, after_id: int = 0) -> list[DBJobEvent]:
+    return (
+        db.query(DBJobEvent)
+        .filter(DBJobEvent.job_id == job_id, DBJobEvent.id > after_id)
+        .order_by(DBJobEvent.id)
+        .all()
+    )
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[DBResearchJob]:
+    """ atomically move the next queued job to running, None when nothing can run.
+
+    Fair share across users: jobs of users with the fewest running jobs go
+    first (oldest first within a tie), and users already at
+    `deep_research_per_user` running jobs are skipped. The per-user limit is
+    soft across workers, two workers claiming at the same instant may exceed it
+    by one.
+    """
+    running = dict(
+        db.query(DBResearchJob.user_id, func.count(DBResearchJob.id))
+        .filter(DBResearchJob.status == "running")
+        .group_by(DBResearchJob.user_id)
+        .all()
+    )
+    candidates = (
+        db.query(DBResearchJob.id, DBResearchJob.user_id)
+        .filter(DBResearchJob.status == "queued")
+        .order_by(DBResearchJob.id)
+        .limit(claim_scan_limit)
+        .all()
+    )
+    candidates = sorted(
+        (c for c in candidates if running.get(c.user_id, 0) < deep_research_per_user),
+        key=lambda c: (running.get(c.user_id, 0), c.id),
+    )
+    now = datetime.utcnow()
+    for job_pk, _ in candidates:
+        # only one worker's UPDATE can match status == "queued"
+        claimed = (
+            db.query(DBResearchJob)
+            .filter(DBResearchJob.id == job_pk, DBResearchJob.status == "queued")
+            .update({
+                "status": "running",
+                "worker_id": worker_id,
+                "started_at": now,
+                "heartbeat_at": now,
+                "attempts": DBResearchJob.attempts + 1,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return db.get(DBResearchJob, job_pk)
+    return None
+
+
+def pending_job_count(db: Session, user_id: int) -> int:
+    """ queued + running jobs of a user """
+    return (
+        db.query(func.count(DBResearchJob.id))
+        .filter(DBResearchJob.user_id == user_id, DBResearchJob.status.in_(("queued", "running", "cancelling")))
+        .scalar()
+    )
+
+
+def heartbeat(db: Session, job_id: str) -> Optional[str]:
+    """ refresh the heartbeat of a running job, returns its current status """
+    db.query(DBResearchJob).filter(DBResearchJob.job_id == job_id).update(
+        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+    return db.query(DBResearchJob.status).filter(DBResearchJob.job_id == job_id).scalar()
+
+
+def cancel_job(db: Session, job: DBResearchJob) -> str:
+    """ cancel a queued job right away, or ask the worker running it to stop; returns the new status """
+    if job.status == "queued":
+        cancelled = (
+            db.query(DBResearchJob)
+            .filter(DBResearchJob.id == job.id, DBResearchJob.status == "queued")
+            .update({"status": "cancelled", "finished_at": datetime.utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+        if cancelled:
+            record_event(db, job.job_id, {"type": "job_status", "status": "cancelled"})
+            return "cancelled"
+        db.refresh(job)  # claimed in the meantime
+    if job.status == "running":
+        db.query(DBResearchJob).filter(DBResearchJob.id == job.id, DBResearchJob.status == "running").update(
+            {"status": "cancelling"}, synchronize_session=False
+        )
+        db.commit()
+        record_event(db, job.job_id, {"type": "job_status", "status": "cancelling"})
+        return "cancelling"
+    return job.status
+
+
+def finish_job(db: Session, job_id: str, status: str, report: Optional[str] = None, error: Optional[str] = None) -> bool:
+    """ move a running (or cancelling) job to a terminal status, False if it already has one """
+    finished = (
+        db.query(DBResearchJob)
+        .filter(DBResearchJob.job_id == job_id, DBResearchJob.status.in_(("running", "cancelling")))
+        .update(
+            {"status": status, "report": report, "error": error, "finished_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if finished:
+        record_event(db, job_id, {"type": "job_status", "status": status, **({"error": error} if error else {})})
+    return bool(finished)
+
+
+def requeue_job(db: Session, job_id: str) -> None:
+    """ hand a running job back to the queue, e.g. when its worker shuts down """
+    db.query(DBResearchJob).filter(DBResearchJob.job_id == job_id).update(
+        {"status": "queued", "worker_id": None}, synchronize_session=False
+    )
+    db.commit()
+
+
+def _requeue_and_claim(db: Session, worker_id: str) -> Optional[DBResearchJob]:
+    requeue_stale_jobs(db)
+    return claim_next_job(db, worker_id)
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """ put jobs of dead workers back in the queue (or fail them after max_attempts) """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_s)
+    stale = (
+        db.query(DBResearchJob)
+        .filter(DBResearchJob.status.in_(("running", "cancelling")), DBResearchJob.heartbeat_at < cutoff)
+        .all()
+    )
+    for job in stale:
+        if job.status == "cancelling":
+            finish_job(db, job.job_id, "cancelled")
+        elif job.attempts >= max_attempts:
+            finish_job(db, job.job_id, "failed", error=f"worker lost {job.attempts} times")
+        else:
+            job.status = "queued"
+            job.worker_id = None
+            db.commit()
+            record_event(db, job.job_id, {"type": "job_status", "status": "queued", "reason": "worker lost"})
+    return len(stale)
+
+
+# ===== WORKER =====
+
+# the worker's event loop runs several jobs' graphs: its database calls go to
+# worker threads, each with a session of its own
+
+def _in_session(fn, *args, **kwargs):
+    """ fn(db, *args, **kwargs) with a fresh session, for asyncio.to_thread """
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+class EventWriter:
+    """Buffers a job's progress events and inserts them in order, in batches, from a worker thread."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.pending: list[dict] = []
+        self.flushing: Optional[asyncio.Task] = None
+
+    def add(self, event: dict) -> None:
+        self.pending.append(event)
+        if self.flushing is None or self.flushing.done():
+            self.flushing = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        # one batch in flight at a time, events that arrive meanwhile form the next batch
+        while self.pending:
+            batch, self.pending = self.pending, []
+            try:
+                await asyncio.to_thread(_in_session, record_events, self.job_id, batch)
+            except Exception as e:
+                print(f"Could not record {len(batch)} events of research job {self.job_id}: {e}")
+
+    async def close(self) -> None:
+        """ wait until every event added so far is stored """
+        if self.flushing is not None:
+            await asyncio.shield(self.flushing)
+        if self.pending:
+            await self._flush()
+
+def _progress_event(mode: str, namespace: tuple, chunk) -> Optional[dict]:
+    """ compact progress event from a graph stream item """
+    if mode == "custom":
+        return chunk if isinstance(chunk, dict) else {"type": "custom", "value": str(chunk)}
+    if mode == "updates":
+        return {"type": "node_finished", "nodes": list(chunk.keys()), "namespace": list(namespace)}
+    return None
+
+
+async def run_job(job: DBResearchJob) -> None:
+    """ execute one claimed job with `deep_research_agent`, recording progress in the database """
+    from src.full_agent import deep_research_agent
+
+    job_id = job.job_id
+    events = EventWriter(job_id)
+    run_task = asyncio.current_task()
+    cancel_requested = False
+    cancel_started = None
+
+    async def finish(status: str, **kwargs) -> None:
+        # no cancel from the heartbeat once the outcome is known
+        keep_alive_task.cancel()
+        # the final status event comes after every progress event
+        await events.close()
+        await asyncio.to_thread(_in_session, finish_job, job_id, status, **kwargs)
+
+    async def keep_alive():
+        nonlocal cancel_requested, cancel_started
+        while True:
+            await asyncio.sleep(heartbeat_interval_s)
+            if await asyncio.to_thread(_in_session, heartbeat, job_id) == "cancelling":
+                # cancels the whole task tree: researchers, searches, summarizations, LLM calls
+                cancel_requested = True
+                cancel_started = time.perf_counter()
+                run_task.cancel()
+                return
+
+    keep_alive_task = asyncio.create_task(keep_alive())
+    try:
+        events.add({"type": "job_status", "status": "running", "worker_id": job.worker_id, "attempt": job.attempts})
+        configurable = {"thread_id": job_id}
+        if job.time_budget_s:
+            configurable["time_budget_s"] = job.time_budget_s
+
+        report = None
+        last_message = None
+        async for namespace, mode, chunk in deep_research_agent.astream(
+            {"messages": [HumanMessage(content=job.query)]},
+            config={"configurable": configurable},
+            stream_mode=["updates", "custom"],
+            subgraphs=True,
+        ):
+            if mode == "updates" and not namespace:
+                for update in chunk.values():
+                    if isinstance(update, dict):
+                        report = update.get("final_report") or report
+                        last_message = (update.get("messages") or [last_message])[-1]
+            event = _progress_event(mode, namespace, chunk)
+            if event is not None:
+                events.add(event)
+
+        if report:
+            await finish("succeeded", report=report)
+        else:
+            # scoping asked a question instead of writing a brief
+            question = getattr(last_message, "content", None)
+            await finish("needs_clarification", error=str(question) if question else "no report produced")
+    except asyncio.CancelledError:
+        if cancel_requested:
+            record_cancelled("run", 1, time.perf_counter() - cancel_started)
+            await finish("cancelled")
+            return
+        # worker shutting down: hand the job back to the queue
+        await events.close()
+        await asyncio.to_thread(_in_session, requeue_job, job_id)
+        raise
+    except Exception as e:
+        print(f"Research job {job_id} failed: {e}")
+        await finish("failed", error=f"{type(e).__name__}: {e}")
+    finally:
+        keep_alive_task.cancel()
+
+
+async def worker_loop(worker_id: str, jobs_per_worker: int = 1) -> None:
+    """ claim and run jobs forever, at most `jobs_per_worker` at a time """
+    slots = asyncio.Semaphore(jobs_per_worker)
+    running: set[asyncio.Task] = set()
+    print(f"Research worker {worker_id} started")
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                job = await asyncio.to_thread(_in_session, _requeue_and_claim, worker_id)
+            except BaseException:
+                slots.release()
+                raise
+            if job is None:
+                slots.release()
+                await asyncio.sleep(poll_interval_s)
+                continue
+
+            task = asyncio.create_task(run_job(job))
+            running.add(task)
+            task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+def _worker_process(index: int, jobs_per_worker: int) -> None:
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    try:
+        asyncio.run(worker_loop(worker_id, jobs_per_worker))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(workers: int, jobs_per_worker: int) -> None:
+    """ start `workers` worker processes and wait for them """
+    if workers == 1:
+        _worker_process(0, jobs_per_worker)
+        return
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(i, jobs_per_worker), daemon=False)
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run deep research job workers.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("RESEARCH_WORKERS", "2")), help="worker processes")
+    parser.add_argument("--jobs-per-worker", type=int, default=1, help="concurrent jobs per worker process")
+    args = parser.parse_args()
+    run_workers(args.workers, args.jobs_per_worker)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ State definitions and structured schemas for the researcher agent workflow.
 """
 
 import operator
-from typing_extensions import TypedDict, List, Sequence, Annotated
+from typing_extensions import TypedDict, List, Optional, Sequence, Annotated
 from pydantic import BaseModel, Field
 
 from langchain_core.messages import BaseMessage
@@ -20,9 +20,12 @@ class ResearcherAgentState(TypedDict):
         researcher_messages: Ordered conversation history for the researcher
             node.
         raw_notes: Accumulated free-form notes captured during research.
+        deadline: Unix timestamp by which research should be compressed, None
+            without a time budget.
     """
     research_topic: str
     tool_call_iterations: int
+    deadline: Optional[float]
     researcher_messages: Annotated[Sequence[BaseMessage], add_messages]
     raw_notes: Annotated[List[str], operator.add] # just the tool and AI messages, no Human messages
     
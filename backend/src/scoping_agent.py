@@ -4,6 +4,9 @@ This module implements the scoping phase of the research workflow, where we:
 1. Assess if the user's request needs clarification
 2. Generate a detailed research brief from the conversation
 
+`clarify_and_write_research_brief` is the fast path that does both in a single
+structured call, so the common no-clarification case costs one LLM round trip.
+
 The workflow uses structured output to make deterministic decisions about
 whether sufficient context exists to proceed with research.
 """
@@ -16,12 +19,22 @@ from dotenv import load_dotenv
 
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, AIMessage, get_buffer_string
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Command
 
-from src.prompts import clarify_with_user_instructions, transform_messages_into_research_topic_prompt
-from src.scoping_states import AgentState, ClarifyWithUserSchema, ResearchQuestionSchema, AgentInputSchema
-from utils import get_today_str
+from src.prompts import (
+    clarify_with_user_instructions,
+    transform_messages_into_research_topic_prompt,
+    clarify_and_write_research_brief_prompt
+)
+from src.scoping_states import AgentState, ClarifyWithUserSchema, ResearchQuestionSchema, ScopeResearchSchema, AgentInputSchema
+from src.deadline import resolve_deadlines
+from src.profiling import profiled
+from src.admission import admitted, deep_research_admission
+from src.tracing import traced
+from src.cassettes import cassette_chat_model
+from src.utils import get_today_str
 
 # ===== CONFIGURATION =====
 
@@ -29,17 +42,20 @@ from utils import get_today_str
 load_dotenv()
 if not os.environ.get("GOOGLE_API_KEY"):
     os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter API key for Google Gemini: ")
-model = init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai")
+model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "scoping")
 
 # ===== WORKFLOW NODES =====
 
-def clarify_with_user(state: AgentState) -> Command[Literal["write_research_brief", "__end__"]]:
+def clarify_with_user(state: AgentState, config: RunnableConfig) -> Command[Literal["write_research_brief", "__end__"]]:
     """
     Determine if the user's request contains sufficient information to proceed with research.
     
     Uses structured output to make deterministic decisions and avoid hallucination.
     Routes to either research brief generation or ends with a clarification question.
+    As the first node of a run, it also resolves the run's time budget into deadlines.
     """
+    # the budget clock starts before the first model call
+    deadlines = resolve_deadlines(config)
     # Set up structured output model
     structured_output_model = model.with_structured_output(ClarifyWithUserSchema)
 
@@ -55,12 +71,12 @@ def clarify_with_user(state: AgentState) -> Command[Literal["write_research_brie
     if response.need_further_clarification:
         return Command(
             goto=END, 
-            update={"messages": [AIMessage(content=response.question)]}
+            update={"messages": [AIMessage(content=response.question)], **deadlines}
         )
     else:
         return Command(
             goto="write_research_brief", 
-            update={"messages": [AIMessage(content=response.verification)]}
+            update={"messages": [AIMessage(content=response.verification)], **deadlines}
         )
 
 def write_research_brief(state: AgentState):
@@ -87,6 +103,50 @@ def write_research_brief(state: AgentState):
         "supervisor_messages": [HumanMessage(content=f"{response.research_brief}.")]
     }
 
+def clarify_and_write_research_brief(state: AgentState, config: RunnableConfig):
+    """
+    Fast-path scoping: decide on clarification and write the research brief in one call.
+    
+    Route with `route_after_scoping`. If the model skips clarification but leaves the
+    brief empty, falls back to `write_research_brief` so research never starts without one.
+    As the first node of a run, it also resolves the run's time budget into deadlines.
+    """
+    deadlines = resolve_deadlines(config)
+    structured_output_model = model.with_structured_output(ScopeResearchSchema)
+    
+    response = structured_output_model.invoke([
+        HumanMessage(content=clarify_and_write_research_brief_prompt.format(
+            messages=get_buffer_string(messages=state["messages"]), 
+            date=get_today_str()
+        ))
+    ])
+    
+    if response.need_further_clarification:
+        # clear any brief left over from an earlier turn of the same thread
+        return {
+            "messages": [AIMessage(content=response.question)],
+            "research_brief": "",
+            **deadlines
+        }
+    
+    verification = AIMessage(content=response.verification)
+    if not response.research_brief:
+        brief_update = write_research_brief({**state, "messages": list(state["messages"]) + [verification]})
+        return {"messages": [verification], **brief_update, **deadlines}
+    
+    return {
+        "messages": [verification],
+        "research_brief": response.research_brief,
+        "supervisor_messages": [HumanMessage(content=f"{response.research_brief}.")],
+        **deadlines
+    }
+
+def route_after_scoping(state: AgentState) -> Literal["start_research", "__end__"]:
+    """ continue to research once a brief exists, otherwise end the turn with the clarifying question """
+    if state.get("research_brief"):
+        return "start_research"
+    return END
+
 # ===== GRAPH CONSTRUCTION =====
 
 # Build the scoping workflow
@@ -101,4 +161,4 @@ scope_research_builder.add_edge(START, "clarify_with_user")
 scope_research_builder.add_edge("write_research_brief", END)
 
 # Compile the workflow - this get imported from langgraph.json to expose to api..
-scope_research = scope_research_builder.compile()
\ No newline at end of file
+scope_research = admitted(profiled(traced(scope_research_builder.compile())), deep_research_admission)
\ No newline at end of file
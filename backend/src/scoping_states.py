@@ -21,6 +21,9 @@ class AgentState(MessagesState):
     notes: Annotated[list[str], operator.add] = []
     # Final formatted research report
     final_report: str
+    # Absolute run deadline and research cutoff (unix timestamps), None without a time budget
+    deadline: Optional[float]
+    research_deadline: Optional[float]
     
 
 
@@ -48,4 +51,20 @@ class ResearchQuestionSchema(BaseModel):
     research_brief: str = Field(
         description="A research question that will be used to guide the research.",
     )
-    
\ No newline at end of file
+    
+    
+class ScopeResearchSchema(BaseModel):
+    """ schema for single-call scoping: clarification decision and research brief in one response """
+    
+    need_further_clarification: bool = Field(
+        description = "Whether the user needs to be asked a further question",
+    )
+    question: str = Field(
+        description="A question to ask the user to clarify the report scope",
+    )
+    verification: str = Field(
+        description="Verify message that we will start research after the user has provided the necessary information.",
+    )
+    research_brief: str = Field(
+        description="A research question that will be used to guide the research. Empty if clarification is needed.",
+    )
@@ -1,17 +1,30 @@
 import getpass
 import os
-from typing import TypedDict, Annotated, Sequence
+import uuid
+from typing import TypedDict, Annotated, Literal, Sequence
 from dotenv import load_dotenv 
 
-from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, trim_messages
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import START, END, MessagesState, StateGraph
 from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.types import Command
 
 from src.pdf_vector_store_manager import pdf_vector_store_mgr
+from src.profiling import profiled
+from src.admission import admitted, interactive_admission
+from src.tracing import traced
+from src.cassettes import cassette_chat_model
+from src.chat_memory import chat_memory
+from src.answer_cache import answer_cache, cache_scope, cacheable_turn
+from src.chat_router import route_question
+from src.context_packing import count_tokens, pack_context, retrieval_k
+from src.langgraph_auth import run_doc_ids, run_user_id
 
 load_dotenv() # load from .env file
 
@@ -20,14 +33,14 @@ if "GOOGLE_API_KEY" not in os.environ:
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 
-llm = ChatGoogleGenerativeAI(
+llm = cassette_chat_model(ChatGoogleGenerativeAI(
     model="gemini-2.5-flash-lite",
     temperature=0,
     max_tokens=None,
     timeout=None,
     max_retries=2,
     # other params...
-)
+), "chat")
 
 prompt_template = ChatPromptTemplate.from_messages(
     [
@@ -35,18 +48,24 @@ prompt_template = ChatPromptTemplate.from_messages(
             "system",
             "you are a helpful AI assistant, your name is gemini \
             If the user's query asks about uploaded documents, call the retrieve_tool. \
-            Otherwise, respond directly as a general assistant."
+            Otherwise, respond directly as a general assistant.{summary}"
         ),
         MessagesPlaceholder(variable_name="messages"),
     ]
 )
 
+def summary_section(summary: str) -> str:
+    """ running summary of the turns that fell out of the history window """
+    return f"\n\nSummary of the earlier conversation:\n{summary}" if summary else ""
+
 # tools
-@tool
-def retrieve_tool(query: str):
+@tool(response_format="content_and_artifact")
+async def retrieve_tool(query: str, config: RunnableConfig):
     """ retrieve information from uploaded documents """
-    # just a wrapper
-    return pdf_vector_store_mgr.similarity_search(query=query)
+    # just a wrapper, returns (serialized context, retrieved documents) from the caller's own documents
+    return await pdf_vector_store_mgr.similarity_search(
+        query=query, k=retrieval_k, user_id=run_user_id(config), doc_ids=run_doc_ids(config)
+    )
 
 
 local_tools = [retrieve_tool]
@@ -57,16 +76,67 @@ llm_with_tools = llm.bind_tools(tools_set)
 
 
 
+def last_question(messages: Sequence[BaseMessage]) -> str:
+    """ content of the latest human message """
+    return next((str(m.content) for m in reversed(messages) if m.type == "human"), "")
+
+def retrieval_messages(question: str, context: str, metadata: dict, docs: list = None) -> list[BaseMessage]:
+    """ a retrieve_tool call and its result, same shape as a real retrieval turn so generate and the history stay unchanged """
+    tool_call_id = f"local_{uuid.uuid4().hex[:12]}"
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[{"name": retrieve_tool.name, "args": {"query": question}, "id": tool_call_id, "type": "tool_call"}],
+            additional_kwargs={"metadata": metadata},
+        ),
+        ToolMessage(content=context, artifact=docs or [], name=retrieve_tool.name, tool_call_id=tool_call_id),
+    ]
+
+# node 0
+async def check_cache(state: MessagesState, config: RunnableConfig) -> Command[Literal["route", "generate", "__end__"]]:
+    """Answer from the semantic answer cache, or reuse a cached retrieval, before any LLM call."""
+    if state["messages"][-1].type != "human" or not cacheable_turn(state["messages"]):
+        return Command(goto="route")
+    scope = await cache_scope(config)
+    if scope is None:
+        return Command(goto="route")
+    question = last_question(state["messages"])
+
+    kind, entry, similarity = await answer_cache.lookup(scope, question)
+    metadata = {"type": f"cached_{kind}", "similarity": round(similarity, 4)}
+    if kind == "answer":
+        return Command(
+            goto=END,
+            update={"messages": [AIMessage(content=entry.answer, additional_kwargs={"metadata": metadata})]},
+        )
+    if kind == "context":
+        return Command(goto="generate", update={"messages": retrieval_messages(question, entry.context, metadata)})
+    return Command(goto="route")
+
+# node 0b
+async def route(state: MessagesState, config: RunnableConfig) -> Command[Literal["call_model", "generate"]]:
+    """Retrieve without asking the model when the local router is confident, so the turn takes one LLM call."""
+    if state["messages"][-1].type != "human":
+        return Command(goto="call_model")
+    question = str(state["messages"][-1].content)
+    decision = await route_question(question, run_user_id(config), run_doc_ids(config))
+    if decision.route == "retrieve":
+        metadata = {"type": "routed_retrieval", "reason": decision.reason, "similarity": round(decision.similarity, 4)}
+        return Command(goto="generate", update={"messages": retrieval_messages(question, decision.context, metadata, decision.docs)})
+    return Command(goto="call_model")
+
 # node 1 
-def call_model(state: MessagesState):
-    """Call the LLM with the running message history and append the AI reply."""
-    # You can optionally insert a system message or prompt template here.
-    prompt = prompt_template.invoke({"messages": state["messages"]})
-    response = llm_with_tools.invoke(prompt)
+async def call_model(state: MessagesState, config: RunnableConfig):
+    """Call the LLM with the recent message history and append the AI reply."""
+    # recent turns verbatim, older ones only through the running summary
+    summary, recent = chat_memory.window(state["messages"], config)
+    prompt = await prompt_template.ainvoke({"messages": recent, "summary": summary_section(summary)})
+    response = await llm_with_tools.ainvoke(prompt)
     
     return {
         "messages": [AIMessage(
             content=response.content,
+            tool_calls=response.tool_calls,  # keep them, tools_condition routes on them
             additional_kwargs={"metadata": {"type": "simple_reply"}}
         )],  # append the AI response to the message history
     }
@@ -75,7 +145,7 @@ def call_model(state: MessagesState):
 tool_node = ToolNode(tools=tools_set)
 
 # node 3
-def generate(state: MessagesState):
+async def generate(state: MessagesState, config: RunnableConfig):
     # collect all the retrieved context
     recent_tool_msgs = []
     for msg in reversed(state['messages']):
@@ -84,8 +154,18 @@ def generate(state: MessagesState):
         else:
             break
     tool_msgs = recent_tool_msgs[::-1] # reverse
-    
-    context_combined = "\n\n".join(doc.content for doc in tool_msgs)
+    question = last_question(state["messages"])
+
+    # dedupe, diversify, merge and budget the retrieved chunks
+    # (a context reused from the answer cache is packed already and has no documents)
+    docs = [doc for msg in tool_msgs for doc in (msg.artifact or []) if isinstance(doc, Document)]
+    if docs:
+        packed = pack_context(question, docs)
+        context_combined = packed.text
+        context_tokens = {"before": packed.tokens_before, "after": packed.tokens_after}
+    else:
+        context_combined = "\n\n".join(doc.content for doc in tool_msgs)
+        context_tokens = {"before": count_tokens(context_combined), "after": count_tokens(context_combined)}
     system_message_content = (
         "You are an assistant for question-answering tasks. "
         "Use the following pieces of retrieved context to answer "
@@ -96,26 +176,34 @@ def generate(state: MessagesState):
         f"{context_combined}"
     )
     
-    # non tool calls
+    # non tool calls, windowed like in call_model
+    summary, recent = chat_memory.window(state["messages"], config, count=False)
     conversation_msgs = [
         msg
-        for msg in state["messages"]
+        for msg in recent
         if msg.type in ('system', 'human')
         or msg.type == 'ai' and not msg.tool_calls
     ]
-    past_convo = [SystemMessage(system_message_content)] + conversation_msgs
+    past_convo = [SystemMessage(system_message_content + summary_section(summary))] + conversation_msgs
     
-    response = llm.invoke(past_convo)
+    response = await llm.ainvoke(past_convo)
+    response.additional_kwargs["metadata"] = {"type": "rag_answer", "context_tokens": context_tokens}
+
+    scope = await cache_scope(config) if cacheable_turn(state["messages"]) else None
+    if scope is not None:
+        await answer_cache.store(scope, question, str(response.content), context_combined)
     return {"messages" : [response]}
 
 
 
 workflow = StateGraph(state_schema=MessagesState)
+workflow.add_node("check_cache", check_cache)
+workflow.add_node("route", route)
 workflow.add_node("call_model", call_model)
 workflow.add_node("tools", tool_node)
 workflow.add_node("generate", generate)
 
-workflow.add_edge(START, "call_model")
+workflow.add_edge(START, "check_cache")
 workflow.add_conditional_edges(
     "call_model",
     tools_condition,
@@ -126,4 +214,4 @@ workflow.add_edge("generate", END)
 
 # Enable memory so the server can preserve state per thread_id
 # memory = MemorySaver()
-simple_chat = workflow.compile()
+simple_chat = admitted(profiled(traced(workflow.compile())), interactive_admission)
@@ -0,0 +1,326 @@
+"""Compact serializer for graph state and checkpoints.
+
+Deep research state is dominated by a few large lists (`supervisor_messages`,
+`researcher_messages`, `notes`, `raw_notes`) that only ever grow by appending.
+The default checkpoint serializer re-encodes every list in full each time a
+channel changes, so successive checkpoints mostly repeat the same bytes.
+
+`CompactSerializer` wraps the default LangGraph serializer and:
+1. Splits list values into items and encodes each item once (BaseMessages and strings)
+2. Replaces items already seen in an earlier checkpoint with a short content hash
+3. Compresses the resulting frame with zstd (falls back to zlib if `zstandard` is missing)
+
+A checkpoint written this way is only readable while its items are in the
+blob store, so use it through `CompactCheckpointer`: it refuses the in-memory
+store for checkpointers that outlive the process, and evicts the items of a
+thread when the thread is deleted.
+
+Usage:
+    from langgraph.checkpoint.memory import InMemorySaver
+    checkpointer = CompactCheckpointer(InMemorySaver())
+
+    # persistent checkpointers need a persistent store
+    checkpointer = CompactCheckpointer(PostgresSaver(conn), message_store=my_persistent_store)
+"""
+
+import hashlib
+import struct
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, zlib is always available
+    zstandard = None
+
+
+# ===== BLOB STORE =====
+
+# thread whose checkpoint is being written, set by `CompactCheckpointer`
+_writing_thread: ContextVar[Optional[str]] = ContextVar("compact_serde_thread", default=None)
+
+
+class MessageBlobStore:
+    """Content-addressed store for list items shared between checkpoints.
+
+    The default implementation lives in memory, which matches the lifetime of
+    `InMemorySaver` and nothing else. A persistent checkpointer needs a store
+    with the same interface and `persistent = True`, otherwise its checkpoints
+    can't be decoded after a restart or in another process.
+
+    Items are owned by the threads whose checkpoints reference them, and
+    `delete_thread` drops the items no other thread references.
+    """
+
+    persistent = False
+
+    def __init__(self):
+        self._blobs: dict[bytes, tuple[str, bytes]] = {}
+        self._owners: dict[bytes, set[str]] = {}
+        self._threads: dict[str, set[bytes]] = {}
+
+    def get(self, digest: bytes) -> tuple[str, bytes]:
+        return self._blobs[digest]
+
+    def put(self, digest: bytes, typed_blob: tuple[str, bytes], thread_id: Optional[str] = None) -> None:
+        self._blobs.setdefault(digest, typed_blob)
+        if thread_id is not None:
+            self._owners.setdefault(digest, set()).add(thread_id)
+            self._threads.setdefault(thread_id, set()).add(digest)
+
+    def delete_thread(self, thread_id: str) -> int:
+        """ drop the items only referenced by `thread_id`, returns how many were dropped """
+        dropped = 0
+        for digest in self._threads.pop(thread_id, ()):
+            owners = self._owners.get(digest, set())
+            owners.discard(thread_id)
+            if not owners:
+                self._owners.pop(digest, None)
+                self._blobs.pop(digest, None)
+                dropped += 1
+        return dropped
+
+    def __contains__(self, digest: bytes) -> bool:
+        return digest in self._blobs
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+
+# ===== SERIALIZER =====
+
+# entry kinds inside a list frame
+_INLINE = 0   # small item, stored without a digest
+_STORED = 1   # digest + item, first occurrence
+_REF = 2      # digest only, item was stored earlier
+_DIGEST_SIZE = 20  # sha1
+
+_LIST_TYPE = "compact-list"
+_VALUE_TYPE = "compact-value"
+
+
+class CompactSerializer:
+    """Checkpoint serializer with per-item dedup and zstd compression.
+
+    Args:
+        inner: Serializer used for individual values (default: JsonPlusSerializer)
+        level: Compression level passed to zstd/zlib
+        message_store: Store shared by every checkpoint written through this
+            serializer. Defaults to a fresh in-memory store, only valid with
+            `InMemorySaver` (see `CompactCheckpointer`)
+        min_item_size: Items smaller than this are always inlined, a reference
+            would not be smaller than the item itself
+    """
+
+    def __init__(
+        self,
+        inner: Optional[JsonPlusSerializer] = None,
+        level: int = 3,
+        message_store: Optional[MessageBlobStore] = None,
+        min_item_size: int = 64,
+    ):
+        self.inner = inner or JsonPlusSerializer()
+        self.level = level
+        self.message_store = message_store if message_store is not None else MessageBlobStore()
+        self.min_item_size = min_item_size
+        self.codec = "zstd" if zstandard is not None else "zlib"
+
+    # ----- compression -----
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, self.level)
+
+    def _decompress(self, codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("checkpoint was written with zstd but `zstandard` is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    # ----- framing -----
+
+    @staticmethod
+    def _pack_typed(type_: str, data: bytes) -> bytes:
+        type_bytes = type_.encode("utf-8")
+        return struct.pack(">HI", len(type_bytes), len(data)) + type_bytes + data
+
+    @staticmethod
+    def _unpack_typed(buf: memoryview, offset: int) -> tuple[tuple[str, bytes], int]:
+        type_len, data_len = struct.unpack_from(">HI", buf, offset)
+        offset += 6
+        type_ = bytes(buf[offset:offset + type_len]).decode("utf-8")
+        offset += type_len
+        data = bytes(buf[offset:offset + data_len])
+        return (type_, data), offset + data_len
+
+    def _is_list_of_items(self, obj: Any) -> bool:
+        return (
+            isinstance(obj, list)
+            and len(obj) > 0
+            and all(isinstance(item, (BaseMessage, str)) for item in obj)
+        )
+
+    def _encode_list(self, items: list) -> bytes:
+        frame = [struct.pack(">I", len(items))]
+        seen_in_value: set[bytes] = set()
+        thread_id = _writing_thread.get()
+
+        for item in items:
+            typed_blob = self.inner.dumps_typed(item)
+            if len(typed_blob[1]) < self.min_item_size:
+                frame.append(bytes([_INLINE]) + self._pack_typed(*typed_blob))
+                continue
+
+            digest = hashlib.sha1(typed_blob[0].encode("utf-8") + b"\0" + typed_blob[1]).digest()
+            if digest in self.message_store or digest in seen_in_value:
+                frame.append(bytes([_REF]) + digest)
+            else:
+                seen_in_value.add(digest)
+                frame.append(bytes([_STORED]) + digest + self._pack_typed(*typed_blob))
+            # this thread now references the item, even when another thread stored it first
+            self.message_store.put(digest, typed_blob, thread_id)
+
+        return b"".join(frame)
+
+    def _decode_list(self, data: bytes) -> list:
+        buf = memoryview(data)
+        (count,) = struct.unpack_from(">I", buf, 0)
+        offset = 4
+        local: dict[bytes, tuple[str, bytes]] = {}
+        items = []
+
+        for _ in range(count):
+            kind = buf[offset]
+            offset += 1
+            if kind == _INLINE:
+                typed_blob, offset = self._unpack_typed(buf, offset)
+            else:
+                digest = bytes(buf[offset:offset + _DIGEST_SIZE])
+                offset += _DIGEST_SIZE
+                if kind == _STORED:
+                    typed_blob, offset = self._unpack_typed(buf, offset)
+                    local[digest] = typed_blob
+                    # repopulate the store when reading checkpoints written by another process
+                    self.message_store.put(digest, typed_blob)
+                else:
+                    typed_blob = local[digest] if digest in local else self.message_store.get(digest)
+            items.append(self.inner.loads_typed(typed_blob))
+
+        return items
+
+    # ----- SerializerProtocol -----
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        if self._is_list_of_items(obj):
+            return f"{_LIST_TYPE}+{self.codec}", self._compress(self._encode_list(obj))
+
+        type_, data = self.inner.dumps_typed(obj)
+        return f"{_VALUE_TYPE}+{self.codec}", self._compress(self._pack_typed(type_, data))
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        kind, _, codec = type_.partition("+")
+
+        if kind == _LIST_TYPE:
+            return self._decode_list(self._decompress(codec, payload))
+        if kind == _VALUE_TYPE:
+            typed_blob, _ = self._unpack_typed(memoryview(self._decompress(codec, payload)), 0)
+            return self.inner.loads_typed(typed_blob)
+
+        # checkpoints written before the compact serializer was enabled
+        return self.inner.loads_typed(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.inner.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.inner.loads(data)
+
+
+# ===== CHECKPOINTER =====
+
+class CompactCheckpointer(BaseCheckpointSaver):
+    """`saver` writing its checkpoints through a `CompactSerializer`.
+
+    Refuses the in-memory blob store for any saver but `InMemorySaver`, since
+    the checkpoints would outlive the items they reference. Deleting a thread
+    also evicts its items from the store.
+
+    Args:
+        saver: Checkpointer that stores the checkpoints
+        message_store: Blob store, required (and `persistent`) unless `saver` is an `InMemorySaver`
+        **serializer_kwargs: Passed to `CompactSerializer`
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, message_store: Optional[MessageBlobStore] = None, **serializer_kwargs):
+        store = message_store if message_store is not None else MessageBlobStore()
+        if not store.persistent and not isinstance(saver, InMemorySaver):
+            raise ValueError(
+                f"{type(saver).__name__} keeps checkpoints beyond this process, "
+                "CompactCheckpointer needs a persistent message_store for it"
+            )
+        super().__init__(serde=CompactSerializer(message_store=store, **serializer_kwargs))
+        self.saver = saver
+        self.saver.serde = self.serde
+        self.message_store = store
+
+    @staticmethod
+    @contextmanager
+    def _writing(config):
+        token = _writing_thread.set(str(config["configurable"]["thread_id"]))
+        try:
+            yield
+        finally:
+            _writing_thread.reset(token)
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def get_tuple(self, config):
+        return self.saver.get_tuple(config)
+
+    async def aget_tuple(self, config):
+        return await self.saver.aget_tuple(config)
+
+    def list(self, config, **kwargs):
+        return self.saver.list(config, **kwargs)
+
+    def alist(self, config, **kwargs):
+        return self.saver.alist(config, **kwargs)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._writing(config):
+            return self.saver.put(config, checkpoint, metadata, new_versions)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        with self._writing(config):
+            return await self.saver.aput(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._writing(config):
+            return self.saver.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        with self._writing(config):
+            return await self.saver.aput_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id):
+        self.saver.delete_thread(thread_id)
+        self.message_store.delete_thread(str(thread_id))
+
+    async def adelete_thread(self, thread_id):
+        await self.saver.adelete_thread(thread_id)
+        self.message_store.delete_thread(str(thread_id))
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
@@ -0,0 +1,475 @@
+"""Per-node timing, token and call-count tracing for graph runs.
+
+Every graph in langgraph.json is wrapped with `traced(graph)`, which attaches
+`TracingCallbackHandler`. The handler records a span for each graph run, each
+node, each LLM call (with token usage) and each tool call. External calls made
+outside LangChain runnables (Tavily, Chroma, embeddings, SQL) are recorded with
+the `trace_span` context manager or `instrument_sqlalchemy`, and are attached to
+the graph run they happen in. Things that already happened (a cancellation, a
+timeout) are recorded with `trace_event`.
+
+Tracing is off unless `TRACING_ENABLED=1`. Finished spans are queued and
+appended as JSON lines to `TRACE_FILE` (default `.traces/spans.jsonl`) by a
+background writer thread, in batches, so the event loop never waits on the
+file or a lock. Past `TRACE_MAX_BYTES` the file is rotated to `<TRACE_FILE>.1`,
+replacing the previous one, so traces take at most twice that on disk. Spans
+written, spans lost to write errors and rotations are counted in `trace_stats`.
+
+Print a per-run breakdown with its critical path (from backend/):
+    python -m src.tracing                  # latest run
+    python -m src.tracing --run <run_id>
+    python -m src.tracing --list
+"""
+
+import argparse
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables.config import var_child_runnable_config
+
+# ===== CONFIGURATION =====
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACE_FILE = Path(os.getenv("TRACE_FILE", ".traces/spans.jsonl"))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+flush_interval_s = 1.0
+
+trace_stats: Counter = Counter()
+
+_span_queue: "queue.SimpleQueue[dict]" = queue.SimpleQueue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+_drain_lock = threading.Lock()
+_current_span: ContextVar[Optional[dict]] = ContextVar("current_trace_span", default=None)
+
+
+def _rotated(path: Path) -> Path:
+    return path.with_name(path.name + ".1")
+
+
+def _drain() -> None:
+    """ append every queued span to the trace file (writer thread and exit only) """
+    with _drain_lock:
+        lines = []
+        while True:
+            try:
+                lines.append(json.dumps(_span_queue.get_nowait(), default=str))
+            except queue.Empty:
+                break
+        if not lines:
+            return
+        try:
+            TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            if TRACE_FILE.exists() and TRACE_FILE.stat().st_size >= TRACE_MAX_BYTES:
+                os.replace(TRACE_FILE, _rotated(TRACE_FILE))
+                trace_stats["rotations"] += 1
+            with open(TRACE_FILE, "a") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            trace_stats["spans_dropped"] += len(lines)
+            trace_stats["write_errors"] += 1
+            if trace_stats["write_errors"] == 1:
+                # once, not every flush interval; the counters keep the rest
+                print(f"Could not write trace spans to {TRACE_FILE}: {e}")
+            return
+        trace_stats["spans_written"] += len(lines)
+
+
+def _writer_loop() -> None:
+    while True:
+        time.sleep(flush_interval_s)
+        _drain()
+
+
+def _write_span(span: dict) -> None:
+    """ queue a finished span, the writer thread appends it to the trace file """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_loop, name="trace-writer", daemon=True)
+                _writer.start()
+    _span_queue.put(span)
+
+
+# spans still queued at exit are written
+atexit.register(_drain)
+
+
+def _finish(span: dict, **attrs) -> None:
+    span["end"] = time.time()
+    span["duration_s"] = span["end"] - span["start"]
+    span["attrs"].update(attrs)
+    _write_span(span)
+
+
+# ===== CALLBACK HANDLER =====
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records graph, node, LLM and tool spans from LangChain callbacks.
+
+    Internal runnables (channel writes, routers, ...) are not recorded themselves,
+    but their children are attached to the nearest recorded ancestor. A subgraph
+    compiled with `traced` and used as a node sees every event twice (once through
+    its own config, once through the parent's), so all methods are idempotent.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: dict[UUID, dict] = {}
+        # langchain run id -> (trace run id, nearest recorded span id)
+        self._lineage: dict[UUID, tuple[str, Optional[str]]] = {}
+
+    # ----- bookkeeping -----
+
+    def _register(self, run_id: UUID, parent_run_id: Optional[UUID]) -> tuple[str, Optional[str]]:
+        with self._lock:
+            if run_id in self._lineage:
+                return self._lineage[run_id]
+            if parent_run_id is not None and parent_run_id in self._lineage:
+                lineage = self._lineage[parent_run_id]
+            else:
+                lineage = (str(run_id), None)
+            self._lineage[run_id] = lineage
+            return lineage
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attrs) -> None:
+        trace_run_id, parent_span_id = self._register(run_id, parent_run_id)
+        with self._lock:
+            if run_id in self._open:
+                return
+            span = {
+                "run_id": trace_run_id,
+                "span_id": str(run_id),
+                "parent_id": parent_span_id,
+                "name": name,
+                "kind": kind,
+                "start": time.time(),
+                "attrs": attrs,
+            }
+            self._open[run_id] = span
+            self._lineage[run_id] = (trace_run_id, span["span_id"])
+
+    def _end(self, run_id: UUID, **attrs) -> None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            if span is not None and span["parent_id"] is None:
+                self._forget_run(span["run_id"])
+        if span is not None:
+            _finish(span, **attrs)
+
+    def _forget_run(self, trace_run_id: str) -> None:
+        for run_id in [r for r, (t, _) in self._lineage.items() if t == trace_run_id]:
+            del self._lineage[run_id]
+
+    def lineage_of(self, run_id: Optional[UUID]) -> tuple[Optional[str], Optional[str]]:
+        """ (trace run id, nearest recorded span id) for a langchain run, used by `trace_span` """
+        if run_id is None:
+            return None, None
+        with self._lock:
+            return self._lineage.get(run_id, (None, None))
+
+    # ----- chains (graphs and nodes) -----
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs):
+        metadata = metadata or {}
+        name = name or (serialized or {}).get("name", "chain")
+        if parent_run_id is None or parent_run_id not in self._lineage:
+            self._start(run_id, None, name, "graph", thread_id=metadata.get("thread_id"))
+        elif name == "LangGraph":
+            # graph invoked from inside a node, e.g. researchers launched by supervisor_tools
+            self._start(run_id, parent_run_id, name, "subgraph")
+        elif name == metadata.get("langgraph_node"):
+            self._start(run_id, parent_run_id, name, "node", step=metadata.get("langgraph_step"))
+        else:
+            self._register(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        # GraphInterrupt / Command bubbling are control flow, still worth seeing in the trace
+        self._end(run_id, error=type(error).__name__)
+
+    # ----- LLM calls -----
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        input_chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start(
+            run_id, parent_run_id, metadata.get("ls_model_name") or (serialized or {}).get("name", "llm"), "llm",
+            input_chars=input_chars
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        self._start(
+            run_id, parent_run_id, metadata.get("ls_model_name") or (serialized or {}).get("name", "llm"), "llm",
+            input_chars=sum(len(p) for p in prompts)
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage: dict = {}
+        output_chars = 0
+        for generations in response.generations:
+            for generation in generations:
+                output_chars += len(generation.text or "")
+                message_usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for key in ("input_tokens", "output_tokens", "total_tokens"):
+                    usage[key] = usage.get(key, 0) + message_usage.get(key, 0)
+        self._end(run_id, output_chars=output_chars, **usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    # ----- tools -----
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, (serialized or {}).get("name", "tool"), "tool", input_chars=len(input_str or ""))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, output_chars=len(str(getattr(output, "content", output))))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+
+# singleton instance
+tracing_handler = TracingCallbackHandler()
+
+
+def traced(graph):
+    """ attach the tracing handler to a compiled graph (returns the graph unchanged when disabled) """
+    if not TRACING_ENABLED:
+        return graph
+    return graph.with_config(callbacks=[tracing_handler])
+
+
+# ===== MANUAL SPANS =====
+
+def _langchain_parent_run_id() -> Optional[UUID]:
+    config = var_child_runnable_config.get() or {}
+    callbacks = config.get("callbacks")
+    return getattr(callbacks, "parent_run_id", None)
+
+
+def _new_span(name: str, kind: str, attrs: dict) -> dict:
+    """ span attached to the current manual span, or else to the langchain run we are in """
+    parent = _current_span.get()
+    if parent is not None:
+        trace_run_id, parent_id = parent["run_id"], parent["span_id"]
+    else:
+        trace_run_id, parent_id = tracing_handler.lineage_of(_langchain_parent_run_id())
+    return {
+        "run_id": trace_run_id,
+        "span_id": str(uuid.uuid4()),
+        "parent_id": parent_id,
+        "name": name,
+        "kind": kind,
+        "start": time.time(),
+        "attrs": dict(attrs),
+    }
+
+
+@contextmanager
+def trace_span(name: str, kind: str, **attrs):
+    """Record a span around an external call made outside LangChain runnables.
+
+    Yields the span's attribute dict so the caller can add sizes or counts:
+
+        with trace_span("tavily.search", "search", query=query) as span_attrs:
+            result = tavily_client.search(query)
+            span_attrs["results"] = len(result["results"])
+    """
+    if not TRACING_ENABLED:
+        yield dict(attrs)
+        return
+
+    span = _new_span(name, kind, attrs)
+    token = _current_span.set(span)
+    try:
+        yield span["attrs"]
+    except BaseException as e:
+        span["attrs"]["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(span)
+
+
+def trace_event(name: str, kind: str, start: Optional[float] = None, **attrs) -> None:
+    """Record something that already happened as a span ending now.
+
+    `start` is the `time.time()` at which it began (default: now, a zero-length
+    span), e.g. when a cancelled fan-out started unwinding.
+    """
+    if not TRACING_ENABLED:
+        return
+    span = _new_span(name, kind, attrs)
+    if start is not None:
+        span["start"] = start
+    _finish(span)
+
+
+class TracedEmbeddings(Embeddings):
+    """ embeddings wrapper that records every embedding call as an `embedding` span """
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with trace_span("embeddings.embed_documents", "embedding", texts=len(texts), chars=sum(len(t) for t in texts)):
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        with trace_span("embeddings.embed_query", "embedding", texts=1, chars=len(text)):
+            return self.inner.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        with trace_span("embeddings.embed_documents", "embedding", texts=len(texts), chars=sum(len(t) for t in texts)):
+            return await self.inner.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        with trace_span("embeddings.embed_query", "embedding", texts=1, chars=len(text)):
+            return await self.inner.aembed_query(text)
+
+
+def traced_embeddings(embeddings: Embeddings) -> Embeddings:
+    return TracedEmbeddings(embeddings) if TRACING_ENABLED else embeddings
+
+
+def instrument_sqlalchemy(engine) -> None:
+    """ record every SQL statement executed on the engine as a `db` span """
+    if not TRACING_ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_spans", []).append(trace_span("sql", "db", statement=statement.split(None, 1)[0]))
+        conn.info["trace_spans"][-1].__enter__()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span_cm = conn.info["trace_spans"].pop()
+        span_cm.__exit__(None, None, None)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+        if spans:
+            spans.pop().__exit__(None, None, None)
+
+
+# ===== REPORT CLI =====
+
+def load_spans(path: Path = TRACE_FILE) -> dict[str, list[dict]]:
+    """ spans of the trace file and its rotated predecessor, grouped by run """
+    runs: dict[str, list[dict]] = defaultdict(list)
+    for part in (_rotated(path), path):
+        if not part.exists():
+            continue
+        with open(part) as f:
+            for line in f:
+                if line.strip():
+                    span = json.loads(line)
+                    runs[span["run_id"] or "untracked"].append(span)
+    return runs
+
+
+def critical_path(spans: list[dict]) -> list[dict]:
+    """ from the root, repeatedly follow the child that finished last """
+    children: dict[Optional[str], list[dict]] = defaultdict(list)
+    for span in spans:
+        children[span["parent_id"]].append(span)
+
+    path = []
+    current = max(children[None], key=lambda s: s["duration_s"]) if children[None] else None
+    while current is not None:
+        path.append(current)
+        kids = children.get(current["span_id"], [])
+        current = max(kids, key=lambda s: s["end"]) if kids else None
+    return path
+
+
+def print_run_report(run_id: str, spans: list[dict]) -> None:
+    root = next((s for s in spans if s["parent_id"] is None), None)
+    total = root["duration_s"] if root else max(s["end"] for s in spans) - min(s["start"] for s in spans)
+    print(f"run {run_id}  {root['name'] if root else ''}  total {total:.2f}s  spans {len(spans)}\n")
+
+    by_kind: dict[str, list[dict]] = defaultdict(list)
+    for span in spans:
+        by_kind[span["kind"]].append(span)
+
+    print(f"{'kind':<14}{'calls':>7}{'time s':>10}{'in tok':>10}{'out tok':>10}")
+    for kind, kind_spans in sorted(by_kind.items()):
+        print(
+            f"{kind:<14}{len(kind_spans):>7}{sum(s['duration_s'] for s in kind_spans):>10.2f}"
+            f"{sum(s['attrs'].get('input_tokens', 0) for s in kind_spans):>10}"
+            f"{sum(s['attrs'].get('output_tokens', 0) for s in kind_spans):>10}"
+        )
+
+    cancelled = Counter(s["kind"] for s in spans if s["attrs"].get("error") == "CancelledError")
+    if cancelled:
+        print("cancelled in flight: " + ", ".join(f"{kind}={n}" for kind, n in sorted(cancelled.items())))
+
+    by_name: dict[tuple[str, str], list[dict]] = defaultdict(list)
+    for span in spans:
+        if span["kind"] != "graph":
+            by_name[(span["kind"], span["name"])].append(span)
+
+    print(f"\n{'kind':<14}{'name':<36}{'calls':>7}{'total s':>10}{'max s':>9}")
+    for (kind, name), named in sorted(by_name.items(), key=lambda kv: -sum(s["duration_s"] for s in kv[1]))[:25]:
+        print(
+            f"{kind:<14}{name[:35]:<36}{len(named):>7}"
+            f"{sum(s['duration_s'] for s in named):>10.2f}{max(s['duration_s'] for s in named):>9.2f}"
+        )
+
+    print("\ncritical path:")
+    for depth, span in enumerate(critical_path(spans)):
+        share = span["duration_s"] / total * 100 if total else 0
+        print(f"{'  ' * depth}{span['kind']}:{span['name']}  {span['duration_s']:.2f}s ({share:.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-run breakdown of recorded trace spans")
+    parser.add_argument("--file", type=Path, default=TRACE_FILE)
+    parser.add_argument("--run", help="run id to report (default: latest run)")
+    parser.add_argument("--list", action="store_true", help="list recorded runs")
+    args = parser.parse_args()
+
+    runs = load_spans(args.file)
+    if not runs:
+        print(f"no spans in {args.file}")
+        return
+
+    ordered = sorted(runs.items(), key=lambda kv: min(s["start"] for s in kv[1]))
+    if args.list:
+        for run_id, spans in ordered:
+            root = next((s for s in spans if s["parent_id"] is None), None)
+            name = root["name"] if root else "?"
+            print(f"{run_id}  {name:<24}{len(spans):>6} spans  {root['duration_s'] if root else 0:>8.2f}s")
+        return
+
+    run_id = args.run or ordered[-1][0]
+    print_run_report(run_id, runs[run_id])
+
+
+if __name__ == "__main__":
+    main()
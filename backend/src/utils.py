@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -7,10 +8,13 @@ from typing_extensions import Literal
 
 from tavily import TavilyClient 
 from langchain.chat_models import init_chat_model
-from langchain_core.tools import InjectedToolArg, tool
+from langchain_core.tools import InjectedToolArg, StructuredTool, tool
 
 from src.prompts import summarize_webpage_prompt
 from src.research_states import SummarySchema
+from src.tracing import trace_span
+from src.cassettes import cassette_chat_model, cassette_search_client
+from src.cancellation import gather_cancellable
 
 # ===== UTILITY FUNCTIONS =====
 
@@ -24,8 +28,8 @@ def get_current_directory() -> str:
 
 # ===== Configs =====
 load_dotenv()
-tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-summarization_model = init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai")
+tavily_client = cassette_search_client(TavilyClient(api_key=os.getenv("TAVILY_API_KEY")))
+summarization_model = cassette_chat_model(init_chat_model("gemini-2.5-flash-lite", model_provider="google_genai"), "summarize")
 
 def tavily_multiple_search(
     queries: list[str],
@@ -38,28 +42,42 @@ def tavily_multiple_search(
     """ Internal function """
     docs = []
     for query in queries:
-        result = tavily_client.search(
-            query,
-            topic=topic,
-            days=days,
-            include_raw_content=include_raw_content, 
-            max_results=max_results
-        )
+        with trace_span("tavily.search", "search", query=query, max_results=max_results) as span_attrs:
+            result = tavily_client.search(
+                query,
+                topic=topic,
+                days=days,
+                include_raw_content=include_raw_content, 
+                max_results=max_results
+            )
+            span_attrs["results"] = len(result.get("results", []))
+            span_attrs["raw_chars"] = sum(len(r.get("raw_content") or "") for r in result.get("results", []))
         docs.append(result)
     return docs
 
-def summarize_webpage_content(webpage_content: str) -> str:
-    """ Internal function """
-    
-    structured_output_model = summarization_model.with_structured_output(SummarySchema)
-    prompt = HumanMessage(
+def _summary_prompt(webpage_content: str) -> HumanMessage:
+    return HumanMessage(
         summarize_webpage_prompt.format(
             webpage_content=webpage_content,
             date=get_today_str()
         )
     )
-    response = structured_output_model.invoke([prompt])
+
+def summarize_webpage_content(webpage_content: str) -> str:
+    """ Internal function """
     
+    structured_output_model = summarization_model.with_structured_output(SummarySchema)
+    response = structured_output_model.invoke([_summary_prompt(webpage_content)])
+    return format_summary(response)
+
+async def asummarize_webpage_content(webpage_content: str) -> str:
+    """ async version of `summarize_webpage_content`, cancellable mid-call """
+    structured_output_model = summarization_model.with_structured_output(SummarySchema)
+    response = await structured_output_model.ainvoke([_summary_prompt(webpage_content)])
+    return format_summary(response)
+
+def format_summary(response) -> str:
+    """ <summary> / <key_excerpts> block from a SummarySchema response """
     # Handle case where response is None or doesn't have expected attributes
     if response is None:
         return f"<summary>\nError: Could not generate summary\n</summary>\n<key_excerpts>\nError: Could not extract excerpts\n</key_excerpts>"
@@ -113,6 +131,18 @@ def process_search_results(unique_results: dict) -> dict:
     
     return summarized_results
 
+async def aprocess_search_results(unique_results: dict) -> dict:
+    """ async version of `process_search_results`, summarizing all pages concurrently """
+    async def process(result: dict) -> dict:
+        if not result.get("raw_content"):
+            content = result['content']
+        else:
+            content = await asummarize_webpage_content(result['raw_content'])
+        return {'title': result['title'], 'content': content}
+
+    processed = await gather_cancellable((process(r) for r in unique_results.values()), kind="summarization")
+    return dict(zip(unique_results.keys(), processed))
+
 def format_search_output(summarized_results: dict) -> str:
     """Format search results for display."""
     
@@ -131,8 +161,7 @@ def format_search_output(summarized_results: dict) -> str:
 
 
 # ================== TOOLS
-@tool(parse_docstring=True)
-def tavily_search_tool(
+def tavily_search(
     query: str,
     max_results: Annotated[int, InjectedToolArg]=3,
     topic: Literal['general', 'finance', 'news']='general',
@@ -184,4 +213,23 @@ def think_tool(reflection: str) -> str:
     Returns:
         Confirmation that reflection was recorded for decision-making
     """
-    return f"Reflection recorded: {reflection}"
\ No newline at end of file
+    return f"Reflection recorded: {reflection}"
+
+async def atavily_search(
+    query: str,
+    max_results: Annotated[int, InjectedToolArg] = 3,
+    topic: Literal['general', 'finance', 'news'] = 'general',
+    days: int = 365,
+) -> str:
+    """ async version of `tavily_search`: the search runs in a thread, summarizations are async and cancellable """
+    results = await asyncio.to_thread(tavily_multiple_search, [query], topic, days, include_raw_content=True)
+    summarized_results = await aprocess_search_results(deduplicate_sources(results))
+    return format_search_output(summarized_results)
+
+# `invoke` runs `tavily_search`, `ainvoke` (the agents) runs `atavily_search`
+tavily_search_tool = StructuredTool.from_function(
+    func=tavily_search,
+    coroutine=atavily_search,
+    name="tavily_search_tool",
+    parse_docstring=True,
+)
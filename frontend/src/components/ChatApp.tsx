@@ -10,8 +10,10 @@ import { ChatSidebar } from './ChatSidebar';
 import { MessageList } from './MessageList';
 import { ChatInput } from './ChatInput';
 import type { Conversation, ChatState } from '../types/chat';
+import { useAuth } from '../context/AuthContext';
 
 export const ChatApp = () => {
+  const { token } = useAuth();
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const [simulationMode, setSimulationMode] = useState(false);
   const [deepResearchEnabled, setDeepResearchEnabled] = useState(false);
@@ -29,6 +31,8 @@ export const ChatApp = () => {
     // apiUrl: "http://152.67.123.100:2024",
     assistantId: deepResearchEnabled ? "deep_research_agent" : "simple_chat",
     messagesKey: "messages",
+    // the graphs only search the signed-in user's documents
+    defaultHeaders: token ? { Authorization: `Bearer ${token}` } : undefined,
   });
 
   // Append only the latest AI message from the stream into the active conversation
@@ -132,7 +136,8 @@ export const ChatApp = () => {
     }
 
     // Normal mode - submit to LangGraph server
-    thread.submit({ messages: [{ type: "human", content }] });
+    // cancel the run server-side if the tab is closed mid-run
+    thread.submit({ messages: [{ type: "human", content }] }, { onDisconnect: "cancel" });
     // Create new conversation if none exists
     // let currentConversationId = chatState.currentConversationId;
     // if (!currentConversationId) {
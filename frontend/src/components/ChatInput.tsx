@@ -87,7 +87,7 @@ export const ChatInput: React.FC<ChatInputProps> = ({
       };
 
       xhr.onload = () => {
-        if (xhr.status === 200) {
+        if (xhr.status >= 200 && xhr.status < 300) { // 202: queued for ingestion
           onSendMessage(`Uploaded file: ${file.name}`);
         } else {
           setUploadError(`Upload failed: ${xhr.statusText}`);